@@ -13,21 +13,47 @@ def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
 
+    from app import logs
+    logs.init_app(app)
+
     # Initialize extensions with app
+    from app import database, metrics
+    database.configure_engine(app)
     db.init_app(app)
+    database.init_app(app, db)
+    metrics.init_app(app, db)
     login_manager.init_app(app)
     login_manager.login_view = 'auth.login'
 
+    from app.futurescope import cache as metadata_cache
+    metadata_cache.init_app(app)
+    from app.futurescope import limits as source_limits
+    source_limits.init_app(app)
+
+    from app import changes, fragments, suggest, thumbnails
+    changes.init_app(app)
+    fragments.init_app(app)
+    thumbnails.init_app(app)
+    suggest.init_app(app)
+
     # Import and register blueprints
     from app.routes import main
     from app.auth import auth
+    from app.api import api
     app.register_blueprint(main)
     app.register_blueprint(auth)
+    app.register_blueprint(api, url_prefix='/api/v1')
+
+    from app.migrations import create_schema, upgrade_db_command
+    app.cli.add_command(upgrade_db_command)
+
+    # Schema changes are a deploy step (flask --app run upgrade-db), not
+    # something every worker does on boot; dev and test profiles opt in
+    if app.config['AUTO_CREATE_SCHEMA']:
+        with app.app_context():
+            create_schema()
 
-    # Create database tables
-    with app.app_context():
-        # Import models so SQLAlchemy knows about them
-        from app.models import User, Category, Item
-        db.create_all()
+    from app import enrichment
+    enrichment.init_app(app)
 
     return app
@@ -0,0 +1,71 @@
+"""Ownership checks for routes that act on one list or item.
+
+An item is loaded together with its category in a single joined query, so
+the check needs no lazy loads. The user side is the already-loaded
+current_user (see models.load_user), compared by id.
+"""
+from functools import wraps
+from flask_login import current_user
+from sqlalchemy.orm import contains_eager
+from app import db
+from app.models import Category, Item
+
+
+def load_owned_item(item_id, user_id, *options):
+    """Returns (item, None), or (None, 404 / 403). item.category is already loaded."""
+    item = db.session.execute(
+        db.select(Item).join(Item.category)
+        .options(contains_eager(Item.category), *options)
+        .where(Item.id == item_id)
+    ).scalar()
+    if item is None:
+        return None, 404
+    if item.category.user_id != user_id:
+        return None, 403
+    return item, None
+
+
+def load_owned_category(category_id, user_id):
+    """Returns (category, None), or (None, 404 / 403)."""
+    category = db.session.get(Category, category_id)
+    if category is None:
+        return None, 404
+    if category.user_id != user_id:
+        return None, 403
+    return category, None
+
+
+def plain_error(message, status):
+    return message, status
+
+
+def ownership_error(status, not_found, respond=plain_error):
+    """Response for a failed load_owned_* check: `not_found` for a 404,
+    'Unauthorized' for a 403, built by `respond(message, status)`."""
+    return respond(not_found if status == 404 else 'Unauthorized', status)
+
+
+def _owner_required(loader, url_arg, view_arg, not_found, respond, options):
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            obj, status = loader(kwargs.pop(url_arg), current_user.id, *options)
+            if status is not None:
+                return ownership_error(status, not_found, respond)
+            kwargs[view_arg] = obj
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def item_owner_required(*options, respond=plain_error):
+    """Replaces the view's `item_id` argument with the current user's `item`.
+    Goes below @login_required. Extra loader options (e.g. selectinload)
+    are passed through to the query."""
+    return _owner_required(load_owned_item, 'item_id', 'item', 'Item not found', respond, options)
+
+
+def category_owner_required(respond=plain_error):
+    """Replaces the view's `category_id` argument with the current user's `category`.
+    Goes below @login_required."""
+    return _owner_required(load_owned_category, 'category_id', 'category', 'Category not found', respond, ())
@@ -0,0 +1,313 @@
+"""JSON API (mounted at /api/v1) for lists and items.
+
+Every GET carries a strong ETag derived from the version counter of the
+list(s) involved (Category.version, bumped on any change to the list or
+its items) plus the exact request URL, and answers If-None-Match with a
+bare 304 before loading any items. `?fields=a,b` limits both the columns
+loaded and the keys serialized.
+"""
+import hashlib
+from datetime import datetime
+from flask import jsonify, request, current_app, Response
+from flask_login import current_user
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload, load_only
+from app import bulk, changes, db, enrichment
+from app.access import category_owner_required, item_owner_required
+from app.api import api
+from app.futurescope import limits as source_limits
+from app.models import Category, Item
+from app.pagination import keyset_page, InvalidCursor, ITEM_SORTS
+from app.works import own_value
+
+CATEGORY_FIELDS = ('id', 'name', 'type', 'version', 'item_count')
+CHANGE_CATEGORY_FIELDS = ('id', 'name', 'type', 'version')
+ITEM_FIELDS = ('id', 'name', 'status', 'date_added', 'info', 'link', 'image_url',
+               'director', 'year', 'sequel_prequel', 'type', 'category_id')
+DEFAULT_ITEM_FIELDS = ('id', 'name', 'status', 'year', 'director')
+CREATE_ITEM_FIELDS = ('name', 'status', 'info', 'link', 'director', 'year')
+PATCH_ITEM_FIELDS = ('status', 'info', 'link')
+# Serialized as shown: the item's own value, else its work's
+ITEM_DISPLAY_FIELDS = {field: f'display_{field}' for field in
+                       ('info', 'link', 'image_url', 'director', 'year', 'sequel_prequel')}
+
+
+class BadRequest(ValueError):
+    pass
+
+
+@api.errorhandler(BadRequest)
+def bad_request(e):
+    return error(str(e), 400)
+
+
+@api.before_request
+def require_login():
+    # No redirect to the login page for API clients
+    if not current_user.is_authenticated:
+        return error('Unauthorized', 401)
+
+
+def error(message, status):
+    return jsonify({'error': message}), status
+
+
+def requested_fields(allowed, default):
+    raw = request.args.get('fields')
+    if not raw:
+        return list(default)
+    fields = [field.strip() for field in raw.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise BadRequest(f"Unknown field(s): {', '.join(unknown)}")
+    return fields
+
+
+def serialize(obj, fields, extra=None):
+    data = {}
+    for field in fields:
+        value = extra[field] if extra and field in extra else getattr(obj, field)
+        data[field] = value.isoformat() if isinstance(value, datetime) else value
+    return data
+
+
+def serialize_item(item, fields):
+    return serialize(item, fields, {field: getattr(item, ITEM_DISPLAY_FIELDS[field])
+                                    for field in fields if field in ITEM_DISPLAY_FIELDS})
+
+
+def make_etag(*versions):
+    # Strong: one value per (data version, exact representation requested)
+    key = f'{current_user.id}|{versions}|{request.full_path}'
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def conditional(etag, build):
+    """304 if the client already has `etag`, else the JSON built by `build()`."""
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify(build())
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def json_body():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        raise BadRequest('Expected a JSON object body.')
+    return data
+
+
+def item_counts(category_ids):
+    return dict(
+        db.session.query(Item.category_id, func.count(Item.id))
+        .filter(Item.category_id.in_(category_ids))
+        .group_by(Item.category_id)
+        .all()
+    )
+
+
+# --- Lists ---
+
+@api.route('/lists')
+def list_categories():
+    fields = requested_fields(CATEGORY_FIELDS, CATEGORY_FIELDS)
+    versions = db.session.query(Category.id, Category.version).filter_by(user_id=current_user.id).order_by(Category.id).all()
+    etag = make_etag(*(tuple(row) for row in versions))
+
+    def build():
+        categories = Category.query.filter_by(user_id=current_user.id).order_by(Category.id).all()
+        counts = item_counts([c.id for c in categories]) if 'item_count' in fields else {}
+        return {'lists': [serialize(c, fields, {'item_count': counts.get(c.id, 0)}) for c in categories]}
+
+    return conditional(etag, build)
+
+
+@api.route('/lists', methods=['POST'])
+def create_category():
+    data = json_body()
+    name = (data.get('name') or '').strip()
+    if not name:
+        raise BadRequest('"name" is required.')
+    category = Category(name=name[:100], type=data.get('type') or 'general', user_id=current_user.id)
+    db.session.add(category)
+    db.session.commit()
+    return jsonify(serialize(category, CATEGORY_FIELDS, {'item_count': 0})), 201
+
+
+@api.route('/lists/<int:category_id>')
+@category_owner_required(respond=error)
+def get_category(category):
+    fields = requested_fields(CATEGORY_FIELDS, CATEGORY_FIELDS)
+
+    def build():
+        counts = item_counts([category.id]) if 'item_count' in fields else {}
+        return serialize(category, fields, {'item_count': counts.get(category.id, 0)})
+
+    return conditional(make_etag((category.id, category.version)), build)
+
+
+@api.route('/lists/<int:category_id>', methods=['DELETE'])
+@category_owner_required(respond=error)
+def delete_category(category):
+    bulk.delete_categories(current_user.id, [category.id])
+    db.session.commit()
+    return '', 204
+
+
+# --- Items ---
+
+@api.route('/lists/<int:category_id>/items')
+@category_owner_required(respond=error)
+def list_items(category):
+    fields = requested_fields(ITEM_FIELDS, DEFAULT_ITEM_FIELDS)
+    sort = request.args.get('sort', 'date_added')
+    if sort not in ITEM_SORTS:
+        raise BadRequest(f'Unknown sort: {sort}')
+    order = 'desc' if request.args.get('order') == 'desc' else 'asc'
+    status_filter = request.args.get('status') or None
+
+    def build():
+        # display_* fields read the work: joined here, never a lazy load per row
+        query = Item.query.filter_by(category_id=category.id).options(
+            load_only(*(getattr(Item, field) for field in fields)), joinedload(Item.work))
+        if status_filter:
+            query = query.filter(Item.status == status_filter)
+        try:
+            items, next_cursor, prev_cursor, _ = keyset_page(
+                query, sort=sort, order=order, cursor=request.args.get('cursor'),
+                per_page=current_app.config['ITEMS_PER_PAGE'],
+            )
+        except InvalidCursor:
+            raise BadRequest('Invalid cursor')
+        return {
+            'list': category.id,
+            'version': category.version,
+            'items': [serialize_item(item, fields) for item in items],
+            'next_cursor': next_cursor,
+            'prev_cursor': prev_cursor,
+        }
+
+    return conditional(make_etag((category.id, category.version)), build)
+
+
+@api.route('/lists/<int:category_id>/items', methods=['POST'])
+@category_owner_required(respond=error)
+def create_item(category):
+    data = json_body()
+    name = (data.get('name') or '').strip()
+    if not name:
+        raise BadRequest('"name" is required.')
+    status = data.get('status') or category.default_status
+    if status not in category.status_options:
+        raise BadRequest(f'Invalid status for this list: {status}')
+
+    values = {field: data[field] for field in CREATE_ITEM_FIELDS if data.get(field) not in (None, '')}
+    values.update(name=name[:100], status=status)
+    item = Item(category_id=category.id, **values)
+    db.session.add(item)
+    if data.get('enrich', True):
+        enrichment.enqueue(item, category)
+    db.session.commit()
+    enrichment.wake(current_app)
+    return jsonify(serialize_item(item, ITEM_FIELDS)), 201
+
+
+@api.route('/items/<int:item_id>')
+def get_item(item_id):
+    # Ownership and version in one query, so a 304 never loads the item itself
+    row = (
+        db.session.query(Category.id, Category.user_id, Category.version)
+        .join(Item, Item.category_id == Category.id)
+        .filter(Item.id == item_id)
+        .first()
+    )
+    if not row:
+        return error('Item not found', 404)
+    if row.user_id != current_user.id:
+        return error('Unauthorized', 403)
+    fields = requested_fields(ITEM_FIELDS, ITEM_FIELDS)
+
+    def build():
+        return serialize_item(db.session.get(Item, item_id), fields)
+
+    return conditional(make_etag((row.id, row.version), item_id), build)
+
+
+@api.route('/items/<int:item_id>', methods=['PATCH'])
+@item_owner_required(respond=error)
+def update_item(item):
+    data = json_body()
+    updated_fields = {field: data[field] for field in PATCH_ITEM_FIELDS if field in data}
+    if not updated_fields:
+        raise BadRequest(f"Nothing to update; accepted fields: {', '.join(PATCH_ITEM_FIELDS)}")
+    if 'status' in updated_fields and updated_fields['status'] not in item.category.status_options:
+        raise BadRequest(f"Invalid status for this list: {updated_fields['status']}")
+    for field, value in updated_fields.items():
+        setattr(item, field, own_value(item, field, value) if field in ITEM_DISPLAY_FIELDS else value)
+    payload = serialize_item(item, ITEM_FIELDS)
+    db.session.commit()
+    return jsonify(payload)
+
+
+@api.route('/items/<int:item_id>', methods=['DELETE'])
+@item_owner_required(respond=error)
+def delete_item(item):
+    db.session.delete(item)
+    db.session.commit()
+    return '', 204
+
+
+# --- Change feed ---
+
+@api.route('/changes')
+def list_changes():
+    """Delta sync (app/changes.py). Without `since`, only the current
+    sequence: take it before a full load, then poll ?since=<seq> and apply
+    each entry's current state (`data`, absent for deletions) until
+    `more` is false."""
+    if 'since' not in request.args:
+        return jsonify({'changes': [], 'next': changes.latest_seq(current_user.id), 'more': False})
+    try:
+        since = int(request.args['since'])
+        limit = int(request.args.get('limit', current_app.config['CHANGES_PAGE_SIZE']))
+    except ValueError:
+        raise BadRequest('"since" and "limit" must be integers.')
+    limit = max(1, min(limit, current_app.config['CHANGES_PAGE_SIZE']))
+    watermark = current_user.changes_watermark
+    if since < watermark:
+        # Entries after `since` were compacted away: only a full reload is complete
+        return jsonify({'error': 'Change history compacted; reload everything.', 'watermark': watermark}), 410
+
+    entries, next_seq, more = changes.changes_since(current_user.id, since, limit)
+    item_ids = [entry.object_id for entry in entries if entry.kind == changes.ITEM and entry.op != changes.DELETED]
+    category_ids = [entry.object_id for entry in entries if entry.kind == changes.CATEGORY and entry.op != changes.DELETED]
+    # Current state in one query per kind; objects deleted since are reported as deleted
+    current = {(changes.ITEM, item.id): serialize_item(item, ITEM_FIELDS)
+               for item in (Item.query.join(Item.category)
+                            .filter(Item.id.in_(item_ids), Category.user_id == current_user.id)
+                            if item_ids else [])}
+    current.update({(changes.CATEGORY, category.id): serialize(category, CHANGE_CATEGORY_FIELDS)
+                    for category in (Category.query.filter(Category.id.in_(category_ids),
+                                                           Category.user_id == current_user.id)
+                                     if category_ids else [])})
+
+    feed = []
+    for entry in entries:
+        data = current.get((entry.kind, entry.object_id))
+        change = {'seq': entry.id, 'kind': entry.kind, 'id': entry.object_id, 'category_id': entry.category_id,
+                  'op': entry.op if data is not None or entry.op == changes.DELETED else changes.DELETED}
+        if data is not None:
+            change['data'] = data
+        feed.append(change)
+    return jsonify({'changes': feed, 'next': next_seq, 'more': more})
+
+
+# --- Metadata sources ---
+
+@api.route('/sources')
+def source_status():
+    """Circuit state and counters of the external metadata sources in this process."""
+    return jsonify({'sources': source_limits.stats()})
@@ -3,7 +3,6 @@ from flask_login import login_user, current_user, logout_user
 from app import db
 from app.models import User
 from werkzeug.security import generate_password_hash, check_password_hash
-from requests_oauthlib import OAuth2Session
 import secrets
 from datetime import datetime, timedelta
 from app.auth import auth
@@ -55,6 +54,8 @@ def logout():
 # Locally it's usually http://127.0.0.1:5000/google/callback
 
 def get_google_auth(state=None, token=None):
+    # Imported here: requests_oauthlib (and requests) are only needed for Google sign-in
+    from requests_oauthlib import OAuth2Session
     if token:
         return OAuth2Session(current_app.config['GOOGLE_CLIENT_ID'], token=token)
     if state:
@@ -0,0 +1,104 @@
+"""Set-based changes to many items or lists at once.
+
+Each operation checks ownership of the whole selection in one query and
+then changes it with a single UPDATE or DELETE per table, however many
+rows are selected; nothing is loaded into the session. Deleting a list
+removes its enrichment jobs, items and the list itself with three
+DELETEs instead of the ORM cascade's one load and one DELETE per item.
+
+The statements bypass the ORM flush hooks, so Item.version and
+Category.version are bumped, and change feed entries written
+(app/changes.py), here explicitly. The caller commits.
+"""
+from sqlalchemy import case, select
+from app import changes, db
+from app.models import (Category, EnrichmentJob, Item, STATUS_OPTIONS, DEFAULT_STATUS_OPTIONS,
+                        bump_category_versions)
+
+MAX_IDS = 5000 # per request; larger selections are sent in several
+
+items, categories, jobs = Item.__table__, Category.__table__, EnrichmentJob.__table__
+
+
+def owned_items(user_id, item_ids):
+    """{item id: (category id, list type)} for the given items the user owns."""
+    rows = db.session.execute(
+        select(items.c.id, items.c.category_id, categories.c.type)
+        .join(categories, categories.c.id == items.c.category_id)
+        .where(items.c.id.in_(item_ids), categories.c.user_id == user_id))
+    return {row.id: (row.category_id, row.type) for row in rows}
+
+
+def _touch(item_ids, **values):
+    db.session.execute(items.update().where(items.c.id.in_(list(item_ids)))
+                       .values(version=items.c.version + 1, **values))
+
+
+def set_statuses(user_id, updates):
+    """Applies {item id: status} to the owned items whose list offers that
+    status, with one UPDATE per distinct status. Returns ({item id: status}
+    applied, rejected ids); unknown and other users' ids are rejected."""
+    owned = owned_items(user_id, list(updates))
+    applied = {item_id: updates[item_id] for item_id, (_, list_type) in owned.items()
+               if updates[item_id] in STATUS_OPTIONS.get(list_type, DEFAULT_STATUS_OPTIONS)}
+    by_status = {}
+    for item_id, status in applied.items():
+        by_status.setdefault(status, []).append(item_id)
+    for status, item_ids in by_status.items():
+        _touch(item_ids, status=status)
+    if applied:
+        bump_category_versions(db.session.connection(), {owned[item_id][0] for item_id in applied})
+        changes.log_items(db.session.connection(), user_id, changes.UPDATED,
+                          {item_id: owned[item_id][0] for item_id in applied})
+    return applied, [item_id for item_id in updates if item_id not in applied]
+
+
+def set_status(user_id, item_ids, status):
+    """Sets one `status` on many items; returns (updated ids, rejected ids)."""
+    applied, rejected = set_statuses(user_id, dict.fromkeys(item_ids, status))
+    return sorted(applied), rejected
+
+
+def move(user_id, item_ids, target):
+    """Moves owned items to the user's `target` list (already checked).
+    Statuses the target does not offer become its default. Returns
+    (moved ids, rejected ids); items already in the target count as moved."""
+    owned = owned_items(user_id, item_ids)
+    moving = [item_id for item_id, (category_id, _) in owned.items() if category_id != target.id]
+    if moving:
+        _touch(moving, category_id=target.id,
+               status=case((items.c.status.in_(target.status_options), items.c.status),
+                           else_=target.default_status))
+        # The lists they left and the one they joined
+        bump_category_versions(db.session.connection(),
+                               {owned[item_id][0] for item_id in moving} | {target.id})
+        changes.log_items(db.session.connection(), user_id, changes.UPDATED, dict.fromkeys(moving, target.id))
+    return sorted(owned), [item_id for item_id in item_ids if item_id not in owned]
+
+
+def delete_items(user_id, item_ids):
+    """Deletes owned items and their enrichment jobs. Returns (deleted ids, rejected ids)."""
+    owned = owned_items(user_id, item_ids)
+    if owned:
+        db.session.execute(jobs.delete().where(jobs.c.item_id.in_(list(owned))))
+        db.session.execute(items.delete().where(items.c.id.in_(list(owned))))
+        bump_category_versions(db.session.connection(), {category_id for category_id, _ in owned.values()})
+        changes.log_items(db.session.connection(), user_id, changes.DELETED,
+                          {item_id: category_id for item_id, (category_id, _) in owned.items()})
+    return sorted(owned), [item_id for item_id in item_ids if item_id not in owned]
+
+
+def delete_categories(user_id, category_ids):
+    """Deletes the user's lists among `category_ids` with everything in them.
+    Returns (deleted ids, rejected ids)."""
+    owned = set(db.session.scalars(
+        select(categories.c.id).where(categories.c.id.in_(category_ids), categories.c.user_id == user_id)))
+    if owned:
+        owned_ids = list(owned)
+        in_lists = select(items.c.id).where(items.c.category_id.in_(owned_ids))
+        db.session.execute(jobs.delete().where(jobs.c.item_id.in_(in_lists)))
+        db.session.execute(items.delete().where(items.c.category_id.in_(owned_ids)))
+        db.session.execute(categories.delete().where(categories.c.id.in_(owned_ids)))
+        # One entry per list; clients drop its items with it
+        changes.log_categories(db.session.connection(), user_id, changes.DELETED, owned_ids)
+    return sorted(owned), [category_id for category_id in category_ids if category_id not in owned]
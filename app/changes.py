@@ -0,0 +1,157 @@
+"""Per-user change feed for delta sync between devices.
+
+Every create, update and delete of an item or list appends a ChangeLog
+row in the same transaction as the change itself: ORM writes through the
+after_flush hook below, set-based paths (app/bulk.py, the importer, work
+refreshes) by calling log_items / log_categories directly. The row id is
+the sequence number clients sync from:
+
+    GET /api/v1/changes?since=<seq>
+
+returns the entries after `seq` with the objects' current state, so a
+client catches up in O(changes) rather than reloading whole lists.
+Deleting a list is one 'deleted' entry for the list; its items go with it.
+
+compact() (also `flask compact-changes`) drops entries superseded by a
+newer entry for the same object, which no client needs since every entry
+carries current state, and entries older than the retention period. For
+the latter it raises the user's changes_watermark: a client asking for
+changes since an older sequence must do a full reload first.
+
+Sequence order is commit order on SQLite, whose writers are serialized.
+"""
+from datetime import datetime, timedelta
+import click
+from flask import current_app
+from sqlalchemy import event, func, inspect, literal, select
+from app import db
+from app.models import Category, ChangeLog, Item, User
+
+ITEM, CATEGORY = 'item', 'category'
+CREATED, UPDATED, DELETED = 'created', 'updated', 'deleted'
+
+changes, items, categories, users = (ChangeLog.__table__, Item.__table__,
+                                     Category.__table__, User.__table__)
+
+
+def log_items(connection, user_id, op, item_categories):
+    """Appends one entry per {item id: category id} (executemany)."""
+    now = datetime.utcnow()
+    rows = [{'user_id': user_id, 'kind': ITEM, 'object_id': item_id, 'category_id': category_id,
+             'op': op, 'created_at': now} for item_id, category_id in item_categories.items()]
+    if rows:
+        connection.execute(changes.insert(), rows)
+
+
+def log_categories(connection, user_id, op, category_ids):
+    now = datetime.utcnow()
+    rows = [{'user_id': user_id, 'kind': CATEGORY, 'object_id': category_id, 'category_id': category_id,
+             'op': op, 'created_at': now} for category_id in category_ids]
+    if rows:
+        connection.execute(changes.insert(), rows)
+
+
+def log_work_items(connection, work_id):
+    """An 'updated' entry for every item showing `work_id`, in one INSERT ... SELECT."""
+    rows = (
+        select(categories.c.user_id, literal(ITEM), items.c.id, items.c.category_id,
+               literal(UPDATED), literal(datetime.utcnow()))
+        .select_from(items.join(categories, categories.c.id == items.c.category_id))
+        .where(items.c.work_id == work_id)
+    )
+    connection.execute(changes.insert().from_select(
+        ['user_id', 'kind', 'object_id', 'category_id', 'op', 'created_at'], rows))
+
+
+def _item_or_list_modified(session, obj):
+    if not session.is_modified(obj, include_collections=False):
+        return False
+    state = inspect(obj)
+    # The version counters are bookkeeping and a list's items log their own entries
+    return any(state.attrs[prop.key].history.has_changes() for prop in state.mapper.attrs
+               if prop.key != 'version' and not getattr(prop, 'uselist', False))
+
+
+@event.listens_for(db.session, 'after_flush')
+def _log_flushed_changes(session, flush_context):
+    entries = [] # (kind, object, op)
+    for op, objects in ((CREATED, session.new), (DELETED, session.deleted), (UPDATED, session.dirty)):
+        for obj in objects:
+            if isinstance(obj, (Item, Category)) and (op != UPDATED or _item_or_list_modified(session, obj)):
+                entries.append((ITEM if isinstance(obj, Item) else CATEGORY, obj, op))
+    if not entries:
+        return
+
+    # Owner of every list involved; loaded lists (even just deleted ones) answer without a query
+    owners = {obj.id: obj.user_id for obj in list(session.identity_map.values()) + list(session.deleted)
+              if isinstance(obj, Category) and 'user_id' in obj.__dict__}
+    missing = {obj.category_id for kind, obj, _ in entries if kind == ITEM} - owners.keys()
+    if missing:
+        owners.update(session.connection().execute(
+            select(categories.c.id, categories.c.user_id).where(categories.c.id.in_(list(missing)))).all())
+
+    now = datetime.utcnow()
+    rows = []
+    for kind, obj, op in entries:
+        category_id = obj.category_id if kind == ITEM else obj.id
+        user_id = obj.user_id if kind == CATEGORY else owners.get(category_id)
+        if user_id is not None:
+            rows.append({'user_id': user_id, 'kind': kind, 'object_id': obj.id, 'category_id': category_id,
+                         'op': op, 'created_at': now})
+    if rows:
+        session.connection().execute(changes.insert(), rows)
+
+
+def changes_since(user_id, since, limit):
+    """(entries, next seq, has_more): up to `limit` entries after `since`,
+    oldest first, each object only at its newest entry in the page."""
+    rows = db.session.execute(
+        select(changes.c.id, changes.c.kind, changes.c.object_id, changes.c.category_id, changes.c.op)
+        .where(changes.c.user_id == user_id, changes.c.id > since)
+        .order_by(changes.c.id).limit(limit + 1)
+    ).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    latest = {}
+    for row in rows:
+        latest.pop((row.kind, row.object_id), None)
+        latest[(row.kind, row.object_id)] = row
+    return list(latest.values()), (rows[-1].id if rows else since), has_more
+
+
+def latest_seq(user_id):
+    return db.session.scalar(select(func.max(changes.c.id)).where(changes.c.user_id == user_id)) or 0
+
+
+def compact(retention_days):
+    """Deletes superseded entries and entries older than `retention_days`,
+    raising each affected user's watermark. Returns the number deleted."""
+    connection = db.session.connection()
+    newer = changes.alias('newer')
+    superseded = connection.execute(changes.delete().where(
+        select(newer.c.id).where(newer.c.kind == changes.c.kind, newer.c.object_id == changes.c.object_id,
+                                 newer.c.id > changes.c.id).exists()
+    )).rowcount
+
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    expired = (select(func.max(changes.c.id))
+               .where(changes.c.user_id == users.c.id, changes.c.created_at < cutoff).scalar_subquery())
+    connection.execute(users.update()
+                       .where(expired.isnot(None), expired > users.c.changes_watermark)
+                       .values(changes_watermark=expired))
+    watermark = select(users.c.changes_watermark).where(users.c.id == changes.c.user_id).scalar_subquery()
+    aged = connection.execute(changes.delete().where(changes.c.id <= watermark)).rowcount
+    db.session.commit()
+    return superseded + aged
+
+
+@click.command('compact-changes')
+@click.option('--days', type=int, default=None, help='Keep this many days of history (default CHANGE_LOG_RETENTION_DAYS).')
+def compact_changes_command(days):
+    """Drop superseded and expired change feed entries."""
+    deleted = compact(days if days is not None else current_app.config['CHANGE_LOG_RETENTION_DAYS'])
+    click.echo(f'Deleted {deleted} change feed entries.')
+
+
+def init_app(app):
+    app.cli.add_command(compact_changes_command)
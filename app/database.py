@@ -0,0 +1,53 @@
+"""Engine profiles: pool settings for server databases, pragmas for SQLite.
+
+Flask-SQLAlchemy creates the engine from SQLALCHEMY_ENGINE_OPTIONS in
+db.init_app(), so engine_options() has to fill that in first. The
+pragma listener is attached right after, before the first connection.
+"""
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+
+def is_sqlite(uri):
+    return make_url(uri).get_backend_name() == 'sqlite'
+
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS for the configured database. Explicitly set
+    options win over the DB_POOL_* defaults."""
+    options = {}
+    if not is_sqlite(config['SQLALCHEMY_DATABASE_URI']):
+        options.update(
+            pool_size=config['DB_POOL_SIZE'],
+            max_overflow=config['DB_MAX_OVERFLOW'],
+            pool_timeout=config['DB_POOL_TIMEOUT'],
+            pool_recycle=config['DB_POOL_RECYCLE'],
+            pool_pre_ping=config['DB_POOL_PRE_PING'],
+        )
+    options.update(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    return options
+
+
+def sqlite_pragma_listener(pragmas):
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+    return set_pragmas
+
+
+def configure_engine(app):
+    """Call before db.init_app(app)."""
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+
+
+def init_app(app, db):
+    """Call right after db.init_app(app): installs the SQLite pragmas."""
+    pragmas = app.config.get('SQLITE_PRAGMAS')
+    if not pragmas:
+        return
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name == 'sqlite':
+                event.listen(engine, 'connect', sqlite_pragma_listener(pragmas))
@@ -0,0 +1,199 @@
+"""Background enrichment of newly added items.
+
+add_item stays a fast insert: it only records an EnrichmentJob row in the
+same transaction. A small pool of worker threads per process claims due
+jobs from that table in batches, runs fetch_meta_data once per distinct
+title off the request path and links the Items to the shared Work for the
+resulting page (app/works.py). The job table is the queue, so no
+external broker is needed, and jobs survive restarts.
+"""
+import threading
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import insert, update
+from app import db, suggest
+from app.models import EnrichmentJob
+from app.futurescope.cache import normalize_query
+from app.works import link_item, upsert_work
+
+ENRICHABLE_TYPES = ('watch', 'read')
+ENRICHED_FIELDS = ('info', 'link', 'image_url', 'director', 'year', 'sequel_prequel')
+
+
+def enqueue(item, category):
+    """Adds an enrichment job for `item` to the current session; the caller commits.
+    Returns None for list types that have nothing to look up."""
+    if category.type not in ENRICHABLE_TYPES:
+        return None
+    job = EnrichmentJob(item=item)
+    db.session.add(job)
+    return job
+
+
+def wake(app):
+    pool = app.extensions.get('enrichment')
+    if pool:
+        pool.wake()
+
+
+def apply_metadata(item, data, work=None):
+    """Links the item to the result's shared Work (app/works.py); results
+    without a page URL fill in the item's empty fields instead. Either way
+    nothing the user already set is overwritten."""
+    if work is not None:
+        link_item(item, work)
+        return
+    for field in ENRICHED_FIELDS:
+        if data.get(field) and not getattr(item, field):
+            setattr(item, field, data[field])
+
+
+def enqueue_many(item_ids):
+    """Bulk-inserts one queued job per item id (executemany); the caller commits."""
+    if item_ids:
+        db.session.execute(insert(EnrichmentJob), [{'item_id': item_id} for item_id in item_ids])
+
+
+def claim_jobs(limit=1):
+    """Atomically moves up to `limit` due jobs from queued to running and
+    returns their ids. Safe across threads and processes: the UPDATE only
+    flips rows that are still queued, and the claim token tells us which
+    of them this caller won."""
+    now = datetime.utcnow()
+    candidates = db.session.scalars(
+        db.select(EnrichmentJob.id)
+        .where(EnrichmentJob.status == 'queued', EnrichmentJob.run_after <= now)
+        .order_by(EnrichmentJob.run_after, EnrichmentJob.id)
+        .limit(limit)
+    ).all()
+    if not candidates:
+        db.session.commit()
+        return []
+    token = uuid.uuid4().hex
+    db.session.execute(
+        update(EnrichmentJob)
+        .where(EnrichmentJob.id.in_(candidates), EnrichmentJob.status == 'queued')
+        .values(status='running', attempts=EnrichmentJob.attempts + 1, updated_at=now, claim_token=token)
+    )
+    db.session.commit()
+    return db.session.scalars(db.select(EnrichmentJob.id).where(EnrichmentJob.claim_token == token)).all()
+
+
+def lookup_key(item, category):
+    """Items sharing this key get the same fetch_meta_data result."""
+    from app.futurescope.metadata import get_context_keywords
+
+    return (normalize_query(item.name), category.type, get_context_keywords(category.type, category.name))
+
+
+def run_jobs(job_ids, max_attempts=4, backoff=30):
+    """Runs a batch of claimed jobs. Jobs are grouped by lookup key, so a batch
+    of imported "Dune"s costs one lookup. Returns {job_id: final status}."""
+    from app.futurescope.metadata import fetch_meta_data
+
+    jobs = db.session.scalars(db.select(EnrichmentJob).where(EnrichmentJob.id.in_(job_ids))).all()
+    groups = {}
+    for job in jobs:
+        item = job.item
+        groups.setdefault(lookup_key(item, item.category), []).append(job)
+
+    statuses = {}
+    now = datetime.utcnow()
+    for group in groups.values():
+        item = group[0].item
+        category = item.category
+        try:
+            data = fetch_meta_data(item.name, category.type, category.name, strict=True)
+            # One shared row per page, however many items in the batch (or in the database) share it
+            work = upsert_work(data)
+            error = None
+        except Exception as e:
+            data, work, error = None, None, str(e)[:1000]
+
+        for job in group:
+            job.updated_at = now
+            if error is None:
+                apply_metadata(job.item, data, work)
+                job.status = 'done'
+                job.last_error = None
+            else:
+                job.last_error = error
+                if job.attempts >= max_attempts:
+                    job.status = 'failed'
+                else:
+                    # Exponential backoff: backoff, 2*backoff, 4*backoff, ...
+                    job.status = 'queued'
+                    job.run_after = now + timedelta(seconds=backoff * 2 ** (job.attempts - 1))
+            statuses[job.id] = job.status
+        resolved = [(category.type, work.name)] * len(group) if work is not None else []
+        db.session.commit()
+        # Resolved titles become add-box suggestions for lists of this type
+        suggest.record(resolved)
+    return statuses
+
+
+def requeue_stale_jobs(stale_after):
+    """Puts back jobs left 'running' by a worker that died mid-job."""
+    cutoff = datetime.utcnow() - timedelta(seconds=stale_after)
+    db.session.execute(
+        update(EnrichmentJob)
+        .where(EnrichmentJob.status == 'running', EnrichmentJob.updated_at < cutoff)
+        .values(status='queued', claim_token=None)
+    )
+    db.session.commit()
+
+
+class EnrichmentPool:
+    def __init__(self, app, workers=2, poll_interval=5.0):
+        self.app = app
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+
+    def start(self):
+        for n in range(self.workers):
+            # The first worker also puts back jobs orphaned by a previous process
+            thread = threading.Thread(target=self._run, args=(n == 0,), name=f'enrichment-{n}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def wake(self):
+        self._wakeup.set()
+
+    def stop(self, timeout=None):
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _run(self, requeue_stale=False):
+        config = self.app.config
+        while not self._stopping.is_set():
+            try:
+                with self.app.app_context():
+                    if requeue_stale:
+                        requeue_stale_jobs(config['ENRICHMENT_STALE_AFTER'])
+                        requeue_stale = False
+                    job_ids = claim_jobs(config['ENRICHMENT_BATCH_SIZE'])
+                    if job_ids:
+                        run_jobs(job_ids, max_attempts=config['ENRICHMENT_MAX_ATTEMPTS'],
+                                 backoff=config['ENRICHMENT_BACKOFF'])
+                        continue
+            except Exception as e:
+                self.app.logger.exception('Enrichment worker error: %s', e)
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+
+def init_app(app):
+    workers = app.config.get('ENRICHMENT_WORKERS', 0)
+    if not workers:
+        return None
+    # No queries here: create_app() must not touch the database (the schema
+    # may not exist yet when `flask upgrade-db` builds the app)
+    pool = EnrichmentPool(app, workers=workers, poll_interval=app.config['ENRICHMENT_POLL_INTERVAL'])
+    app.extensions['enrichment'] = pool
+    pool.start()
+    return pool
@@ -0,0 +1,35 @@
+"""Cache of rendered template fragments (list rows, dashboard cards).
+
+Fragments are keyed by the row's id *and* version (Item.version,
+Category.version), which every write bumps, so a mutation never needs to
+delete anything: the next render simply misses on the new version and the
+stale entry ages out of the LRU. A list where one row changed re-renders
+only that row.
+
+Fragments are rendered without the request context processors, so
+everything they show must come from the key's objects.
+"""
+from flask import current_app
+from markupsafe import Markup
+from app.futurescope.cache import MemoryBackend
+
+# Versioned keys never go stale; the TTL only bounds how long a dead entry lingers
+FRAGMENT_TTL = 24 * 3600
+
+
+def init_app(app):
+    max_entries = app.config['FRAGMENT_CACHE_MAX_ENTRIES']
+    app.extensions['fragment_cache'] = MemoryBackend(max_entries) if max_entries > 0 else None
+    app.jinja_env.globals['cached_fragment'] = cached_fragment
+
+
+def cached_fragment(key, template_name, **context):
+    """Renders `template_name` with `context`, or returns the cached HTML for `key`."""
+    cache = current_app.extensions.get('fragment_cache')
+    key = (template_name,) + tuple(key)
+    html = cache.get(key) if cache is not None else None
+    if html is None:
+        html = current_app.jinja_env.get_template(template_name).render(**context)
+        if cache is not None:
+            cache.set(key, html, FRAGMENT_TTL)
+    return Markup(html)
@@ -0,0 +1,236 @@
+"""Cache for fetch_meta_data results.
+
+Two keyspaces share one backend:
+
+* query keys  - normalized title + category type + context keywords -> resolved URL
+                (or a negative entry when no source found anything)
+* page keys   - resolved URL + category type -> scraped metadata, plus the
+                ETag/Last-Modified validators used to revalidate it once stale
+
+so "Dune" typed by a thousand users costs one search and one scrape per TTL.
+"""
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_NEGATIVE_TTL = 3600
+DEFAULT_MAX_ENTRIES = 10000
+# How long a stale page entry is kept so its ETag/Last-Modified can revalidate it
+DEFAULT_REVALIDATE_TTL = 30 * 24 * 3600
+
+
+class MemoryBackend:
+    """In-process LRU dict. Entries expire after their TTL; the least
+    recently used entry is evicted once max_entries is reached."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (value, time.time() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteBackend:
+    """Persistent cache in a SQLite table, shared by every worker process
+    on the host. LRU order is tracked with an accessed_at column."""
+
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        with self._conn:
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS metadata_cache ('
+                ' key TEXT PRIMARY KEY, value TEXT NOT NULL,'
+                ' expires_at REAL NOT NULL, accessed_at REAL NOT NULL)'
+            )
+            self._conn.execute(
+                'CREATE INDEX IF NOT EXISTS ix_metadata_cache_accessed ON metadata_cache (accessed_at)'
+            )
+
+    def get(self, key):
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                'SELECT value, expires_at FROM metadata_cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                self._conn.execute('DELETE FROM metadata_cache WHERE key = ?', (key,))
+                return None
+            self._conn.execute('UPDATE metadata_cache SET accessed_at = ? WHERE key = ?', (now, key))
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO metadata_cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)',
+                (key, json.dumps(value), now + ttl, now),
+            )
+            count = self._conn.execute('SELECT COUNT(*) FROM metadata_cache').fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    'DELETE FROM metadata_cache WHERE key IN ('
+                    ' SELECT key FROM metadata_cache ORDER BY accessed_at LIMIT ?)',
+                    (count - self.max_entries,),
+                )
+
+    def delete(self, key):
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM metadata_cache WHERE key = ?', (key,))
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM metadata_cache')
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM metadata_cache').fetchone()[0]
+
+
+class RedisBackend:
+    """Any Redis-compatible server (Redis, Valkey, KeyDB, a local stand-in).
+    TTLs are native; size-bounded LRU eviction is left to the server's
+    `maxmemory-policy allkeys-lru`."""
+
+    def __init__(self, url, prefix='wishlist:meta:'):
+        import redis  # optional dependency, only needed for this backend
+        self._client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self._client.get(self.prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl):
+        self._client.setex(self.prefix + key, int(ttl), json.dumps(value))
+
+    def delete(self, key):
+        self._client.delete(self.prefix + key)
+
+    def clear(self):
+        for key in self._client.scan_iter(self.prefix + '*'):
+            self._client.delete(key)
+
+
+def normalize_query(query):
+    return re.sub(r'\s+', ' ', query.strip().lower())
+
+
+class MetadataCache:
+    MISS = {'miss': True}
+
+    def __init__(self, backend, ttl=DEFAULT_TTL, negative_ttl=DEFAULT_NEGATIVE_TTL,
+                 revalidate_ttl=DEFAULT_REVALIDATE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.revalidate_ttl = revalidate_ttl
+
+    @staticmethod
+    def query_key(query, category_type, context_keywords):
+        return f"q:{category_type}:{context_keywords.strip()}:{normalize_query(query)}"
+
+    @staticmethod
+    def page_key(url, category_type):
+        return f"u:{category_type}:{url}"
+
+    def get_query(self, query, category_type, context_keywords):
+        """Returns the resolved URL, MISS for a cached negative result, or None if unknown."""
+        value = self.backend.get(self.query_key(query, category_type, context_keywords))
+        if value is None:
+            return None
+        return self.MISS if value.get('miss') else value['url']
+
+    def set_query(self, query, category_type, context_keywords, url):
+        key = self.query_key(query, category_type, context_keywords)
+        if url:
+            self.backend.set(key, {'url': url}, self.ttl)
+        else:
+            self.backend.set(key, self.MISS, self.negative_ttl)
+
+    def get_page(self, url, category_type):
+        """Returns the page entry ({'data', 'etag', 'last_modified', 'fetched_at'}) or None.
+        Entries outlive `ttl` by `revalidate_ttl`; check is_fresh() before using one as-is."""
+        return self.backend.get(self.page_key(url, category_type))
+
+    def is_fresh(self, entry):
+        return time.time() - entry['fetched_at'] < self.ttl
+
+    def set_page(self, url, category_type, data, etag=None, last_modified=None):
+        entry = {'data': dict(data), 'etag': etag, 'last_modified': last_modified, 'fetched_at': time.time()}
+        self.backend.set(self.page_key(url, category_type), entry, self.ttl + self.revalidate_ttl)
+
+    def clear(self):
+        self.backend.clear()
+
+
+_cache = None
+
+
+def configure_cache(backend='memory', url=None, ttl=DEFAULT_TTL, negative_ttl=DEFAULT_NEGATIVE_TTL,
+                    max_entries=DEFAULT_MAX_ENTRIES, revalidate_ttl=DEFAULT_REVALIDATE_TTL):
+    """Installs the process-wide cache used by fetch_meta_data.
+    backend is 'memory', 'sqlite' (url = file path), 'redis' (url = redis://...) or 'none'."""
+    global _cache
+    if backend == 'none':
+        _cache = None
+        return None
+    if backend == 'sqlite':
+        store = SQLiteBackend(url or 'metadata_cache.db', max_entries=max_entries)
+    elif backend == 'redis':
+        store = RedisBackend(url or 'redis://localhost:6379/0')
+    else:
+        store = MemoryBackend(max_entries=max_entries)
+    _cache = MetadataCache(store, ttl=ttl, negative_ttl=negative_ttl, revalidate_ttl=revalidate_ttl)
+    return _cache
+
+
+def get_cache():
+    return _cache
+
+
+def init_app(app):
+    configure_cache(
+        backend=app.config.get('METADATA_CACHE_BACKEND', 'memory'),
+        url=app.config.get('METADATA_CACHE_URL'),
+        ttl=app.config.get('METADATA_CACHE_TTL', DEFAULT_TTL),
+        negative_ttl=app.config.get('METADATA_CACHE_NEGATIVE_TTL', DEFAULT_NEGATIVE_TTL),
+        max_entries=app.config.get('METADATA_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES),
+        revalidate_ttl=app.config.get('METADATA_CACHE_REVALIDATE_TTL', DEFAULT_REVALIDATE_TTL),
+    )
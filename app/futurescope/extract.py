@@ -0,0 +1,203 @@
+"""Page metadata extraction.
+
+Everything the scraper needs lives in two small parts of a page: the
+<head> (title, description and og:image meta tags) and, on Wikipedia, the
+infobox table. The lxml fast path locates those two byte ranges and
+parses only them; BeautifulSoup's html.parser over the whole document
+remains as the fallback when lxml is unavailable or chokes on a page.
+"""
+import logging
+import re
+
+try:
+    from lxml import etree, html as lxml_html
+except ImportError:  # pragma: no cover - lxml is in requirements.txt
+    etree = lxml_html = None
+from app.metrics import stage_timer
+
+log = logging.getLogger(__name__)
+
+EMPTY_RICH_DATA = {'director': None, 'year': None, 'sequel_prequel': None}
+
+
+def infobox_span(lower, start=0):
+    """Byte range (start, end) of the first infobox table in a lower-cased
+    page, matching nested tables. Returns (start, None) while the table is
+    still incomplete and None if no infobox has been seen."""
+    marker = lower.find(b'class="infobox', start)
+    if marker < 0:
+        return None
+    table_start = lower.rfind(b'<table', start, marker)
+    if table_start < 0:
+        return None
+    depth, pos = 0, table_start
+    while True:
+        next_open = lower.find(b'<table', pos)
+        next_close = lower.find(b'</table>', pos)
+        if next_close < 0:
+            return table_start, None
+        if 0 <= next_open < next_close:
+            depth += 1
+            pos = next_open + 6
+        else:
+            depth -= 1
+            pos = next_close + 8
+            if depth == 0:
+                return table_start, pos
+
+
+def infobox_fields(rows, category_type='general'):
+    """Director/author, year and sequel info from (header text, cell text) infobox rows."""
+    data = dict(EMPTY_RICH_DATA)
+    for header_text, cell_text in rows:
+        header_text = header_text.lower()
+        if cell_text is None:
+            continue
+
+        # 1. Director / Author
+        if category_type == 'read':
+            if any(keyword in header_text for keyword in ['author', 'writer', 'created by']):
+                data['director'] = cell_text # Storing Author in director column for now
+        else:
+            if any(keyword in header_text for keyword in ['directed by', 'director', 'created by']):
+                data['director'] = cell_text
+
+        # 2. Year (Release Date or Publication Date)
+        if any(keyword in header_text for keyword in ['release date', 'published', 'publication date']):
+            # Extract just the year if possible
+            match = re.search(r'\d{4}', cell_text)
+            if match:
+                data['year'] = match.group(0)
+
+        # 3. Sequel / Prequel
+        if any(keyword in header_text for keyword in ['followed by', 'preceded by', 'next']):
+            data['sequel_prequel'] = cell_text
+    return data
+
+
+def extract_wiki_infobox(soup, category_type='general'):
+    """Extracts Director, Year, and Sequel info from Wikipedia Infobox."""
+    infobox = soup.find('table', class_='infobox')
+    if not infobox:
+        return dict(EMPTY_RICH_DATA)
+
+    rows = []
+    for row in infobox.find_all('tr'):
+        header = row.find('th')
+        if not header:
+            continue
+        cell = row.find('td')
+        rows.append((header.get_text(strip=True), cell.get_text(strip=True) if cell is not None else None))
+    data = infobox_fields(rows, category_type)
+    log.debug('infobox extracted', extra={'fields': data})
+    return data
+
+
+def clean_title(title):
+    # Clean Title (Remove " - Wikipedia", " - IMDb", etc.)
+    title = re.sub(r' - Wikipedia.*', '', title)
+    return re.sub(r' - IMDb.*', '', title)
+
+
+def build_result(url, title, description, image_url, rich_data):
+    return {
+        'name': str(title).strip()[:100],
+        'info': str(description).strip()[:500],
+        'link': url,
+        'image_url': image_url,
+        'director': rich_data['director'],
+        'year': rich_data['year'],
+        'sequel_prequel': rich_data['sequel_prequel']
+    }
+
+
+def extract_with_soup(body, url, category_type='general', original_query=''):
+    """Reference path: a full BeautifulSoup tree of the whole document."""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(body, 'html.parser')
+    title = soup.title.string if soup.title else original_query
+    title = clean_title(title)
+
+    description = ""
+    meta_desc = soup.find('meta', attrs={'name': 'description'}) or soup.find('meta', attrs={'property': 'og:description'})
+    if meta_desc:
+        description = meta_desc.get('content', '')
+
+    image_url = None
+    og_image = soup.find('meta', attrs={'property': 'og:image'})
+    if og_image:
+        image_url = og_image.get('content')
+
+    rich_data = dict(EMPTY_RICH_DATA)
+    if 'wikipedia.org' in url:
+        with stage_timer('infobox'):
+            rich_data = extract_wiki_infobox(soup, category_type=category_type)
+    return build_result(url, title, description, image_url, rich_data)
+
+
+def _text(element):
+    # Same as BeautifulSoup's get_text(strip=True); <style>/<script> are
+    # stripped from the infobox first, as get_text() skips them
+    return ''.join(part.strip() for part in element.itertext())
+
+
+def _meta_content(head, attr, value):
+    found = head.xpath(f'.//meta[@{attr}="{value}"]/@content')
+    return found[0] if found else None
+
+
+def extract_with_lxml(body, url, category_type='general', original_query=''):
+    """Fast path: parses only the <head> and the infobox table with lxml."""
+    lower = body.lower()
+    head_end = lower.find(b'</head>')
+    head_bytes = body[:head_end + 7] + b'</html>' if head_end >= 0 else body
+    head = lxml_html.document_fromstring(head_bytes)
+
+    titles = head.xpath('//title')
+    title = titles[0].text if titles else original_query
+    title = clean_title(title)
+
+    description = _meta_content(head, 'name', 'description') or _meta_content(head, 'property', 'og:description') or ""
+    image_url = _meta_content(head, 'property', 'og:image')
+
+    rich_data = dict(EMPTY_RICH_DATA)
+    if 'wikipedia.org' in url:
+        rich_data = _lxml_infobox(body, lower, head_end, category_type)
+    return build_result(url, title, description, image_url, rich_data)
+
+
+def _lxml_infobox(body, lower, head_end, category_type):
+    with stage_timer('infobox'):
+        span = infobox_span(lower, max(head_end, 0))
+        if span and span[1] is not None:
+            infobox = lxml_html.fragment_fromstring(body[span[0]:span[1]])
+        else:
+            # Unusual markup (e.g. class="vcard infobox"): search the whole document
+            found = lxml_html.document_fromstring(body).xpath(
+                '//table[contains(concat(" ", normalize-space(@class), " "), " infobox ")]')
+            infobox = found[0] if found else None
+        if infobox is None:
+            return dict(EMPTY_RICH_DATA)
+        # TemplateStyles put <style> inside cells; keep the text after them
+        etree.strip_elements(infobox, 'style', 'script', with_tail=False)
+        rows = []
+        for row in infobox.iter('tr'):
+            header = row.find('.//th')
+            if header is None:
+                continue
+            cell = row.find('.//td')
+            rows.append((_text(header), _text(cell) if cell is not None else None))
+        rich_data = infobox_fields(rows, category_type)
+    log.debug('infobox extracted', extra={'fields': rich_data})
+    return rich_data
+
+
+def extract_page(body, url, category_type='general', original_query=''):
+    """Extracts scraper metadata from raw page bytes, preferring the lxml fast path."""
+    if lxml_html is not None:
+        try:
+            return extract_with_lxml(body, url, category_type, original_query)
+        except Exception as e:
+            log.info('lxml extraction failed, falling back to BeautifulSoup', extra={'url': url, 'error': repr(e)})
+    return extract_with_soup(body, url, category_type, original_query)
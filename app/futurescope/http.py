@@ -0,0 +1,195 @@
+"""Shared HTTP client for the scraper.
+
+One requests.Session per process, so connections to en.wikipedia.org and
+friends are kept alive and reused instead of paying a TCP+TLS handshake
+per scrape. urllib3's connection pools are thread-safe; the session is
+shared read-only (cookies are never stored) by every enrichment and
+source-lookup thread.
+"""
+import threading
+from http.cookiejar import DefaultCookiePolicy
+
+USER_AGENT = 'Mozilla/5.0'
+POOL_HOSTS = 16 # distinct hosts kept in the pool
+POOL_PER_HOST = 4 # concurrent connections per host; extra callers wait for a free one
+MAX_PAGE_BYTES = 2 * 1024 * 1024
+MAX_IMAGE_BYTES = 10 * 1024 * 1024 # source images for app/thumbnails.py
+CHUNK_SIZE = 16 * 1024
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                # Imported on first use; requests is not needed to serve pages
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=POOL_HOSTS, pool_maxsize=POOL_PER_HOST, pool_block=True)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                session.headers['User-Agent'] = USER_AGENT
+                session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+                _session = session
+    return _session
+
+
+# Statuses meaning "slow down / blocked": they count as source failures
+THROTTLED_STATUSES = (429, 503)
+
+
+class Throttled(Exception):
+    def __init__(self, url, status_code):
+        super().__init__(f'{url} answered {status_code}')
+        self.status_code = status_code
+
+
+class Page:
+    def __init__(self, url, status_code, body=b'', etag=None, last_modified=None, truncated=False):
+        self.url = url
+        self.status_code = status_code
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.truncated = truncated
+
+    @property
+    def not_modified(self):
+        return self.status_code == 304
+
+
+class HeadScanner:
+    """Decides when enough of a page has been read: the whole <head>, plus the
+    Wikipedia infobox table when one is wanted. Wikipedia always places the
+    infobox before the first section heading, so an <h2> without one means
+    there is no infobox to wait for.
+
+    complete() is called once per chunk with the growing body and remembers
+    how far it has searched, so each call only looks at the new bytes (less
+    the length of a tag that may have been cut at the end of the last chunk)."""
+
+    def __init__(self, want_infobox=False):
+        self.want_infobox = want_infobox
+        self._head_end = None
+        self._scanned = 0 # searched up to here for '</head>', then for the infobox or an <h2>
+        self._table_pos = None # inside the infobox: tags before here are counted in _depth
+        self._depth = 0
+
+    def complete(self, lower):
+        """`lower` is the lower-cased body read so far."""
+        if self._head_end is None:
+            head_end = lower.find(b'</head>', max(0, self._scanned - len(b'</head>') + 1))
+            if head_end < 0:
+                self._scanned = len(lower)
+                return False
+            self._head_end = self._scanned = head_end
+        if not self.want_infobox:
+            return True
+        if self._table_pos is None:
+            return self._find_infobox(lower)
+        return self._table_closed(lower)
+
+    def _find_infobox(self, lower):
+        while True:
+            start = max(self._head_end, self._scanned - len(b'class="infobox') + 1)
+            marker = lower.find(b'class="infobox', start)
+            if lower.find(b'<h2', start, marker if marker >= 0 else len(lower)) >= 0:
+                return True
+            if marker < 0:
+                self._scanned = len(lower)
+                return False
+            # The table the marker is on, as extract.infobox_span() picks it
+            table_start = lower.rfind(b'<table', self._head_end, marker)
+            if table_start >= 0:
+                self._table_pos = table_start
+                return self._table_closed(lower)
+            self._scanned = marker + len(b'class="infobox')
+
+    def _table_closed(self, lower):
+        # Infoboxes may nest tables; wait for the matching </table>
+        while True:
+            next_open = lower.find(b'<table', self._table_pos)
+            next_close = lower.find(b'</table>', self._table_pos)
+            if next_close < 0:
+                if next_open < 0:
+                    self._table_pos = max(self._table_pos, len(lower) - len(b'</table>') + 1)
+                    return False
+                next_close = len(lower) # count the opening tag; the close has not arrived
+            if 0 <= next_open < next_close:
+                self._depth += 1
+                self._table_pos = next_open + 6
+            else:
+                self._depth -= 1
+                self._table_pos = next_close + 8
+                if self._depth == 0:
+                    return True
+
+
+def fetch_page(url, timeout=10, etag=None, last_modified=None, want_infobox=False, max_bytes=MAX_PAGE_BYTES):
+    """GETs `url`, revalidating with If-None-Match / If-Modified-Since when
+    validators from an earlier fetch are given (a 304 comes back with an
+    empty body). The body is streamed and reading stops as soon as the head
+    (and infobox, if wanted) has arrived, or at max_bytes; `truncated` is
+    set only when max_bytes cut the page short. Statuses other than 200 and
+    304 raise (requests.HTTPError), so error pages are never parsed or cached."""
+    headers = {}
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+
+    scanner = HeadScanner(want_infobox)
+    with get_session().get(url, headers=headers, timeout=timeout, stream=True) as resp:
+        if resp.status_code in THROTTLED_STATUSES:
+            raise Throttled(url, resp.status_code)
+        page = Page(resp.url, resp.status_code,
+                    etag=resp.headers.get('ETag'), last_modified=resp.headers.get('Last-Modified'))
+        if page.not_modified:
+            return page
+        resp.raise_for_status()
+
+        body, lower = bytearray(), bytearray()
+        for chunk in resp.iter_content(CHUNK_SIZE):
+            body += chunk
+            lower += chunk.lower()
+            if len(body) >= max_bytes:
+                page.truncated = True
+                break
+            if scanner.complete(lower):
+                break
+        page.body = bytes(body[:max_bytes])
+    return page
+
+
+def url_exists(url, timeout=5):
+    """HEAD request following redirects; no body is downloaded."""
+    status_code = get_session().head(url, timeout=timeout, allow_redirects=True).status_code
+    if status_code in THROTTLED_STATUSES:
+        raise Throttled(url, status_code)
+    return status_code == 200
+
+
+class NotAnImage(Exception):
+    pass
+
+
+def fetch_image(url, timeout=10, max_bytes=MAX_IMAGE_BYTES):
+    """GETs an image; raises NotAnImage for a non-image response or one over max_bytes."""
+    with get_session().get(url, timeout=timeout, stream=True) as resp:
+        if resp.status_code in THROTTLED_STATUSES:
+            raise Throttled(url, resp.status_code)
+        resp.raise_for_status()
+        content_type = resp.headers.get('Content-Type', '')
+        if not content_type.startswith('image/'):
+            raise NotAnImage(f'{url} is {content_type or "untyped"}')
+        body = bytearray()
+        for chunk in resp.iter_content(CHUNK_SIZE):
+            body += chunk
+            if len(body) > max_bytes:
+                raise NotAnImage(f'{url} is over {max_bytes} bytes')
+    return bytes(body)
@@ -0,0 +1,225 @@
+"""Rate limiting and circuit breaking for the external metadata sources.
+
+Every outbound call goes through a Provider: a token bucket (shared by all
+threads of the process) spaces calls out, and a circuit breaker stops
+calling a source that keeps failing (blocked, rate-limited, timing out)
+for a cool-down window, after which a single trial call decides whether
+it closes again. A call that cannot get a token quickly, or hits an open
+circuit, raises SourceUnavailable at once instead of stalling the worker.
+
+Search engines are providers by name (ddgs, google); pages are fetched
+through one provider per host, with wikipedia.org hosts sharing one.
+"""
+import threading
+import time
+from urllib.parse import urlsplit
+
+# name: (calls per second, burst)
+DEFAULT_RATE_LIMITS = {
+    'ddgs': (1.0, 3),
+    'google': (0.2, 2),
+    'wikipedia': (10.0, 20),
+}
+DEFAULT_HOST_RATE = (2.0, 5)  # any other page host
+DEFAULT_FAILURE_THRESHOLD = 3  # consecutive failures before the circuit opens
+DEFAULT_COOLDOWN = 300  # seconds an open circuit skips the source
+DEFAULT_MAX_WAIT = 1.0  # longest a caller waits for a token
+
+
+class SourceUnavailable(Exception):
+    """The source was skipped: its circuit is open or it is over its rate limit."""
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, max_wait=0.0):
+        """Takes a token, waiting up to max_wait seconds for one. Returns False if none came."""
+        deadline = time.monotonic() + max_wait
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate if self.rate > 0 else max_wait
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, failure_threshold=DEFAULT_FAILURE_THRESHOLD, cooldown=DEFAULT_COOLDOWN):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN and not self._trial_running:
+                # Exactly one trial call; everyone else keeps skipping until it reports back
+                self._trial_running = True
+                return True
+            return False
+
+    def release_trial(self):
+        """The half-open trial call never ran; let the next caller make it."""
+        with self._lock:
+            self._trial_running = False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        """Returns True if this failure opened the circuit."""
+        with self._lock:
+            self.consecutive_failures += 1
+            self._trial_running = False
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                opened = self.state != self.OPEN
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                return opened
+            return False
+
+    def retry_in(self):
+        if self.state != self.OPEN:
+            return 0.0
+        return max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+
+
+class Provider:
+    def __init__(self, name, rate, burst, failure_threshold=DEFAULT_FAILURE_THRESHOLD,
+                 cooldown=DEFAULT_COOLDOWN, max_wait=DEFAULT_MAX_WAIT):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(failure_threshold, cooldown)
+        self.max_wait = max_wait
+        self.counters = {'calls': 0, 'successes': 0, 'failures': 0, 'short_circuited': 0,
+                         'throttled': 0, 'circuit_opened': 0}
+        self.last_error = None
+        self._lock = threading.Lock()
+
+    def _count(self, counter):
+        with self._lock:
+            self.counters[counter] += 1
+
+    def call(self, fn, *args, **kwargs):
+        """Runs fn(*args, **kwargs) under this provider's limits. Any exception
+        counts as a failure and is re-raised; SourceUnavailable means fn was not called."""
+        if not self.breaker.allow():
+            self._count('short_circuited')
+            raise SourceUnavailable(f'{self.name}: circuit open, retry in {self.breaker.retry_in():.0f}s')
+        if not self.bucket.acquire(self.max_wait):
+            # Not a failure of the source
+            self.breaker.release_trial()
+            self._count('throttled')
+            raise SourceUnavailable(f'{self.name}: rate limit reached')
+        self._count('calls')
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            self.last_error = f'{type(e).__name__}: {e}'[:200]
+            self._count('failures')
+            if self.breaker.record_failure():
+                self._count('circuit_opened')
+            raise
+        self._count('successes')
+        self.breaker.record_success()
+        return result
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+        return {
+            'state': self.breaker.state,
+            'consecutive_failures': self.breaker.consecutive_failures,
+            'retry_in': round(self.breaker.retry_in(), 1),
+            'rate': self.bucket.rate,
+            'burst': self.bucket.capacity,
+            'last_error': self.last_error,
+            **counters,
+        }
+
+
+_providers = {}
+_providers_lock = threading.Lock()
+_settings = {
+    'rate_limits': dict(DEFAULT_RATE_LIMITS),
+    'host_rate': DEFAULT_HOST_RATE,
+    'failure_threshold': DEFAULT_FAILURE_THRESHOLD,
+    'cooldown': DEFAULT_COOLDOWN,
+    'max_wait': DEFAULT_MAX_WAIT,
+}
+
+
+def configure(rate_limits=None, host_rate=None, failure_threshold=None, cooldown=None, max_wait=None):
+    """Replaces the settings and drops existing providers (their state and counters)."""
+    with _providers_lock:
+        if rate_limits is not None:
+            _settings['rate_limits'] = dict(DEFAULT_RATE_LIMITS, **rate_limits)
+        for key, value in (('host_rate', host_rate), ('failure_threshold', failure_threshold),
+                           ('cooldown', cooldown), ('max_wait', max_wait)):
+            if value is not None:
+                _settings[key] = value
+        _providers.clear()
+
+
+def get_provider(name):
+    provider = _providers.get(name)
+    if provider is None:
+        with _providers_lock:
+            provider = _providers.get(name)
+            if provider is None:
+                rate, burst = _settings['rate_limits'].get(name, _settings['host_rate'])
+                provider = Provider(name, rate, burst, _settings['failure_threshold'],
+                                    _settings['cooldown'], _settings['max_wait'])
+                _providers[name] = provider
+    return provider
+
+
+def provider_for_url(url):
+    host = (urlsplit(url).hostname or '').lower()
+    if host == 'wikipedia.org' or host.endswith('.wikipedia.org'):
+        return get_provider('wikipedia')
+    return get_provider(host)
+
+
+def stats():
+    """{provider name: state and counters} for every provider used so far."""
+    with _providers_lock:
+        providers = list(_providers.values())
+    return {provider.name: provider.stats() for provider in providers}
+
+
+def init_app(app):
+    configure(
+        rate_limits=app.config.get('METADATA_SOURCE_RATE_LIMITS'),
+        failure_threshold=app.config.get('METADATA_SOURCE_FAILURE_THRESHOLD'),
+        cooldown=app.config.get('METADATA_SOURCE_COOLDOWN'),
+        max_wait=app.config.get('METADATA_SOURCE_MAX_WAIT'),
+    )
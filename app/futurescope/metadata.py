@@ -1,206 +1,286 @@
-import requests
-from bs4 import BeautifulSoup
-from duckduckgo_search import DDGS
-from googlesearch import search
-import sys
+# duckduckgo_search and googlesearch (which pulls in bs4 and requests) are
+# imported inside the source functions: they are only needed by the
+# enrichment workers and would otherwise add ~150 ms to every process start.
+import logging
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from app.futurescope.cache import MetadataCache, get_cache
+from app.futurescope.extract import extract_page, extract_wiki_infobox  # noqa: F401 (extract_wiki_infobox kept importable from here)
+from app.futurescope.http import fetch_page, url_exists
+from app.futurescope.limits import SourceUnavailable, get_provider, provider_for_url
+from app.metrics import stage_timer
 
-def extract_wiki_infobox(soup, category_type='general'):
-    """Extracts Director, Year, and Sequel info from Wikipedia Infobox."""
-    data = {'director': None, 'year': None, 'sequel_prequel': None}
-    
-    infobox = soup.find('table', class_='infobox')
-    if not infobox:
-        return data
-
-    rows = infobox.find_all('tr')
-    for row in rows:
-        header = row.find('th')
-        if not header:
-            continue
-        header_text = header.get_text(strip=True).lower()
-        
-        # 1. Director / Author
-        if category_type == 'read':
-             if any(keyword in header_text for keyword in ['author', 'writer', 'created by']):
-                data['director'] = row.find('td').get_text(strip=True) # Storing Author in director column for now
-        else:
-            if any(keyword in header_text for keyword in ['directed by', 'director', 'created by']):
-                data['director'] = row.find('td').get_text(strip=True)
-
-        # 2. Year (Release Date or Publication Date)
-        if any(keyword in header_text for keyword in ['release date', 'published', 'publication date']):
-             # Extract just the year if possible
-             cell_text = row.find('td').get_text(strip=True)
-             match = re.search(r'\d{4}', cell_text)
-             if match:
-                 data['year'] = match.group(0)
-        
-        # 3. Sequel / Prequel
-        if any(keyword in header_text for keyword in ['followed by', 'preceded by', 'next']):
-             data['sequel_prequel'] = row.find('td').get_text(strip=True)
+log = logging.getLogger(__name__)
 
-    print(f"DEBUG: Extracted Wiki Data: {data}", file=sys.stderr)
-    return data
+class MetadataFetchError(Exception):
+    """Raised by fetch_meta_data(strict=True) when a resolved page could not be scraped."""
 
-def fetch_meta_data(query, category_type='general', category_name=''):
-    query = query.strip()
-    original_query = query
-    
-    # Context logic reinstated per user request
-    context_keywords = ""
+class SourcesUnavailable(MetadataFetchError):
+    """resolve_url found nothing, but some sources were skipped or failed, so
+    "no such title" cannot be concluded (and must not be cached)."""
+
+def get_context_keywords(category_type='general', category_name=''):
+    """Extra search words that steer results towards the right medium."""
     cat_name_lower = category_name.lower()
     
     if category_type == 'read':
         if 'manga' in cat_name_lower:
-            context_keywords = " manga"
+            return " manga"
         elif 'comic' in cat_name_lower:
-             context_keywords = " comic"
-        else:
-            context_keywords = " novel book"
+            return " comic"
+        return " novel book"
             
     elif category_type == 'watch':
         if 'anime' in cat_name_lower:
-            context_keywords = " anime"
+            return " anime"
         elif 'series' in cat_name_lower or 'show' in cat_name_lower:
-             context_keywords = " tv series"
-        else:
-            context_keywords = " film movie"
-        
-    print(f"DEBUGGING: Query='{query}', Type='{category_type}', List='{category_name}'", file=sys.stderr)
-    
+            return " tv series"
+        return " film movie"
+    return ""
+
+def build_search_query(query, category_type, context_keywords):
     # Only append if not a URL and keywords not already present (basic check)
-    if not re.match(r'^https?://', query):
-        clean_check = query.lower()
-        should_append = True
-        
-        # Check if context already exists in query to avoid duplication
-        # Simple check: if any word from context is in query, skip? 
-        # Better: Check specific main keywords
-        if category_type == 'read':
-             if 'book' in clean_check or 'novel' in clean_check or 'manga' in clean_check or 'comic' in clean_check:
-                 should_append = False
-        elif category_type == 'watch':
-             if 'movie' in clean_check or 'film' in clean_check or 'series' in clean_check or 'anime' in clean_check:
-                 should_append = False
-                 
-        if should_append and context_keywords:
-             print(f"DEBUG: Appending context: '{context_keywords}'", file=sys.stderr)
-             query = f"{query}{context_keywords}"
-        else:
-             print(f"DEBUG: Context skipped (already present or none)", file=sys.stderr)
+    if re.match(r'^https?://', query):
+        return query
+
+    clean_check = query.lower()
+    should_append = True
     
+    # Check if context already exists in query to avoid duplication
+    # Simple check: if any word from context is in query, skip? 
+    # Better: Check specific main keywords
+    if category_type == 'read':
+         if 'book' in clean_check or 'novel' in clean_check or 'manga' in clean_check or 'comic' in clean_check:
+             should_append = False
+    elif category_type == 'watch':
+         if 'movie' in clean_check or 'film' in clean_check or 'series' in clean_check or 'anime' in clean_check:
+             should_append = False
+             
+    if should_append and context_keywords:
+         log.debug('search context appended', extra={'context': context_keywords})
+         return f"{query}{context_keywords}"
+    log.debug('search context skipped')
+    return query
+
+# Sources are raced concurrently; this bounds the whole URL resolution step
+RESOLVE_DEADLINE = 8.0
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='metadata-source')
+
+GUESS_RANK = 4 # after every rank_url() value
+
+def rank_url(url):
+    """Source quality: wikipedia > imdb/tmdb > myanimelist/kitsu > anything else."""
+    if 'wikipedia.org' in url:
+        return 0
+    if 'imdb.com' in url or 'themoviedb.org' in url:
+        return 1
+    if 'myanimelist.net' in url or 'kitsu.io' in url:
+        return 2
+    return 3
+
+def search_ddgs(query, cancelled):
+    # Priority 1: DuckDuckGo Search (Robust, handles typos)
+    from duckduckgo_search import DDGS
+
+    log.debug('search start', extra={'source': 'ddgs', 'query': query})
+    best = None
+    # Iterate more results to find relevant one
+    for res in DDGS().text(query, region='us-en', max_results=5):
+        if cancelled.is_set():
+            break
+        href = res.get('href', '')
+        log.debug('search candidate', extra={'source': 'ddgs', 'url': href})
+        if href and (best is None or rank_url(href) < rank_url(best)):
+            best = href
+            if rank_url(best) == 0:
+                break
+    return best
+
+def search_google(query, cancelled):
+    # Priority 2: Google Search (Legacy/Backup - often blocked)
+    from googlesearch import search
+
+    log.debug('search start', extra={'source': 'google', 'query': query})
     target_url = None
-    print(f"DEBUG: Final Processing query: {query}", file=sys.stderr)
+    # Note: googlesearch.search returns a generator
+    for j in search(query, num_results=5, sleep_interval=1, lang="en"):
+        if cancelled.is_set():
+            break
+        if 'wikipedia.org' in j or 'imdb.com' in j:
+             target_url = j
+             break
+        if not target_url: target_url = j
+    return target_url
+
+def guess_wikipedia(original_query, cancelled):
+    # Priority 3: Wikipedia Guess, only used when no search found anything
+    wiki_url = f"https://en.wikipedia.org/wiki/{original_query.title().replace(' ', '_')}"
+    log.debug('search start', extra={'source': 'wikipedia', 'url': wiki_url})
+    if url_exists(wiki_url, timeout=5):
+        return wiki_url
+    return None
+
+def timed_search(source, fn, arg, cancelled):
+    with stage_timer('search', source):
+        return fn(arg, cancelled)
+
+def resolve_url(query, original_query, deadline=None):
+    """Finds the best page for a title by racing DuckDuckGo, Google and a
+    Wikipedia guess under one deadline.
+
+    Search hits are ordered by (rank_url, source order), so a DuckDuckGo
+    Wikipedia hit beats a Google one. The guess is a blind Title_Case
+    article name and ranks below every search hit (GUESS_RANK): it only
+    wins when neither search found anything. The winner is returned as
+    soon as no pending source could still beat it; slower lookups are told
+    to stop and their results are ignored.
+
+    Each source runs under its provider's rate limit and circuit breaker
+    (app/futurescope/limits.py). If nothing is found and any source was
+    skipped or failed, SourcesUnavailable is raised instead of returning None.
+    """
+    deadline = RESOLVE_DEADLINE if deadline is None else deadline
+    cancelled = threading.Event()
+    sources = [  # (name, fn, argument, best rank it can produce)
+        ('ddgs', search_ddgs, query, 0),
+        ('google', search_google, query, 0),
+        ('wikipedia', guess_wikipedia, original_query, GUESS_RANK),
+    ]
+    futures = {
+        _executor.submit(get_provider(name).call, timed_search, name, fn, arg, cancelled): order
+        for order, (name, fn, arg, _) in enumerate(sources)
+    }
+    pending = set(futures)
+    best = None  # (rank, source order, url)
+    inconclusive = False  # a source was skipped or failed
+    expires = time.monotonic() + deadline
+
+    try:
+        while pending:
+            # Decidable once no pending source could produce a better (rank, source order)
+            if best and all((sources[futures[f]][3], futures[f]) > best[:2] for f in pending):
+                break
+            remaining = expires - time.monotonic()
+            if remaining <= 0:
+                log.debug('resolve deadline reached', extra={'deadline': deadline})
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                source = sources[futures[future]][0]
+                try:
+                    url = future.result()
+                except SourceUnavailable as e:
+                    log.info('source skipped', extra={'source': source, 'reason': str(e)})
+                    inconclusive = True
+                    continue
+                except Exception as e:
+                    log.warning('source failed', extra={'source': source, 'error': repr(e)})
+                    inconclusive = True
+                    continue
+                if url:
+                    log.debug('source found', extra={'source': source, 'url': url})
+                    candidate = (max(sources[futures[future]][3], rank_url(url)), futures[future], url)
+                    if best is None or candidate < best:
+                        best = candidate
+    finally:
+        cancelled.set()
+        for future in pending:
+            future.cancel()
+
+    if best:
+        log.debug('resolve selected', extra={'url': best[2]})
+        return best[2]
+    if inconclusive:
+        raise SourcesUnavailable(f"No URL for {original_query!r}; some sources were unavailable")
+    return None
+
+def scrape_page(target_url, category_type='general', original_query='', cached=None):
+    """Scrapes title, description, image and infobox data.
+
+    Returns (data, validators); data is None if the page could not be
+    fetched/parsed. `cached` is an earlier page-cache entry whose ETag /
+    Last-Modified are used to revalidate; on a 304 its data is reused.
+    """
+    cached = cached or {}
+    try:
+        log.debug('scrape start', extra={'url': target_url})
+        with stage_timer('fetch'):
+            page = provider_for_url(target_url).call(
+                fetch_page, target_url, timeout=10, etag=cached.get('etag'),
+                last_modified=cached.get('last_modified'),
+                want_infobox='wikipedia.org' in target_url)
+        validators = {'etag': page.etag or cached.get('etag'),
+                      'last_modified': page.last_modified or cached.get('last_modified')}
+        if page.not_modified and cached.get('data'):
+            log.debug('scrape not modified', extra={'url': target_url})
+            return cached['data'], validators
+        with stage_timer('parse'):
+            result = extract_page(page.body, target_url, category_type=category_type, original_query=original_query)
+        log.debug('scrape done', extra={'url': target_url, 'title': result['name'],
+                                        'has_image': bool(result['image_url'])})
+        return result, validators
+    except Exception as e:
+        log.warning('scrape failed', extra={'url': target_url, 'error': repr(e)})
+        return None, {}
+
+def fetch_meta_data(query, category_type='general', category_name='', strict=False):
+    """Looks up title, description, image and infobox data for a title or URL.
+
+    On a scrape failure the bare query is returned, unless strict=True, in which
+    case MetadataFetchError is raised so callers (the enrichment queue) can retry.
+    """
+    query = query.strip()
+    original_query = query
     
+    # Context logic reinstated per user request
+    context_keywords = get_context_keywords(category_type, category_name)
+    query = build_search_query(query, category_type, context_keywords)
+    log.debug('lookup start', extra={'query': original_query, 'search_query': query,
+                                     'category_type': category_type, 'category_name': category_name})
+    
+    cache = get_cache()
+    is_url = bool(re.match(r'^https?://', original_query))
+
     # 1. Determine URL
-    if not re.match(r'^https?://', original_query):
-        
-        # Priority 1: DuckDuckGo Search (Robust, handles typos)
-        try:
-            print(f"DEBUG: Searching via DuckDuckGo (DDGS) for: {query}", file=sys.stderr)
-            # Iterate more results to find relevant one
-            ddgs_gen = DDGS().text(query, region='us-en', max_results=5)
-            found_candidate = None
-            
-            for res in ddgs_gen:
-                href = res.get('href', '')
-                print(f"DEBUG: DDGS Candidate: {href}", file=sys.stderr)
-                
-                # Check for high quality sources
-                if 'wikipedia.org' in href:
-                    target_url = href
-                    break
-                elif 'imdb.com' in href or 'themoviedb.org' in href:
-                    if not target_url: target_url = href # Keep as backup if no wiki found yet
-                elif 'myanimelist.net' in href or 'kitsu.io' in href:
-                     if not target_url: target_url = href
-                elif not target_url:
-                     # Store first result as last resort
-                     found_candidate = href
-            
-            # If no specific high-quality match, use the first candidate
-            if not target_url and found_candidate:
-                target_url = found_candidate
-                print("DEBUG: Using generic first result from DDGS", file=sys.stderr)
-                
-            if target_url:
-                print(f"DEBUG: Selected URL via DDGS: {target_url}", file=sys.stderr)
-
-        except Exception as e:
-            print(f"DEBUG: DDGS Search failed: {e}", file=sys.stderr)
-
-        # Priority 2: Google Search (Legacy/Backup - often blocked)
-        if not target_url:
+    target_url = original_query if is_url else None
+    if not is_url:
+        cached_url = cache.get_query(original_query, category_type, context_keywords) if cache else None
+        if cached_url is MetadataCache.MISS:
+            log.debug('lookup cached miss', extra={'query': original_query})
+        elif cached_url:
+            target_url = cached_url
+        else:
             try:
-                print("DEBUG: Searching Google (Backup)...", file=sys.stderr)
-                # Note: googlesearch.search returns a generator
-                for j in search(query, num_results=5, sleep_interval=1, lang="en"):
-                    if 'wikipedia.org' in j or 'imdb.com' in j:
-                         target_url = j
-                         break
-                    if not target_url: target_url = j
-                
-                if target_url:
-                     print(f"DEBUG: Found URL via Google: {target_url}", file=sys.stderr)
-
-            except Exception as e:
-                print(f"DEBUG: Google Search failed ({e}).", file=sys.stderr)
-
-        # Priority 3: Wikipedia Guess
-        if not target_url:
-             wiki_url = f"https://en.wikipedia.org/wiki/{original_query.title().replace(' ', '_')}"
-             print(f"DEBUG: Guessing Wikipedia URL: {wiki_url}", file=sys.stderr)
-             try:
-                 if requests.get(wiki_url, timeout=5).status_code == 200:
-                    target_url = wiki_url
-             except: pass
+                target_url = resolve_url(query, original_query)
+            except SourcesUnavailable as e:
+                # Not a real miss: don't cache it, and let the enrichment queue retry later
+                log.info('lookup inconclusive', extra={'query': original_query, 'reason': str(e)})
+                if strict:
+                    raise
+            else:
+                if cache:
+                    # Misses are cached too (with the shorter negative TTL)
+                    cache.set_query(original_query, category_type, context_keywords, target_url)
     
     if not target_url:
         return {'name': original_query, 'info': '', 'link': '', 'image_url': None, 'director':None, 'year':None, 'sequel_prequel':None}
         
     # 2. Scrape Meta
-    try:
-        print(f"DEBUG: Scrape URL: {target_url}", file=sys.stderr)
-        headers = {'User-Agent': 'Mozilla/5.0'}
-        resp = requests.get(target_url, headers=headers, timeout=10)
-        soup = BeautifulSoup(resp.content, 'html.parser')
-
-        # 3. Extract Basic Data
-        title = soup.title.string if soup.title else original_query
-        # Clean Title (Remove " - Wikipedia", " - IMDb", etc.)
-        title = re.sub(r' - Wikipedia.*', '', title)
-        title = re.sub(r' - IMDb.*', '', title)
-        
-        description = ""
-        meta_desc = soup.find('meta', attrs={'name': 'description'}) or soup.find('meta', attrs={'property': 'og:description'})
-        if meta_desc:
-            description = meta_desc.get('content', '')
-        
-        # Image
-        image_url = None
-        og_image = soup.find('meta', attrs={'property': 'og:image'})
-        if og_image:
-             image_url = og_image.get('content')
-        
-        # 4. Extract Rich Data (Wikipedia Specific)
-        rich_data = {'director': None, 'year': None, 'sequel_prequel': None}
-        if 'wikipedia.org' in target_url:
-            rich_data = extract_wiki_infobox(soup, category_type=category_type)
-            print(f"DEBUG: Extracted Wiki Data: {rich_data}", file=sys.stderr)
-
-        print(f"DEBUG: Scraped - Title: {title}, Image: {bool(image_url)}", file=sys.stderr)
-
-        return {
-            'name': str(title).strip()[:100], 
-            'info': str(description).strip()[:500], 
-            'link': target_url,
-            'image_url': image_url,
-            'director': rich_data['director'],
-            'year': rich_data['year'],
-            'sequel_prequel': rich_data['sequel_prequel']
-        }
-    except Exception as e:
-        print(f"DEBUG: Fetch/Parse Error: {e}", file=sys.stderr)
+    entry = cache.get_page(target_url, category_type) if cache else None
+    if entry and cache.is_fresh(entry):
+        result = dict(entry['data'])
+    else:
+        # Stale entries are still useful: their validators make the GET conditional
+        result, validators = scrape_page(target_url, category_type=category_type,
+                                         original_query=original_query, cached=entry)
+        if result is not None and cache:
+            cache.set_page(target_url, category_type, result, **validators)
+
+    if result is None:
+        if strict:
+            raise MetadataFetchError(f"Could not scrape {target_url}")
         # CRITICAL FIX: Return original_query on error, NOT the modified 'query'
         return {'name': original_query, 'info': '', 'link': target_url, 'image_url': None, 'director':None, 'year':None, 'sequel_prequel':None}
+    return result
@@ -0,0 +1,115 @@
+"""Bulk item import from CSV / JSON uploads or pasted lines."""
+import csv
+import io
+import json
+from flask import current_app
+from sqlalchemy import insert
+from app import changes, db, enrichment
+from app.models import Item, bump_category_versions
+
+NAME_MAX = 100
+
+# Accepted column names (lower-cased) -> Item field. Covers our own export
+# and the usual Goodreads / Letterboxd spreadsheet headers.
+COLUMN_ALIASES = {
+    'name': 'name', 'title': 'name',
+    'status': 'status',
+    'year': 'year', 'year published': 'year', 'original publication year': 'year',
+    'link': 'link', 'url': 'link', 'letterboxd uri': 'link',
+    'info': 'info', 'notes': 'info', 'description': 'info',
+    'director': 'director', 'author': 'director',
+}
+
+
+class InvalidImport(ValueError):
+    """The uploaded data could not be read at all (as opposed to individual bad rows)."""
+
+
+def _map_record(record):
+    row = {}
+    for key, value in record.items():
+        field = COLUMN_ALIASES.get(str(key).strip().lower())
+        if field and value not in (None, '') and field not in row:
+            row[field] = str(value).strip()
+    return row
+
+
+def parse_lines(text):
+    return [{'name': line.strip()} for line in text.splitlines() if line.strip()]
+
+
+def parse_csv(text):
+    reader = csv.DictReader(io.StringIO(text))
+    if not reader.fieldnames or not any(COLUMN_ALIASES.get(f.strip().lower()) == 'name' for f in reader.fieldnames):
+        raise InvalidImport('CSV needs a "name" or "title" column.')
+    return [_map_record(record) for record in reader]
+
+
+def parse_json(text):
+    try:
+        data = json.loads(text)
+    except ValueError as e:
+        raise InvalidImport(f'Invalid JSON: {e}')
+    if isinstance(data, dict):
+        data = data.get('items', [])
+    if not isinstance(data, list):
+        raise InvalidImport('JSON must be a list of titles or of objects with a "name".')
+    return [{'name': str(entry)} if not isinstance(entry, dict) else _map_record(entry) for entry in data]
+
+
+def parse_upload(filename, text):
+    if filename.lower().endswith('.json'):
+        return parse_json(text)
+    if filename.lower().endswith('.csv'):
+        return parse_csv(text)
+    return parse_lines(text)
+
+
+def validate_rows(category, rows):
+    """Returns (valid rows ready for INSERT, number of skipped rows).
+    Statuses outside the list's options fall back to the default for its type,
+    exactly like a single add."""
+    valid, skipped = [], 0
+    options = category.status_options
+    for row in rows:
+        name = (row.get('name') or '').strip()
+        if not name:
+            skipped += 1
+            continue
+        status = row.get('status')
+        valid.append({
+            'name': name[:NAME_MAX],
+            'status': status if status in options else category.default_status,
+            'category_id': category.id,
+            'year': (row.get('year') or None) and row['year'][:20],
+            'link': (row.get('link') or None) and row['link'][:500],
+            'info': row.get('info') or None,
+            'director': (row.get('director') or None) and row['director'][:100],
+        })
+    return valid, skipped
+
+
+def import_items(category, rows, enrich=True):
+    """Inserts validated rows in IMPORT_BATCH_SIZE executemany batches, one
+    transaction per batch, and optionally queues enrichment for them.
+    Returns the number of items created."""
+    batch_size = current_app.config['IMPORT_BATCH_SIZE']
+    enrich = enrich and category.type in enrichment.ENRICHABLE_TYPES
+    created = 0
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        item_ids = db.session.scalars(
+            insert(Item).returning(Item.id, sort_by_parameter_order=True), batch
+        ).all()
+        if enrich:
+            enrichment.enqueue_many(item_ids)
+        # Core executemany skips the flush hooks that normally bump the list version
+        # and write the change feed
+        bump_category_versions(db.session.connection(), [category.id])
+        changes.log_items(db.session.connection(), category.user_id, changes.CREATED,
+                          dict.fromkeys(item_ids, category.id))
+        db.session.commit()
+        created += len(item_ids)
+    if enrich and created:
+        enrichment.wake(current_app)
+    return created
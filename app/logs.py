@@ -0,0 +1,57 @@
+"""Leveled, structured logging for the `app` logger tree.
+
+Modules log through logging.getLogger(__name__) with a short event name as
+the message and the details as `extra` fields:
+
+    log.debug('search candidate', extra={'source': 'ddgs', 'url': href})
+
+LOG_LEVEL defaults to WARNING, so the scraper's debug events cost one
+level check each and print nothing. LOG_FORMAT is 'text' (event followed
+by key=value pairs) or 'json' (one object per line).
+"""
+import json
+import logging
+import sys
+
+# Attributes every LogRecord has; anything else on a record came from `extra`
+_RECORD_FIELDS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+def record_fields(record):
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_FIELDS}
+
+
+class StructuredFormatter(logging.Formatter):
+    def __init__(self, as_json=False):
+        super().__init__()
+        self.as_json = as_json
+
+    def format(self, record):
+        fields = record_fields(record)
+        if self.as_json:
+            entry = {'time': self.formatTime(record), 'level': record.levelname,
+                     'logger': record.name, 'event': record.getMessage(), **fields}
+            if record.exc_info:
+                entry['exc'] = self.formatException(record.exc_info)
+            return json.dumps(entry, default=str)
+        line = f'{self.formatTime(record)} {record.levelname} {record.name}: {record.getMessage()}'
+        if fields:
+            line += ' ' + ' '.join(f'{key}={value!r}' for key, value in fields.items())
+        if record.exc_info:
+            line += '\n' + self.formatException(record.exc_info)
+        return line
+
+
+def init_app(app):
+    logger = logging.getLogger('app')
+    logger.setLevel(app.config['LOG_LEVEL'].upper())
+    if not any(getattr(handler, 'structured', False) for handler in logger.handlers):
+        handler = logging.StreamHandler(sys.stderr)
+        handler.structured = True
+        logger.addHandler(handler)
+    for handler in logger.handlers:
+        if getattr(handler, 'structured', False):
+            handler.setFormatter(StructuredFormatter(as_json=app.config['LOG_FORMAT'] == 'json'))
+    # Flask's own default handler would print every record a second time
+    from flask.logging import default_handler
+    logger.removeHandler(default_handler)
@@ -0,0 +1,188 @@
+"""In-process metrics, exported in the Prometheus text format at /metrics.
+
+Collected:
+  - request latency per route (histogram, labelled by endpoint, method and status)
+  - SQL statements and SQL time per request (histograms, via engine events)
+  - scraper stage timings: search (per source), fetch, parse, infobox
+  - metadata source circuit state and counters (app/futurescope/limits.py)
+
+Everything lives in this process; with several gunicorn workers each one
+exports its own numbers, so scrape them per worker or run one worker per
+port. /metrics only answers loopback clients unless METRICS_ALLOW_REMOTE
+is set.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from flask import Response, current_app, g, has_request_context, request
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+CIRCUIT_STATES = {'closed': 0, 'half_open': 1, 'open': 2}
+
+
+class Histogram:
+    def __init__(self, name, help_text, label_names, buckets):
+        self.name = name
+        self.help = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}  # label values -> [bucket counts..., over the top bucket, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 3)
+            series[index] += 1  # index == len(buckets) is the +Inf-only slot
+            series[-2] += value
+            series[-1] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {labels: list(series) for labels, series in self._series.items()}
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        for labels, series in sorted(self.snapshot().items()):
+            base = _labels(self.label_names, labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{_labels(self.label_names, labels, le=_number(bound))} {cumulative}')
+            lines.append(f'{self.name}_bucket{_labels(self.label_names, labels, le="+Inf")} {series[-1]}')
+            lines.append(f'{self.name}_sum{base} {_number(series[-2])}')
+            lines.append(f'{self.name}_count{base} {series[-1]}')
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, **extra):
+    pairs = list(zip(names, values)) + list(extra.items())
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+REQUEST_LATENCY = Histogram('wishlist_request_duration_seconds', 'Time to serve a request.',
+                            ('endpoint', 'method', 'status'), LATENCY_BUCKETS)
+REQUEST_SQL_QUERIES = Histogram('wishlist_request_sql_queries', 'SQL statements executed per request.',
+                                ('endpoint',), COUNT_BUCKETS)
+REQUEST_SQL_TIME = Histogram('wishlist_request_sql_duration_seconds', 'Time spent in SQL per request.',
+                             ('endpoint',), LATENCY_BUCKETS)
+SCRAPER_STAGE = Histogram('wishlist_scraper_stage_duration_seconds',
+                          'Metadata scraper stage timings (search per source, fetch, parse, infobox).',
+                          ('stage', 'source'), STAGE_BUCKETS)
+HISTOGRAMS = (REQUEST_LATENCY, REQUEST_SQL_QUERIES, REQUEST_SQL_TIME, SCRAPER_STAGE)
+
+
+def observe_stage(stage, seconds, source=''):
+    SCRAPER_STAGE.observe(seconds, stage, source)
+
+
+@contextmanager
+def stage_timer(stage, source=''):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start, source)
+
+
+# --- Request and SQL hooks ---
+
+def _before_request():
+    g.metrics_start = time.perf_counter()
+    g.sql_queries = 0
+    g.sql_time = 0.0
+
+
+def _after_request(response):
+    start = g.pop('metrics_start', None)
+    if start is not None and request.endpoint != 'metrics':
+        # The endpoint name, not the URL, keeps label cardinality bounded
+        endpoint = request.endpoint or 'unmatched'
+        REQUEST_LATENCY.observe(time.perf_counter() - start, endpoint, request.method, response.status_code)
+        REQUEST_SQL_QUERIES.observe(g.get('sql_queries', 0), endpoint)
+        REQUEST_SQL_TIME.observe(g.get('sql_time', 0.0), endpoint)
+    return response
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        starts = conn.info.get('query_start')
+        if starts and 'sql_queries' in g:
+            g.sql_queries += 1
+            g.sql_time += time.perf_counter() - starts.pop()
+
+
+# --- Export ---
+
+def _source_lines():
+    from app.futurescope import limits
+
+    sources = limits.stats()
+    lines = ['# HELP wishlist_metadata_source_state Circuit state: 0 closed, 1 half-open, 2 open.',
+             '# TYPE wishlist_metadata_source_state gauge']
+    lines += [f'wishlist_metadata_source_state{{source="{_escape(name)}"}} {CIRCUIT_STATES[s["state"]]}'
+              for name, s in sorted(sources.items())]
+    lines += ['# HELP wishlist_metadata_source_calls_total Calls to metadata sources by outcome.',
+              '# TYPE wishlist_metadata_source_calls_total counter']
+    for name, s in sorted(sources.items()):
+        for outcome in ('successes', 'failures', 'short_circuited', 'throttled'):
+            lines.append(f'wishlist_metadata_source_calls_total{{source="{_escape(name)}",outcome="{outcome}"}} {s[outcome]}')
+    return lines
+
+
+def render():
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines += histogram.render()
+    lines += _source_lines()
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view():
+    if not current_app.config['METRICS_ALLOW_REMOTE'] and request.remote_addr not in ('127.0.0.1', '::1'):
+        return "Not found", 404
+    return Response(render(), mimetype='text/plain; version=0.0.4')
+
+
+def reset():
+    for histogram in HISTOGRAMS:
+        histogram.clear()
+
+
+def init_app(app, db):
+    if not app.config['METRICS_ENABLED']:
+        return
+    from sqlalchemy import event
+
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
+    with app.app_context():
+        for engine in db.engines.values():
+            if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+                event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+                event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
@@ -0,0 +1,137 @@
+"""Lightweight schema migrations.
+
+db.create_all() only creates tables that are missing; it never adds
+columns or indexes to tables that already exist. Every step registered
+here is idempotent and recorded in the schema_version table, so an
+existing wishlist.db or Postgres database can be upgraded in place with
+
+    flask --app run upgrade-db
+"""
+import click
+from sqlalchemy import inspect, text
+from app import db
+
+MIGRATIONS = []
+
+
+def migration(version):
+    """Registers a migration step. Steps run in version order, each in its own transaction."""
+    def register(fn):
+        MIGRATIONS.append((version, fn))
+        return fn
+    return register
+
+
+def create_indexes(conn, table, *names):
+    for index in table.indexes:
+        if index.name in names:
+            index.create(conn, checkfirst=True)
+
+
+def add_column(conn, table, column):
+    """ALTER TABLE ... ADD COLUMN for a model column, unless it already exists."""
+    if any(col['name'] == column.name for col in inspect(conn).get_columns(table.name)):
+        return
+    ddl = column.type.compile(dialect=conn.dialect)
+    if column.server_default is not None:
+        ddl += f' DEFAULT {column.server_default.arg}'
+        if not column.nullable:
+            ddl += ' NOT NULL'
+    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {ddl}'))
+
+
+def current_version(conn):
+    conn.execute(text('CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)'))
+    return conn.execute(text('SELECT MAX(version) FROM schema_version')).scalar() or 0
+
+
+def upgrade():
+    """Applies every migration newer than the database's schema_version. Returns the versions applied."""
+    with db.engine.begin() as conn:
+        version = current_version(conn)
+
+    applied = []
+    for step_version, step in sorted(MIGRATIONS, key=lambda m: m[0]):
+        if step_version <= version:
+            continue
+        with db.engine.begin() as conn:
+            step(conn)
+            conn.execute(text('INSERT INTO schema_version (version) VALUES (:v)'), {'v': step_version})
+        applied.append(step_version)
+    return applied
+
+
+def create_schema():
+    """Creates missing tables, then applies pending migrations. Returns the versions applied."""
+    from app import models  # noqa: F401 (registers the tables)
+    db.create_all()
+    # create_all() never alters existing tables; bring them up to date
+    return upgrade()
+
+
+@click.command('upgrade-db')
+def upgrade_db_command():
+    """Create missing tables and apply pending schema migrations."""
+    applied = create_schema()
+    if applied:
+        click.echo(f"Applied migrations: {', '.join(map(str, applied))}")
+    else:
+        click.echo('Database schema is up to date.')
+
+
+# --- Migrations ---
+
+@migration(1)
+def add_hot_path_indexes(conn):
+    from app.models import Category, Item
+    create_indexes(conn, Category.__table__, 'ix_category_user_type')
+    create_indexes(conn, Item.__table__,
+                   'ix_item_category_status_date', 'ix_item_category_date', 'ix_item_category_name')
+
+
+@migration(2)
+def add_enrichment_claim_token(conn):
+    from app.models import EnrichmentJob
+    table = EnrichmentJob.__table__
+    add_column(conn, table, table.c.claim_token)
+    create_indexes(conn, table, 'ix_enrichment_job_claim_token')
+
+
+@migration(3)
+def add_item_search_index(conn):
+    from app.search import create_index
+    create_index(conn)
+
+
+@migration(4)
+def add_category_version(conn):
+    from app.models import Category
+    table = Category.__table__
+    add_column(conn, table, table.c.version)
+
+
+@migration(5)
+def add_item_version(conn):
+    from app.models import Item
+    table = Item.__table__
+    add_column(conn, table, table.c.version)
+
+
+@migration(6)
+def add_works(conn):
+    from app.models import Item, Work
+    from app.search import create_index
+    from app.works import fold_duplicates
+    Work.__table__.create(conn, checkfirst=True)
+    add_column(conn, Item.__table__, Item.__table__.c.work_id)
+    create_indexes(conn, Item.__table__, 'ix_item_work')
+    # Re-creates the triggers so items index their work's fields
+    create_index(conn)
+    fold_duplicates(conn)
+
+
+@migration(7)
+def add_change_log(conn):
+    from app.models import ChangeLog, User
+    ChangeLog.__table__.create(conn, checkfirst=True)
+    add_column(conn, User.__table__, User.__table__.c.changes_watermark)
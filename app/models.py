@@ -1,10 +1,24 @@
 from datetime import datetime
+from flask import g
 from flask_login import UserMixin
+from sqlalchemy import event, inspect
 from app import db, login_manager
 
+# Status choices per list type; the first entry is the default for new items
+STATUS_OPTIONS = {
+    'watch': ['Plan to Watch', 'Watching', 'On Hold', 'Completed', 'Dropped'],
+    'read': ['Plan to Read', 'Reading', 'On Hold', 'Completed', 'Dropped'],
+    'todo': ['Pending', 'In Progress', 'Done', 'Blocked'],
+}
+DEFAULT_STATUS_OPTIONS = ['Pending', 'In Progress', 'Completed', 'Archived']
+
 @login_manager.user_loader
 def load_user(user_id):
-    return db.session.get(User, int(user_id))
+    # Memoized on flask.g: one SELECT per request, however many callers ask
+    users = g.setdefault('loaded_users', {})
+    if user_id not in users:
+        users[user_id] = db.session.get(User, int(user_id))
+    return users[user_id]
 
 class User(db.Model, UserMixin):
     id = db.Column(db.Integer, primary_key=True)
@@ -20,6 +34,9 @@ class User(db.Model, UserMixin):
     reset_token = db.Column(db.String(100), unique=True)
     reset_token_expiry = db.Column(db.DateTime)
     
+    # Change feed entries up to this sequence number were compacted away (app/changes.py)
+    changes_watermark = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    
     # Relations
     categories = db.relationship('Category', backref='owner', lazy=True)
 
@@ -31,11 +48,62 @@ class Category(db.Model):
     name = db.Column(db.String(100), nullable=False)
     type = db.Column(db.String(20), default='general') # 'watch', 'read', 'general'
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    # Bumped whenever the list or any of its items changes; API ETags derive from it
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
     items = db.relationship('Item', backref='category', lazy=True, cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # Dashboard and ownership lookups: "lists of user X (of type Y)"
+        db.Index('ix_category_user_type', 'user_id', 'type'),
+    )
+
+    @property
+    def status_options(self):
+        return STATUS_OPTIONS.get(self.type, DEFAULT_STATUS_OPTIONS)
+
+    @property
+    def default_status(self):
+        return self.status_options[0]
+
     def __repr__(self):
         return f"Category('{self.name}')"
 
+class Work(db.Model):
+    """Canonical metadata for one title, keyed by its normalized page URL
+    (see app/works.py). Every item saved from the same page points here,
+    so the scraped fields are stored and refreshed once."""
+    id = db.Column(db.Integer, primary_key=True)
+    url = db.Column(db.String(500), nullable=False, unique=True)
+    name = db.Column(db.String(100))
+    info = db.Column(db.Text)
+    image_url = db.Column(db.String(500))
+    director = db.Column(db.String(100))
+    year = db.Column(db.String(20))
+    sequel_prequel = db.Column(db.String(200))
+    # Part of the list-row cache key: a refresh re-renders every row showing the work
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"Work('{self.url}')"
+
+
+class WorkFallback:
+    """Item attribute for display: the item's own value, else its work's."""
+
+    def __init__(self, field, work_field=None):
+        self.field = field
+        self.work_field = work_field or field
+
+    def __get__(self, item, owner):
+        if item is None:
+            return self
+        value = getattr(item, self.field)
+        if not value and item.work is not None:
+            return getattr(item.work, self.work_field)
+        return value
+
+
 class Item(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -52,6 +120,141 @@ class Item(db.Model):
     type = db.Column(db.String(50)) # Movie, Book, etc.
 
     category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=False)
+    # Shared metadata; the columns above are this item's own values (notes, manual edits)
+    work_id = db.Column(db.Integer, db.ForeignKey('work.id'))
+    work = db.relationship('Work', lazy='joined')
+    # Bumped on every change to the row; keys the rendered-row cache (app/fragments.py)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    enrichment_jobs = db.relationship('EnrichmentJob', backref='item', lazy=True, cascade="all, delete-orphan")
+
+    __table_args__ = (
+        # List view: status filter + default date sort, and the keyset seeks
+        # on (sort value, id) used by app.pagination
+        db.Index('ix_item_category_status_date', 'category_id', 'status', 'date_added'),
+        db.Index('ix_item_category_date', 'category_id', 'date_added', 'id'),
+        db.Index('ix_item_category_name', 'category_id', 'name', 'id'),
+        db.Index('ix_item_work', 'work_id'),
+    )
+
+    display_info = WorkFallback('info')
+    display_link = WorkFallback('link', 'url')
+    display_image_url = WorkFallback('image_url')
+    display_director = WorkFallback('director')
+    display_year = WorkFallback('year')
+    display_sequel_prequel = WorkFallback('sequel_prequel')
+
+    @property
+    def enrichment_status(self):
+        """Status of the most recent metadata lookup, or None if none was queued."""
+        if not self.enrichment_jobs:
+            return None
+        return max(self.enrichment_jobs, key=lambda job: job.id).status
 
     def __repr__(self):
         return f"Item('{self.name}', '{self.status}')"
+
+class EnrichmentJob(db.Model):
+    """Background metadata lookup for one item (see app/enrichment.py)."""
+    id = db.Column(db.Integer, primary_key=True)
+    item_id = db.Column(db.Integer, db.ForeignKey('item.id'), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued') # queued, running, done, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    run_after = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.Text)
+    claim_token = db.Column(db.String(32)) # set by the worker that claimed the job
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        # Workers poll for "queued and due"
+        db.Index('ix_enrichment_job_status_run_after', 'status', 'run_after'),
+        db.Index('ix_enrichment_job_item', 'item_id'),
+        db.Index('ix_enrichment_job_claim_token', 'claim_token'),
+    )
+
+    def __repr__(self):
+        return f"EnrichmentJob(item={self.item_id}, '{self.status}')"
+
+
+class ChangeLog(db.Model):
+    """One entry of a user's change feed (see app/changes.py). The id is the
+    sequence number; AUTOINCREMENT keeps it from being reused after compaction."""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    kind = db.Column(db.String(10), nullable=False) # 'item' or 'category'
+    object_id = db.Column(db.Integer, nullable=False)
+    category_id = db.Column(db.Integer) # an item's list at the time of the change
+    op = db.Column(db.String(10), nullable=False) # 'created', 'updated' or 'deleted'
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        # "Changes of user X after sequence N"
+        db.Index('ix_change_log_user_seq', 'user_id', 'id'),
+        # Compaction: older entries of the same object
+        db.Index('ix_change_log_object', 'kind', 'object_id', 'id'),
+        {'sqlite_autoincrement': True},
+    )
+
+    def __repr__(self):
+        return f"ChangeLog({self.id}, {self.kind} {self.object_id} {self.op})"
+
+
+# --- List versions ---
+
+def bump_category_versions(connection, category_ids):
+    """Increments Category.version for the given lists. Called automatically
+    on flush; bulk INSERT/UPDATE paths that bypass the ORM call it directly."""
+    category_ids = {cid for cid in category_ids if cid is not None}
+    if category_ids:
+        table = Category.__table__
+        connection.execute(
+            table.update().where(table.c.id.in_(category_ids)).values(version=table.c.version + 1)
+        )
+    return category_ids
+
+
+def _touched_category_ids(session):
+    ids = set()
+    for obj in session.new:
+        if isinstance(obj, Item):
+            ids.add(obj.category_id)
+    for obj in session.deleted:
+        if isinstance(obj, Item):
+            ids.add(obj.category_id)
+    for obj in session.dirty:
+        if isinstance(obj, Item) and session.is_modified(obj, include_collections=False):
+            ids.add(obj.category_id)
+            # A move changes both the old and the new list
+            state = inspect(obj)
+            ids.update(state.attrs.category_id.history.deleted)
+            ids.update(category.id for category in state.attrs.category.history.deleted if category is not None)
+        elif isinstance(obj, Category) and obj not in session.deleted:
+            state = inspect(obj)
+            if any(attr.history.has_changes() for attr in state.attrs if attr.key not in ('version', 'items')):
+                ids.add(obj.id)
+    return ids
+
+
+@event.listens_for(db.session, 'before_flush')
+def _bump_item_versions(session, flush_context, instances):
+    for obj in session.dirty:
+        if isinstance(obj, Item) and session.is_modified(obj, include_collections=False):
+            # Incremented in the UPDATE itself, so concurrent writers never reuse a version
+            obj.version = Item.version + 1
+
+
+@event.listens_for(db.session, 'after_flush')
+def _bump_versions_after_flush(session, flush_context):
+    # Primary and foreign keys are populated by now; history is still intact
+    bumped = bump_category_versions(session.connection(), _touched_category_ids(session))
+    session.info.setdefault('bumped_categories', set()).update(bumped)
+
+
+@event.listens_for(db.session, 'after_flush_postexec')
+def _expire_bumped_versions(session, flush_context):
+    bumped = session.info.pop('bumped_categories', None)
+    if not bumped:
+        return
+    for obj in list(session.identity_map.values()):
+        if isinstance(obj, Category) and obj.id in bumped:
+            session.expire(obj, ['version'])
@@ -0,0 +1,108 @@
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import contains_eager
+from app.models import Item, Work
+
+# Sortable columns for item lists. Every sort is paired with Item.id as a
+# tie-breaker so the (value, id) pair is unique and can be used as a cursor.
+ITEM_SORTS = {
+    'date_added': Item.date_added,
+    'name': Item.name,
+    # The item's own year, else its work's (Item.display_year)
+    'year': func.coalesce(func.nullif(Item.year, ''), Work.year, ''),
+}
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _sort_value(item, sort):
+    if sort == 'year':
+        return item.display_year or ''
+    return getattr(item, sort)
+
+
+def encode_cursor(sort, direction, value, item_id, position):
+    """Encodes a seek position. `direction` is 'next' (rows after the
+    (value, id) pair) or 'prev' (rows before it)."""
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([sort, direction, value, item_id, position], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, sort):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        cursor_sort, direction, value, item_id, position = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError):
+        raise InvalidCursor(cursor)
+
+    # A cursor only makes sense for the sort it was issued under
+    if cursor_sort != sort or direction not in ('next', 'prev'):
+        raise InvalidCursor(cursor)
+    if type(item_id) is not int or type(position) is not int or position < 0:
+        raise InvalidCursor(cursor)
+    if not isinstance(value, str):
+        raise InvalidCursor(cursor)
+    if sort == 'date_added':
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            raise InvalidCursor(cursor)
+    return direction, value, item_id, position
+
+
+def keyset_page(query, sort='date_added', order='asc', cursor=None, per_page=50):
+    """Returns one page of items as (items, next_cursor, prev_cursor, position).
+
+    Seeks past a (sort value, id) pair instead of using OFFSET, so page cost
+    is independent of how deep into the list the page is. `position` is the
+    number of rows before the page and is only used for display.
+    """
+    if sort not in ITEM_SORTS:
+        sort = 'date_added'
+    column = ITEM_SORTS[sort]
+    descending = order == 'desc'
+    if sort == 'year':
+        # Joined explicitly so the sort can read work.year; also loads item.work
+        query = query.outerjoin(Item.work).options(contains_eager(Item.work))
+
+    direction, position = 'next', 0
+    if cursor:
+        direction, value, last_id, position = decode_cursor(cursor, sort)
+        # Walking backwards is the same seek with the comparison flipped
+        before = descending != (direction == 'prev')
+        if before:
+            query = query.filter(or_(column < value, and_(column == value, Item.id < last_id)))
+        else:
+            query = query.filter(or_(column > value, and_(column == value, Item.id > last_id)))
+
+    reverse = descending != (direction == 'prev')
+    if reverse:
+        query = query.order_by(column.desc(), Item.id.desc())
+    else:
+        query = query.order_by(column.asc(), Item.id.asc())
+
+    items = query.limit(per_page + 1).all()
+    has_more = len(items) > per_page
+    items = items[:per_page]
+
+    if direction == 'prev':
+        items.reverse()
+        position = 0 if not has_more else max(position - len(items), 0)
+        has_next, has_prev = True, has_more
+    else:
+        has_next, has_prev = has_more, position > 0
+
+    next_cursor = prev_cursor = None
+    if items and has_next:
+        last = items[-1]
+        next_cursor = encode_cursor(sort, 'next', _sort_value(last, sort), last.id, position + len(items))
+    if items and has_prev:
+        first = items[0]
+        prev_cursor = encode_cursor(sort, 'prev', _sort_value(first, sort), first.id, position)
+    return items, next_cursor, prev_cursor, position
@@ -1,26 +1,66 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app
+from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, Response, stream_with_context, jsonify
 from flask_login import current_user, login_required
+from sqlalchemy import func
+from werkzeug.utils import secure_filename
 from app import db
 from app.models import User, Category, Item
-import sys
-
+from app import bulk, enrichment, exporter, importer, suggest
+from app.search import search_items
+from app.access import category_owner_required, item_owner_required, load_owned_category, ownership_error
+from app.pagination import keyset_page, InvalidCursor, ITEM_SORTS
+from app.works import own_value
 
 
 main = Blueprint('main', __name__)
 
-import sys
 
 
+def wants_json():
+    # fetch() calls from script.js; plain form posts still get a redirect
+    return (request.headers.get('X-Requested-With') == 'XMLHttpRequest'
+            or request.accept_mimetypes.best == 'application/json')
+
+
+def status_payload(item):
+    return {'id': item.id, 'status': item.status}
+
 
 @main.route('/')
 def index():
     if current_user.is_authenticated:
         categories = Category.query.filter_by(owner=current_user).all()
+        # One grouped COUNT for all lists instead of lazy-loading every list's items
+        item_counts = dict(
+            db.session.query(Item.category_id, func.count(Item.id))
+            .join(Category)
+            .filter(Category.user_id == current_user.id)
+            .group_by(Item.category_id)
+            .all()
+        )
         # Ensure default is handled in template or here if empty
-        return render_template('dashboard.html', categories=categories)
+        return render_template('dashboard.html', categories=categories, item_counts=item_counts)
     return redirect(url_for('auth.login'))
 
 
+@main.route('/search')
+@login_required
+def search():
+    query = request.args.get('q', '').strip()
+    results = search_items(current_user.id, query) if query else []
+    return render_template('search.html', query=query, results=results)
+
+
+@main.route('/suggest')
+@login_required
+def suggest_titles():
+    # Titles other lists already resolved; served from memory (app/suggest.py)
+    titles = suggest.suggest(request.args.get('type', ''), request.args.get('q', ''))
+    response = jsonify({'suggestions': titles})
+    response.cache_control.private = True
+    response.cache_control.max_age = 60
+    return response
+
+
 # --- Categories & Items ---
 
 @main.route('/category/add', methods=['POST'])
@@ -36,66 +76,130 @@ def add_category():
 
 @main.route('/list/<int:category_id>')
 @login_required
-def view_list(category_id):
-    category = db.session.get(Category, category_id)
-    if not category:
-        return "Category not found", 404
-    if category.owner != current_user:
-        return "Unauthorized", 403
-    return render_template('list_view.html', category=category)
+@category_owner_required()
+def view_list(category):
+
+    status_filter = request.args.get('status') or None
+    sort = request.args.get('sort', 'date_added')
+    if sort not in ITEM_SORTS:
+        sort = 'date_added'
+    order = 'desc' if request.args.get('order') == 'desc' else 'asc'
+
+    query = Item.query.filter_by(category_id=category.id)
+    if status_filter:
+        query = query.filter(Item.status == status_filter)
+    try:
+        items, next_cursor, prev_cursor, position = keyset_page(
+            query, sort=sort, order=order,
+            cursor=request.args.get('cursor'),
+            per_page=current_app.config['ITEMS_PER_PAGE'],
+        )
+    except InvalidCursor:
+        return "Invalid cursor", 400
+
+    # Other lists the selection can be moved to
+    move_targets = db.session.execute(
+        db.select(Category.id, Category.name)
+        .where(Category.user_id == current_user.id, Category.id != category.id)
+        .order_by(Category.name)
+    ).all() if items else []
+
+    return render_template(
+        'list_view.html', category=category, items=items,
+        next_cursor=next_cursor, prev_cursor=prev_cursor, position=position,
+        status_filter=status_filter, sort=sort, order=order,
+        status_options=category.status_options, move_targets=move_targets,
+    )
+
+@main.route('/export.<fmt>')
+@main.route('/list/<int:category_id>/export.<fmt>')
+@login_required
+def export_items(fmt, category_id=None):
+    if fmt not in exporter.FORMATS:
+        return "Unsupported export format", 404
+    filename = 'wishlist'
+    if category_id is not None:
+        category, failed = load_owned_category(category_id, current_user.id)
+        if failed:
+            return ownership_error(failed, 'Category not found')
+        filename = secure_filename(category.name) or f'list-{category.id}'
+
+    body = exporter.stream_export(fmt, current_user.id, category_id)
+    return Response(
+        stream_with_context(body),
+        mimetype=exporter.FORMATS[fmt],
+        headers={'Content-Disposition': f'attachment; filename="{filename}.{fmt}"'},
+    )
 
 @main.route('/category/delete/<int:category_id>')
 @login_required
-def delete_category(category_id):
-    category = db.session.get(Category, category_id)
-    if not category:
-        return "Category not found", 404
-    if category.owner != current_user:
-        return "Unauthorized", 403
-    db.session.delete(category)
+@category_owner_required()
+def delete_category(category):
+    # Set-based: a list of any size goes in three DELETEs, nothing loaded
+    bulk.delete_categories(current_user.id, [category.id])
     db.session.commit()
     return redirect(url_for('main.index'))
 
 @main.route('/item/add/<int:category_id>', methods=['POST'])
 @login_required
-def add_item(category_id):
-    category = db.session.get(Category, category_id)
-    if not category:
-        return "Category not found", 404
-    if category.owner != current_user:
-        return "Unauthorized", 403
+@category_owner_required()
+def add_item(category):
         
     name_input = request.form.get('name')
 
     if name_input:
         # Simple Fast Add
-        status = 'Pending'
-        if category.type == 'watch': status = 'Plan to Watch'
-        elif category.type == 'read': status = 'Plan to Read'
-
         item = Item(
             name=name_input, 
             category_id=category.id,
-            status=status
+            status=category.default_status
         )
         db.session.add(item)
+        # Metadata lookup happens in the background; the add stays a single insert
+        enrichment.enqueue(item, category)
         db.session.commit()
+        enrichment.wake(current_app)
     return redirect(url_for('main.view_list', category_id=category.id))
 
 
 
+@main.route('/item/import/<int:category_id>', methods=['POST'])
+@login_required
+@category_owner_required()
+def import_items(category):
+
+    upload = request.files.get('file')
+    try:
+        if upload and upload.filename:
+            rows = importer.parse_upload(upload.filename, upload.read().decode('utf-8-sig', errors='replace'))
+        else:
+            rows = importer.parse_lines(request.form.get('names', ''))
+    except importer.InvalidImport as e:
+        flash(str(e), 'danger')
+        return redirect(url_for('main.view_list', category_id=category.id))
+
+    max_rows = current_app.config['IMPORT_MAX_ROWS']
+    if len(rows) > max_rows:
+        flash(f'Imports are limited to {max_rows} items at a time.', 'danger')
+        return redirect(url_for('main.view_list', category_id=category.id))
+
+    valid, skipped = importer.validate_rows(category, rows)
+    created = importer.import_items(category, valid, enrich=bool(request.form.get('enrich')))
+    message = f'Imported {created} item{"s" if created != 1 else ""}.'
+    if skipped:
+        message += f' Skipped {skipped} row{"s" if skipped != 1 else ""} without a name.'
+    flash(message, 'success')
+    return redirect(url_for('main.view_list', category_id=category.id))
+
 @main.route('/item/update_details/<int:item_id>', methods=['POST'])
 @login_required
-def update_item_details(item_id):
-    item = db.session.get(Item, item_id)
-    if not item:
-        return "Item not found", 404
-    if item.category.owner != current_user:
-        return "Unauthorized", 403
+@item_owner_required()
+def update_item_details(item):
         
     # Manual Update
-    item.info = request.form.get('info')
-    item.link = request.form.get('link')
+    # Unchanged shared values stay on the work instead of becoming a copy
+    item.info = own_value(item, 'info', request.form.get('info'))
+    item.link = own_value(item, 'link', request.form.get('link'))
     item.status = request.form.get('status')
     
     db.session.commit()
@@ -104,54 +208,152 @@ def update_item_details(item_id):
 
 @main.route('/item/update_status/<int:item_id>', methods=['POST'])
 @login_required
-def update_item_status(item_id):
-    item = db.session.get(Item, item_id)
-    if not item:
-        return "Item not found", 404
-    if item.category.owner != current_user:
-        return "Unauthorized", 403
+@item_owner_required()
+def update_item_status(item):
         
     new_status = request.form.get('status')
     if new_status:
         item.status = new_status
-        db.session.commit()
-        # No flash needed for quick inline update, or maybe a subtle one?
-        # flash('Status updated', 'success') 
-        
+    # Built before the commit expires the item, which would cost a reload
+    payload = status_payload(item)
+    db.session.commit()
+    # No flash needed for quick inline update, or maybe a subtle one?
+    # flash('Status updated', 'success') 
+
+    if wants_json():
+        return jsonify(payload)
+    return redirect(request.referrer or url_for('main.index'))
+
+@main.route('/item/update_status', methods=['POST'])
+@login_required
+def update_item_statuses():
+    """Batched inline status changes from script.js: {"updates": [{"id": 1, "status": "..."}, ...]}.
+    Set-based (app/bulk.py): one ownership query and one UPDATE per distinct status."""
+    data = request.get_json(silent=True) or {}
+    updates = {}
+    for entry in data.get('updates') or []:
+        if isinstance(entry, dict) and isinstance(entry.get('id'), int) and isinstance(entry.get('status'), str):
+            updates[entry['id']] = entry['status']  # last change per row wins
+    if not updates:
+        return jsonify({'error': 'No updates given'}), 400
+    if len(updates) > bulk.MAX_IDS:
+        return jsonify({'error': f'At most {bulk.MAX_IDS} updates at a time'}), 400
+
+    applied, rejected = bulk.set_statuses(current_user.id, updates)
+    db.session.commit()
+    # Unknown ids and other users' items are reported the same way
+    return jsonify({'updated': [{'id': item_id, 'status': status} for item_id, status in applied.items()],
+                    'rejected': rejected})
+
+def bulk_selection():
+    """(ids, fields) from a JSON body {"ids": [...], ...} or a form post
+    of repeated `ids` fields; ids is None when there are none or too many."""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        data = request.form.to_dict()
+        data['ids'] = request.form.getlist('ids')
+    ids = []
+    for value in data.get('ids') or []:
+        try:
+            ids.append(int(value))
+        except (TypeError, ValueError):
+            continue
+    ids = list(dict.fromkeys(ids))
+    if not ids or len(ids) > bulk.MAX_IDS:
+        return None, data
+    return ids, data
+
+
+def bulk_response(done_key, done, rejected, message):
+    if request.is_json or wants_json():
+        return jsonify({done_key: done, 'rejected': rejected})
+    flash(message + (f' ({len(rejected)} skipped)' if rejected else ''), 'success')
     return redirect(request.referrer or url_for('main.index'))
 
+
+def bulk_error(message, status=400):
+    if request.is_json or wants_json():
+        return jsonify({'error': message}), status
+    flash(message, 'danger')
+    return redirect(request.referrer or url_for('main.index'))
+
+
+@main.route('/item/bulk/status', methods=['POST'])
+@login_required
+def bulk_update_status():
+    ids, data = bulk_selection()
+    if ids is None:
+        return bulk_error(f'Select between 1 and {bulk.MAX_IDS} items.')
+    status = data.get('status')
+    if not isinstance(status, str) or not status:
+        return bulk_error('No status given')
+    updated, rejected = bulk.set_status(current_user.id, ids, status)
+    db.session.commit()
+    return bulk_response('updated', updated, rejected, f'Set {len(updated)} items to {status}.')
+
+@main.route('/item/bulk/move', methods=['POST'])
+@login_required
+def bulk_move_items():
+    ids, data = bulk_selection()
+    if ids is None:
+        return bulk_error(f'Select between 1 and {bulk.MAX_IDS} items.')
+    try:
+        target_id = int(data.get('category_id'))
+    except (TypeError, ValueError):
+        return bulk_error('No list given')
+    target, failed = load_owned_category(target_id, current_user.id)
+    if failed:
+        return ownership_error(failed, 'Category not found', respond=bulk_error)
+    moved, rejected = bulk.move(current_user.id, ids, target)
+    message = f'Moved {len(moved)} items to {target.name}.'
+    db.session.commit()
+    return bulk_response('moved', moved, rejected, message)
+
+@main.route('/item/bulk/delete', methods=['POST'])
+@login_required
+def bulk_delete_items():
+    ids, _ = bulk_selection()
+    if ids is None:
+        return bulk_error(f'Select between 1 and {bulk.MAX_IDS} items.')
+    deleted, rejected = bulk.delete_items(current_user.id, ids)
+    db.session.commit()
+    return bulk_response('deleted', deleted, rejected, f'Deleted {len(deleted)} items.')
+
+@main.route('/category/bulk/delete', methods=['POST'])
+@login_required
+def bulk_delete_categories():
+    ids, _ = bulk_selection()
+    if ids is None:
+        return bulk_error(f'Select between 1 and {bulk.MAX_IDS} lists.')
+    deleted, rejected = bulk.delete_categories(current_user.id, ids)
+    db.session.commit()
+    if request.is_json or wants_json():
+        return jsonify({'deleted': deleted, 'rejected': rejected})
+    flash(f'Deleted {len(deleted)} lists.', 'success')
+    return redirect(url_for('main.index'))
+
 @main.route('/item/delete/<int:item_id>')
 @login_required
-def delete_item(item_id):
-    item = db.session.get(Item, item_id)
-    if not item:
-        return "Item not found", 404
-    if item.category.owner != current_user:
-        return "Unauthorized", 403
+@item_owner_required()
+def delete_item(item):
     category_id = item.category_id
     db.session.delete(item)
     db.session.commit()
     return redirect(url_for('main.view_list', category_id=category_id))
 
-@main.route('/item/toggle/<int:item_id>')
+@main.route('/item/toggle/<int:item_id>', methods=['GET', 'POST'])
 @login_required
-def toggle_item(item_id):
-    item = db.session.get(Item, item_id)
-    if not item:
-        return "Item not found", 404
-    if item.category.owner != current_user:
-        return "Unauthorized", 403
-    
+@item_owner_required()
+def toggle_item(item):
     item.status = 'Completed' if item.status != 'Completed' else 'In Wishlist'
+    payload, category_id = status_payload(item), item.category_id
     db.session.commit()
-    return redirect(url_for('main.view_list', category_id=item.category_id))
+    if wants_json():
+        return jsonify(payload)
+    return redirect(url_for('main.view_list', category_id=category_id))
 
 @main.route('/item/<int:item_id>')
 @login_required
-def view_item(item_id):
-    item = db.session.get(Item, item_id)
-    if not item:
-        return "Item not found", 404
-    if item.category.owner != current_user:
-        return "Unauthorized", 403
+@item_owner_required()
+def view_item(item):
     return render_template('item_detail.html', item=item)
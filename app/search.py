@@ -0,0 +1,160 @@
+"""Full-text search over a user's items.
+
+SQLite: an FTS5 table (item_fts) whose rowid is the item id, kept in sync
+by triggers on the item table, so ORM writes, bulk inserts and raw SQL are
+all indexed. Each row carries an `owner` token ("u<user id>") that is part
+of every MATCH, so the inverted index itself scopes a query to one user
+instead of matching every user's items and filtering afterwards.
+
+Items linked to a Work (app/works.py) are indexed with the work's
+description and director where they have none of their own.
+
+Postgres: generated tsvector columns with a GIN index.
+
+Other databases fall back to a LIKE scan.
+"""
+import re
+from flask import current_app
+from sqlalchemy import inspect, or_, text
+from sqlalchemy.orm import joinedload
+from app import db
+from app.models import Category, Item, Work
+
+# Column weights for bm25 (owner, name, info, director, type): a title hit
+# counts far more than a hit in the description.
+BM25_WEIGHTS = '0.0, 10.0, 1.0, 3.0, 2.0'
+
+# One item's FTS row; description and director fall back to its Work (app/works.py)
+SQLITE_ROWS = """
+    INSERT INTO item_fts (rowid, owner, name, info, director, type)
+    SELECT item.id, 'u' || category.user_id, item.name,
+           coalesce(nullif(item.info, ''), work.info), coalesce(nullif(item.director, ''), work.director), item.type
+    FROM item JOIN category ON category.id = item.category_id LEFT JOIN work ON work.id = item.work_id
+    WHERE {where};"""
+# Before migration 6 adds item.work_id: the item's own fields only
+SQLITE_ITEM_ROWS = """
+    INSERT INTO item_fts (rowid, owner, name, info, director, type)
+    SELECT item.id, 'u' || category.user_id, item.name, item.info, item.director, item.type
+    FROM item JOIN category ON category.id = item.category_id
+    WHERE {where};"""
+
+
+def sqlite_ddl(works=True):
+    rows = SQLITE_ROWS if works else SQLITE_ITEM_ROWS
+    statements = [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS item_fts USING fts5("
+        " owner, name, info, director, type,"
+        " tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        # Triggers are dropped and recreated so that re-running this picks up new definitions
+        "DROP TRIGGER IF EXISTS item_fts_ai",
+        "DROP TRIGGER IF EXISTS item_fts_ad",
+        "DROP TRIGGER IF EXISTS item_fts_au",
+        "DROP TRIGGER IF EXISTS work_fts_au",
+        "CREATE TRIGGER item_fts_ai AFTER INSERT ON item BEGIN"
+        + rows.format(where='item.id = new.id') + " END",
+        """CREATE TRIGGER item_fts_ad AFTER DELETE ON item BEGIN
+            DELETE FROM item_fts WHERE rowid = old.id;
+        END""",
+        f"CREATE TRIGGER item_fts_au AFTER UPDATE OF name, info, director, type, category_id{', work_id' if works else ''}"
+        " ON item BEGIN DELETE FROM item_fts WHERE rowid = old.id;"
+        + rows.format(where='item.id = new.id') + " END",
+    ]
+    if works:
+        # A refreshed work re-indexes every item that shows it
+        statements.append(
+            "CREATE TRIGGER work_fts_au AFTER UPDATE OF info, director ON work BEGIN"
+            " DELETE FROM item_fts WHERE rowid IN (SELECT id FROM item WHERE work_id = new.id);"
+            + SQLITE_ROWS.format(where='item.work_id = new.id') + " END")
+    statements.append(rows.format(where='item.id NOT IN (SELECT rowid FROM item_fts)'))
+    return statements
+
+
+POSTGRES_DDL = [
+    "ALTER TABLE item ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+    " setweight(to_tsvector('simple', coalesce(name, '')), 'A') ||"
+    " setweight(to_tsvector('simple', coalesce(director, '')), 'B') ||"
+    " setweight(to_tsvector('simple', coalesce(type, '')), 'C') ||"
+    " setweight(to_tsvector('simple', coalesce(info, '')), 'D')) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_item_search_vector ON item USING GIN (search_vector)",
+]
+# Generated columns cannot read other tables; the work's fields get their own vector
+POSTGRES_WORK_DDL = [
+    "ALTER TABLE work ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+    " setweight(to_tsvector('simple', coalesce(director, '')), 'B') ||"
+    " setweight(to_tsvector('simple', coalesce(info, '')), 'D')) STORED",
+]
+
+
+def create_index(conn):
+    """Creates (and backfills) the search index for the connection's dialect.
+    Until migration 6 links items to works, items are indexed with their own
+    fields only; that migration runs this again to add the work's."""
+    works = any(column['name'] == 'work_id' for column in inspect(conn).get_columns('item'))
+    if conn.dialect.name == 'sqlite':
+        for statement in sqlite_ddl(works):
+            conn.execute(text(statement))
+    elif conn.dialect.name == 'postgresql':
+        for statement in POSTGRES_DDL + (POSTGRES_WORK_DDL if works else []):
+            conn.execute(text(statement))
+
+
+def tokenize(query):
+    return re.findall(r'\w+', query.lower())
+
+
+def _ranked_ids_sqlite(user_id, tokens, limit):
+    # Every token is a prefix match; the column filter keeps them off the owner column
+    terms = ' '.join(f'"{token}"*' for token in tokens)
+    match = f'owner:u{int(user_id)} AND {{name info director type}}: ({terms})'
+    scored = f'SELECT rowid AS id, bm25(item_fts, {BM25_WEIGHTS}) AS score FROM item_fts WHERE item_fts MATCH :match'
+    # Every match is ranked unless SEARCH_RANK_CANDIDATES caps it to the newest (config.py)
+    candidates = current_app.config['SEARCH_RANK_CANDIDATES']
+    if candidates:
+        scored += ' ORDER BY rowid DESC LIMIT :candidates'
+    rows = db.session.execute(
+        text(f'SELECT id FROM ({scored}) ORDER BY score, id DESC LIMIT :limit'),
+        {'match': match, 'candidates': candidates, 'limit': limit},
+    )
+    return [row[0] for row in rows]
+
+
+def _ranked_ids_postgres(user_id, tokens, limit):
+    rows = db.session.execute(
+        text("SELECT item.id FROM item JOIN category ON category.id = item.category_id "
+             "LEFT JOIN work ON work.id = item.work_id "
+             "CROSS JOIN LATERAL (SELECT item.search_vector || coalesce(work.search_vector, ''::tsvector) AS v) doc "
+             "WHERE category.user_id = :user_id AND doc.v @@ to_tsquery('simple', :query) "
+             "ORDER BY ts_rank(doc.v, to_tsquery('simple', :query)) DESC, item.id LIMIT :limit"),
+        {'user_id': user_id, 'query': ' & '.join(f'{token}:*' for token in tokens), 'limit': limit},
+    )
+    return [row[0] for row in rows]
+
+
+def _ranked_ids_like(user_id, tokens, limit):
+    query = (db.session.query(Item.id).join(Category).outerjoin(Work, Work.id == Item.work_id)
+             .filter(Category.user_id == user_id))
+    for token in tokens:
+        pattern = f'%{token}%'
+        query = query.filter(or_(Item.name.ilike(pattern), Item.info.ilike(pattern), Work.info.ilike(pattern),
+                                 Item.director.ilike(pattern), Work.director.ilike(pattern),
+                                 Item.type.ilike(pattern)))
+    return [row[0] for row in query.order_by(Item.name, Item.id).limit(limit)]
+
+
+def search_items(user_id, query, limit=50):
+    """Best-ranked items of `user_id` matching every word of `query` (as prefixes)."""
+    tokens = tokenize(query)
+    if not tokens:
+        return []
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        ids = _ranked_ids_sqlite(user_id, tokens, limit)
+    elif dialect == 'postgresql':
+        ids = _ranked_ids_postgres(user_id, tokens, limit)
+    else:
+        ids = _ranked_ids_like(user_id, tokens, limit)
+    if not ids:
+        return []
+    items = {item.id: item for item in
+             Item.query.options(joinedload(Item.category)).filter(Item.id.in_(ids))}
+    return [items[item_id] for item_id in ids if item_id in items]
@@ -22,3 +22,145 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     });
 });
+
+// Inline status changes: applied in place and sent in one batched request
+// once the user stops changing rows for STATUS_DEBOUNCE_MS.
+const STATUS_DEBOUNCE_MS = 400;
+const pendingStatus = new Map(); // item id -> select element
+let statusTimer = null;
+
+function statusClass(status) {
+    return `item-status-${status.replace(/ /g, '')}`;
+}
+
+function setStatusClass(select, status) {
+    select.classList.forEach(cls => {
+        if (cls.startsWith('item-status-')) select.classList.remove(cls);
+    });
+    select.classList.add(statusClass(status));
+}
+
+function queueStatusChange(select) {
+    if (!select.dataset.saved) {
+        // Value the server has, to roll back to if the update is rejected
+        select.dataset.saved = [...select.options].find(opt => opt.defaultSelected)?.value || '';
+    }
+    setStatusClass(select, select.value);
+    pendingStatus.set(Number(select.dataset.itemId), select);
+    clearTimeout(statusTimer);
+    statusTimer = setTimeout(flushStatusChanges, STATUS_DEBOUNCE_MS);
+}
+
+function rollbackStatus(select) {
+    select.value = select.dataset.saved;
+    setStatusClass(select, select.value);
+}
+
+async function flushStatusChanges() {
+    if (!pendingStatus.size) return;
+    const batch = new Map(pendingStatus);
+    pendingStatus.clear();
+    const url = batch.values().next().value.dataset.batchUrl;
+    const updates = [...batch].map(([id, select]) => ({ id, status: select.value }));
+
+    try {
+        const response = await fetch(url, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json', 'X-Requested-With': 'XMLHttpRequest' },
+            body: JSON.stringify({ updates }),
+        });
+        if (!response.ok) throw new Error(response.statusText);
+        const result = await response.json();
+        result.updated.forEach(({ id, status }) => {
+            const select = batch.get(id);
+            // A newer change may already be queued for this row
+            if (select && !pendingStatus.has(id)) {
+                select.dataset.saved = status;
+                setStatusClass(select, status);
+            }
+        });
+        result.rejected.forEach(id => {
+            const select = batch.get(id);
+            if (select && !pendingStatus.has(id)) rollbackStatus(select);
+        });
+    } catch (err) {
+        batch.forEach((select, id) => {
+            if (!pendingStatus.has(id)) rollbackStatus(select);
+        });
+    }
+}
+
+// Don't lose a queued change when navigating away
+window.addEventListener('pagehide', () => {
+    if (!pendingStatus.size) return;
+    const url = pendingStatus.values().next().value.dataset.batchUrl;
+    const updates = [...pendingStatus].map(([id, select]) => ({ id, status: select.value }));
+    navigator.sendBeacon(url, new Blob([JSON.stringify({ updates })], { type: 'application/json' }));
+    pendingStatus.clear();
+});
+
+// Title suggestions for the add box: asked for once typing pauses for
+// SUGGEST_DEBOUNCE_MS, answers kept per prefix, stale requests aborted.
+const SUGGEST_DEBOUNCE_MS = 150;
+const SUGGEST_MIN_CHARS = 2;
+
+document.querySelectorAll('input[data-suggest-url]').forEach(input => {
+    const datalist = document.getElementById(input.getAttribute('list'));
+    const answers = new Map(); // prefix -> titles
+    let timer = null;
+    let inflight = null;
+
+    function show(titles) {
+        datalist.replaceChildren(...titles.map(title => {
+            const option = document.createElement('option');
+            option.value = title;
+            return option;
+        }));
+    }
+
+    async function fetchSuggestions(prefix) {
+        if (answers.has(prefix)) return show(answers.get(prefix));
+        inflight?.abort();
+        inflight = new AbortController();
+        try {
+            const url = `${input.dataset.suggestUrl}&q=${encodeURIComponent(prefix)}`;
+            const response = await fetch(url, { signal: inflight.signal, headers: { 'X-Requested-With': 'XMLHttpRequest' } });
+            if (!response.ok) return;
+            const { suggestions } = await response.json();
+            answers.set(prefix, suggestions);
+            // Only if the box still shows what we asked about
+            if (input.value.trim().toLowerCase() === prefix) show(suggestions);
+        } catch (err) {
+            // Aborted by a newer keystroke, or offline: keep the current list
+        }
+    }
+
+    input.addEventListener('input', () => {
+        clearTimeout(timer);
+        const prefix = input.value.trim().toLowerCase();
+        if (prefix.length < SUGGEST_MIN_CHARS) return show([]);
+        timer = setTimeout(() => fetchSuggestions(prefix), SUGGEST_DEBOUNCE_MS);
+    });
+});
+
+// Multi-select on list pages: the checked rows go to the bulk endpoints
+// through #bulk-form, whose buttons stay disabled while nothing is checked.
+const bulkForm = document.getElementById('bulk-form');
+if (bulkForm) {
+    const boxes = [...document.querySelectorAll('.bulk-select')];
+    const selectAll = document.getElementById('bulk-all');
+
+    function updateBulkForm() {
+        const checked = boxes.filter(box => box.checked).length;
+        document.getElementById('bulk-count').textContent = `${checked} selected`;
+        bulkForm.querySelectorAll('button').forEach(button => { button.disabled = !checked; });
+        selectAll.checked = checked === boxes.length;
+        selectAll.indeterminate = checked > 0 && checked < boxes.length;
+    }
+
+    boxes.forEach(box => box.addEventListener('change', updateBulkForm));
+    selectAll.addEventListener('change', () => {
+        boxes.forEach(box => { box.checked = selectAll.checked; });
+        updateBulkForm();
+    });
+}
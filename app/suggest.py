@@ -0,0 +1,231 @@
+"""Title suggestions for the add-item box, answered from memory.
+
+The index holds the titles enrichment has already resolved (Work names),
+per list type, as a sorted array of (normalized key, title) searched with
+bisect; a title is also filed under its key without a leading article, so
+"dark kn" finds "The Dark Knight". Matches are ranked by how many items
+resolved to the title.
+
+It grows as enrichment results arrive (run_jobs calls record()) and is
+persisted as an append-only journal of JSON lines, one per resolved title,
+so a new process loads it with one file read and no database query. Other
+processes pick up appended lines on their next lookup by reading only
+the bytes past their offset. A journal that has grown well past the number
+of distinct titles is compacted to one line per title with its count.
+Without a journal the index is built from the database on first use.
+"""
+import bisect
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import click
+from flask import current_app, url_for
+from sqlalchemy import func, select
+from app import db
+from app.models import Category, Item, Work
+from app.futurescope.cache import normalize_query
+
+log = logging.getLogger(__name__)
+
+SUGGEST_TYPES = ('watch', 'read') # the list types enrichment resolves
+MIN_PREFIX = 2
+MAX_RESULTS = 8
+SCAN_LIMIT = 200 # prefix matches ranked per lookup
+COMPACT_RATIO = 2 # journal lines per distinct title before rewriting
+COMPACT_MIN_LINES = 1000
+ARTICLE_RE = re.compile(r'^(the|an|a) ')
+
+
+def title_keys(title):
+    key = normalize_query(title)
+    keys = {key}
+    short = ARTICLE_RE.sub('', key)
+    if short:
+        keys.add(short)
+    return keys
+
+
+class PrefixIndex:
+    def __init__(self, path=None):
+        self.path = path
+        self._keys = {} # type -> sorted [(key, title)]
+        self._counts = {} # (type, title) -> times resolved
+        self._offset = 0 # journal bytes applied
+        self._lines = 0 # journal lines applied
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._counts)
+
+    def _add_many(self, rows):
+        """Adds (type, title, count) rows. New keys are appended and each list
+        re-sorted once (timsort merges the sorted run with the new tail), so
+        loading a large journal is not one insort per title."""
+        touched = set()
+        for list_type, title, count in rows:
+            if (list_type, title) not in self._counts:
+                self._keys.setdefault(list_type, []).extend((key, title) for key in title_keys(title))
+                self._counts[(list_type, title)] = 0
+                touched.add(list_type)
+            self._counts[(list_type, title)] += count
+        for list_type in touched:
+            self._keys[list_type].sort()
+
+    def _apply(self, lines):
+        rows = []
+        for line in lines:
+            self._lines += 1
+            try:
+                list_type, title, *count = json.loads(line)
+            except ValueError:
+                continue # a line cut short by a crash
+            rows.append((list_type, title, count[0] if count else 1))
+        self._add_many(rows)
+
+    def _reset(self):
+        self._keys, self._counts, self._offset, self._lines = {}, {}, 0, 0
+
+    def _sync(self):
+        """Applies journal lines appended since the last read (by any process)."""
+        try:
+            size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            return False
+        if size < self._offset:
+            # Compacted by another process: start over
+            self._reset()
+        if size > self._offset:
+            with open(self.path, 'rb') as f:
+                f.seek(self._offset)
+                data = f.read()
+            # Only whole lines; a partial last line is read again next time
+            end = data.rfind(b'\n') + 1
+            self._apply(data[:end].decode().splitlines())
+            self._offset += end
+        return True
+
+    def ensure_loaded(self, build=None):
+        with self._lock:
+            if not self._loaded:
+                if not (self.path and self._sync()) and build is not None:
+                    self._rebuild(build())
+                self._loaded = True
+            elif self.path:
+                self._sync()
+
+    def _rebuild(self, rows):
+        self._reset()
+        self._add_many(rows)
+        self._write_snapshot()
+
+    def rebuild(self, rows):
+        """Replaces the index (and journal) with (type, title, count) rows."""
+        with self._lock:
+            self._rebuild(rows)
+            self._loaded = True
+
+    def record(self, entries):
+        """Adds resolved (type, title) pairs and appends them to the journal."""
+        entries = [(list_type, title) for list_type, title in entries if title and list_type in SUGGEST_TYPES]
+        if not entries:
+            return
+        with self._lock:
+            if not self.path:
+                self._add_many((list_type, title, 1) for list_type, title in entries)
+                return
+            lines = ''.join(json.dumps([list_type, title]) + '\n' for list_type, title in entries).encode()
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            # O_APPEND: concurrent writers' lines do not interleave
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, lines)
+            finally:
+                os.close(fd)
+            # Our lines come back through the journal with anyone else's
+            self._sync()
+            if self._lines > max(COMPACT_MIN_LINES, COMPACT_RATIO * len(self._counts)):
+                log.info('compacting suggest index', extra={'titles': len(self._counts), 'lines': self._lines})
+                self._write_snapshot()
+
+    def _write_snapshot(self):
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            for (list_type, title), count in self._counts.items():
+                f.write(json.dumps([list_type, title, count]) + '\n')
+        os.replace(tmp, self.path)
+        self._offset, self._lines = os.path.getsize(self.path), len(self._counts)
+
+    def lookup(self, list_type, prefix, limit=MAX_RESULTS):
+        prefix = normalize_query(prefix)
+        if len(prefix) < MIN_PREFIX:
+            return []
+        with self._lock:
+            keys = self._keys.get(list_type, [])
+            start = bisect.bisect_left(keys, (prefix,))
+            titles = set()
+            for key, title in keys[start:start + SCAN_LIMIT]:
+                if not key.startswith(prefix):
+                    break
+                titles.add(title)
+            ranked = sorted(titles, key=lambda title: (-self._counts[(list_type, title)], len(title), title))
+        return ranked[:limit]
+
+
+def resolved_titles():
+    """(type, work name, items) for every work an enrichable list links to."""
+    rows = db.session.execute(
+        select(Category.type, Work.name, func.count(Item.id))
+        .select_from(Item).join(Work, Work.id == Item.work_id).join(Category, Category.id == Item.category_id)
+        .where(Category.type.in_(SUGGEST_TYPES), Work.name.isnot(None))
+        .group_by(Category.type, Work.name))
+    return rows.all()
+
+
+def get_index():
+    index = current_app.extensions['suggest_index']
+    index.ensure_loaded(resolved_titles)
+    return index
+
+
+def record(entries):
+    if entries:
+        get_index().record(entries)
+
+
+def suggest(list_type, prefix, limit=MAX_RESULTS):
+    if list_type not in SUGGEST_TYPES:
+        return []
+    return get_index().lookup(list_type, prefix, limit)
+
+
+def suggest_url(list_type):
+    """Endpoint URL for a list type's add box, or None if it has no suggestions."""
+    return url_for('main.suggest_titles', type=list_type) if list_type in SUGGEST_TYPES else None
+
+
+@click.command('rebuild-suggest-index')
+def rebuild_suggest_index_command():
+    """Rebuild the title suggestion journal from the database."""
+    index = current_app.extensions['suggest_index']
+    if not index.path:
+        raise click.ClickException('SUGGEST_INDEX_PATH is empty: suggestions are not persisted.')
+    index.rebuild(resolved_titles())
+    click.echo(f'{len(index)} titles indexed.')
+
+
+def init_app(app):
+    path = app.config['SUGGEST_INDEX_PATH']
+    if path is None:
+        path = os.path.join(app.instance_path, 'suggest_index.jsonl')
+    # Loaded on first use, not here: create_app() stays free of I/O
+    app.extensions['suggest_index'] = PrefixIndex(path or None)
+    app.jinja_env.globals['suggest_url'] = suggest_url
+    app.cli.add_command(rebuild_suggest_index_command)
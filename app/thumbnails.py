@@ -0,0 +1,194 @@
+"""Local thumbnails of item images (the og:image URLs the scraper found).
+
+Templates ask for thumbnail_url(item, size, fmt) instead of linking the
+full-size third-party image. That URL is
+
+    /thumb/<item id>/<size>/<digest>.<fmt>
+
+where digest is an HMAC of the source image URL, so it changes whenever
+the item's image URL does and the response can be cached as immutable. On a
+miss the source is fetched once (through the scraper's per-host rate
+limit) and every size/format variant is written to a size-bounded disk
+LRU; hits are served straight from disk without touching the database.
+
+Pillow is optional: without it thumbnail_url() returns the original URL.
+"""
+import functools
+import hashlib
+import hmac
+import importlib.util
+import io
+import logging
+import os
+import re
+import tempfile
+import threading
+from flask import Response, current_app, redirect, send_file, url_for
+from sqlalchemy import func, select
+from app import db
+from app.models import Item, Work
+
+log = logging.getLogger(__name__)
+
+# name: bounding box (2x the CSS size of the list cell / detail poster)
+SIZES = {'list': (96, 144), 'detail': (600, 900)}
+FORMATS = {'webp': ('WEBP', 'image/webp', {'quality': 80, 'method': 4}),
+           'jpeg': ('JPEG', 'image/jpeg', {'quality': 82, 'optimize': True, 'progressive': True})}
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+DIGEST_RE = re.compile(r'[0-9a-f]{32}')
+
+
+class DiskLRU:
+    """Files in one directory, evicted least-recently-used (by mtime, which a
+    hit refreshes) once their total size passes max_bytes. Several processes
+    may share the directory; each one's running total is re-synced from disk
+    whenever it evicts."""
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._size = None
+        self._lock = threading.Lock()
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def get(self, name):
+        path = self._path(name)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, name, data):
+        os.makedirs(self.directory, exist_ok=True)
+        # Write-then-rename: a concurrent reader never sees a partial file
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, self._path(name))
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += len(data)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        with os.scandir(self.directory) as entries:
+            return [(entry.stat().st_mtime, entry.stat().st_size, entry.path)
+                    for entry in entries if entry.is_file() and not entry.name.endswith('.tmp')]
+
+    def _scan_size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self):
+        # Down to 90% so that a full cache does not evict on every write
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self._size = total
+
+
+@functools.cache
+def pillow_available():
+    # Pillow itself is imported on the first miss, not on every process start
+    return importlib.util.find_spec('PIL') is not None
+
+
+def enabled():
+    return pillow_available() and current_app.extensions.get('thumbnail_cache') is not None
+
+
+def sign(image_url):
+    key = current_app.config['SECRET_KEY'].encode()
+    return hmac.new(key, image_url.encode(), hashlib.sha256).hexdigest()[:32]
+
+
+def thumbnail_url(item, size='list', fmt='jpeg'):
+    """URL of the `size` thumbnail of the item's image, or the original URL
+    when thumbnails are off or the image is not an http(s) URL."""
+    image_url = item.display_image_url
+    if not image_url or not enabled() or not image_url.startswith(('http://', 'https://')):
+        return image_url
+    return url_for('thumbnail', item_id=item.id, size=size, digest=sign(image_url), fmt=fmt)
+
+
+def render_variants(source):
+    """{(size, fmt): encoded bytes} for every size and format."""
+    from PIL import Image, ImageOps
+
+    variants = {}
+    with Image.open(io.BytesIO(source)) as original:
+        # Lets the JPEG decoder downscale while decoding, far cheaper than a full-size decode
+        original.draft('RGB', max(SIZES.values()))
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+        for size, box in SIZES.items():
+            resized = image.copy()
+            resized.thumbnail(box, Image.LANCZOS)
+            for fmt, (pil_format, _, options) in FORMATS.items():
+                out = resized.convert('RGB') if pil_format == 'JPEG' and resized.mode != 'RGB' else resized
+                buffer = io.BytesIO()
+                out.save(buffer, pil_format, **options)
+                variants[(size, fmt)] = buffer.getvalue()
+    return variants
+
+
+def immutable(response):
+    response.cache_control.public = True
+    response.cache_control.max_age = IMMUTABLE_MAX_AGE
+    response.cache_control.immutable = True
+    return response
+
+
+def thumbnail(item_id, size, digest, fmt):
+    if size not in SIZES or fmt not in FORMATS or not DIGEST_RE.fullmatch(digest) or not enabled():
+        return "Image not found", 404
+    mimetype = FORMATS[fmt][1]
+    cache = current_app.extensions['thumbnail_cache']
+    name = f'{digest}-{size}.{fmt}'
+    path = cache.get(name)
+    if path is not None:
+        return immutable(send_file(path, mimetype=mimetype, etag=digest, max_age=IMMUTABLE_MAX_AGE))
+
+    image_url = db.session.scalar(
+        select(func.coalesce(func.nullif(Item.image_url, ''), Work.image_url))
+        .select_from(Item).outerjoin(Work, Work.id == Item.work_id).where(Item.id == item_id))
+    if not image_url or not hmac.compare_digest(sign(image_url), digest):
+        return "Image not found", 404
+
+    from app.futurescope.http import fetch_image
+    from app.futurescope.limits import provider_for_url
+    try:
+        source = provider_for_url(image_url).call(
+            fetch_image, image_url, max_bytes=current_app.config['THUMBNAIL_MAX_SOURCE_BYTES'])
+        variants = render_variants(source)
+    except Exception as e:
+        # Not cached: the browser falls back to the original this once and retries later
+        log.warning('thumbnail failed', extra={'item_id': item_id, 'url': image_url, 'error': repr(e)})
+        return redirect(image_url)
+    for (variant_size, variant_fmt), data in variants.items():
+        cache.put(f'{digest}-{variant_size}.{variant_fmt}', data)
+    response = Response(variants[(size, fmt)], mimetype=mimetype)
+    response.set_etag(digest)
+    return immutable(response)
+
+
+def init_app(app):
+    directory = app.config['THUMBNAIL_CACHE_DIR'] or os.path.join(app.instance_path, 'thumbnails')
+    max_bytes = app.config['THUMBNAIL_CACHE_MAX_BYTES']
+    app.extensions['thumbnail_cache'] = DiskLRU(directory, max_bytes) if max_bytes > 0 else None
+    app.add_url_rule('/thumb/<int:item_id>/<size>/<digest>.<fmt>', 'thumbnail', thumbnail)
+    app.jinja_env.globals['thumbnail_url'] = thumbnail_url
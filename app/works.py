@@ -0,0 +1,133 @@
+"""Shared catalog of works: the scraped metadata of one page, stored once.
+
+fetch_meta_data results are keyed by the normalized page URL. Every item
+enriched from that page links to the same Work instead of getting its own
+copy of the description, image, director, year and sequel fields; a later
+refresh updates that one row. Items keep their own values only where the
+user set them (Item.display_* prefer those); items linked by the upgrade
+(fold_duplicates) keep everything they had.
+"""
+from datetime import datetime
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.changes import log_work_items
+from app.models import Item, Work, bump_category_versions
+
+WORK_FIELDS = ('name', 'info', 'image_url', 'director', 'year', 'sequel_prequel')
+# Fields an item stops storing once it points at a work with the same value
+SHARED_ITEM_FIELDS = ('info', 'image_url', 'director', 'year', 'sequel_prequel')
+TRACKING_PARAMS = ('ref', 'ref_', 'fbclid', 'gclid')
+
+
+def normalize_url(url):
+    """Same page, same key: https, no www./mobile host, no fragment,
+    tracking parameters or trailing slash."""
+    if not url:
+        return None
+    parts = urlsplit(url.strip())
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        return None
+    host = parts.hostname.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    # en.m.wikipedia.org -> en.wikipedia.org
+    host = host.replace('.m.wikipedia.org', '.wikipedia.org')
+    query = urlencode([(key, value) for key, value in parse_qsl(parts.query)
+                       if key not in TRACKING_PARAMS and not key.startswith('utm_')])
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit(('https', host, path, query, ''))[:500]
+
+
+def work_values(data):
+    return {field: data.get(field) or None for field in WORK_FIELDS}
+
+
+def _find(url):
+    return db.session.scalar(select(Work).where(Work.url == url))
+
+
+def upsert_work(data):
+    """The Work for a fetch_meta_data result (created or refreshed), or None
+    if the result has no page URL. The caller commits."""
+    url = normalize_url(data.get('link'))
+    if url is None:
+        return None
+    values = work_values(data)
+    work = _find(url)
+    if work is None:
+        try:
+            # Savepoint: another worker may insert the same URL concurrently
+            with db.session.begin_nested():
+                work = Work(url=url, **values)
+                db.session.add(work)
+        except IntegrityError:
+            work = _find(url)
+        else:
+            return work
+
+    changes = {field: value for field, value in values.items()
+               if value is not None and getattr(work, field) != value}
+    if changes:
+        for field, value in changes.items():
+            setattr(work, field, value)
+        work.version = Work.version + 1
+        work.updated_at = datetime.utcnow()
+        # Lists showing the work change too (API ETags, dashboard cards), and so
+        # does every item in the change feed
+        category_ids = db.session.scalars(
+            select(Item.category_id).where(Item.work_id == work.id).distinct()).all()
+        bump_category_versions(db.session.connection(), category_ids)
+        log_work_items(db.session.connection(), work.id)
+    return work
+
+
+def link_item(item, work):
+    """Points `item` at `work`; own values equal to the work's are dropped."""
+    item.work = work
+    for field in SHARED_ITEM_FIELDS:
+        if getattr(item, field) is not None and getattr(item, field) == getattr(work, field):
+            setattr(item, field, None)
+    if item.link and normalize_url(item.link) == work.url:
+        item.link = None
+
+
+def own_value(item, field, value):
+    """What to store for a user-submitted `field`: None (keep showing the
+    work's value) when it is blank or the same as the work's."""
+    if not isinstance(value, str):
+        return value
+    if not value.strip():
+        return None
+    if item.work is not None:
+        if field == 'link':
+            if normalize_url(value) == item.work.url:
+                return None
+        elif value.strip() == (getattr(item.work, field) or '').strip():
+            return None
+    return value
+
+
+def fold_duplicates(conn):
+    """Migration step: links every item with a page link to a Work, one per
+    normalized URL. Nothing is copied from the items: their columns mix
+    scraped values with what users wrote (a private note in `info`), and a
+    work is shared across accounts. The works start empty, items keep all
+    their values, and the next lookup of a page fills its work from the
+    scraped result (upsert_work). Returns (works, items) linked."""
+    items, works = Item.__table__, Work.__table__
+    groups = {}
+    for row in conn.execute(select(items.c.id, items.c.link)
+                            .where(items.c.link.isnot(None), items.c.work_id.is_(None))):
+        url = normalize_url(row.link)
+        if url:
+            groups.setdefault(url, []).append(row.id)
+
+    existing = dict(conn.execute(select(works.c.url, works.c.id)).all())
+    for url, item_ids in groups.items():
+        work_id = existing.get(url)
+        if work_id is None:
+            work_id = conn.execute(works.insert().values(url=url, updated_at=datetime.utcnow())).inserted_primary_key[0]
+        conn.execute(items.update().where(items.c.id.in_(item_ids)).values(work_id=work_id))
+    return len(groups), sum(len(item_ids) for item_ids in groups.values())
@@ -0,0 +1,115 @@
+"""Parse time and peak memory of the scraper's extraction paths.
+
+Compares, per page:
+
+  soup  - the original path: BeautifulSoup(html.parser) over the whole page
+  lxml  - app.futurescope.extract.extract_with_lxml (head + infobox only)
+
+Each (engine, page) pair runs in a fresh subprocess so the peak RSS figure
+is not polluted by earlier runs; tracemalloc only sees Python allocations
+(not libxml2's), so both numbers are reported.
+
+    python benchmarks/bench_extract.py                 # synthetic Wikipedia-sized page
+    python benchmarks/bench_extract.py page1.html ...  # saved pages (URL taken as Wikipedia)
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+RUNS = 20
+WIKI_URL = 'https://en.wikipedia.org/wiki/Benchmark'
+
+
+def synthetic_wikipedia_page(paragraphs=1500):
+    """Roughly the shape and size (~600 KB) of a long Wikipedia film article."""
+    head = ['<!DOCTYPE html><html><head><meta charset="UTF-8"><title>Heat (1995 film) - Wikipedia</title>']
+    head += [f'<link rel="stylesheet" href="/w/load.php?modules=site.styles{n}">' for n in range(40)]
+    head += [f'<script>var wgConfig{n} = {{"a": {n}, "b": "{"x" * 200}"}};</script>' for n in range(30)]
+    head.append('<meta name="description" content="1995 American crime film by Michael Mann">')
+    head.append('<meta property="og:image" content="https://upload.wikimedia.org/heat.jpg">')
+    head.append('</head><body>')
+    infobox = ['<table class="infobox vevent"><tbody>']
+    for label, value in [('Directed by', 'Michael Mann'), ('Written by', 'Michael Mann'),
+                         ('Starring', '<div class="plainlist"><ul>' + '<li>Actor</li>' * 12 + '</ul></div>'),
+                         ('Release date', '<ul><li>December 15, 1995</li></ul>'),
+                         ('Running time', '170 minutes'), ('Followed by', 'Heat 2')]:
+        infobox.append(f'<tr><th scope="row" class="infobox-label">{label}</th><td class="infobox-data">{value}</td></tr>')
+    infobox.append('</tbody></table>')
+    body = []
+    for n in range(paragraphs):
+        if n % 100 == 0:
+            body.append(f'<h2><span class="mw-headline" id="s{n}">Section {n}</span></h2>')
+        body.append(f'<p>Paragraph {n} with <a href="/wiki/Link_{n}">a link</a>, <i>italics</i>'
+                    f' and a citation<sup class="reference"><a href="#cite_note-{n}">[{n}]</a></sup>. '
+                    + 'Lorem ipsum dolor sit amet. ' * 10 + '</p>')
+    return (''.join(head) + ''.join(infobox) + ''.join(body) + '</body></html>').encode()
+
+
+def measure(engine, path):
+    """Runs in the child process: times RUNS extractions and reports memory peaks."""
+    import resource
+    import time
+    import tracemalloc
+    from app.futurescope import extract
+
+    with open(path, 'rb') as f:
+        body = f.read()
+    fn = extract.extract_with_lxml if engine == 'lxml' else extract.extract_with_soup
+    fn(body, WIKI_URL, 'watch')  # warm up imports
+
+    baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    tracemalloc.start()
+    result = fn(body, WIKI_URL, 'watch')
+    _, peak_py = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    timings = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        fn(body, WIKI_URL, 'watch')
+        timings.append(time.perf_counter() - start)
+    return {'median_ms': statistics.median(timings) * 1000, 'peak_py_kb': peak_py / 1024,
+            'rss_growth_kb': peak_rss - baseline_rss, 'result': result}
+
+
+def run_child(engine, path):
+    out = subprocess.run([sys.executable, __file__, '--child', engine, path],
+                         capture_output=True, text=True, check=True, cwd=ROOT)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main(paths):
+    cleanup = None
+    if not paths:
+        fd, cleanup = tempfile.mkstemp(suffix='.html')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(synthetic_wikipedia_page())
+        paths = [cleanup]
+    try:
+        print(f"{'page':<28} {'engine':<6} {'size KB':>8} {'median ms':>10} {'py peak KB':>11} {'RSS +KB':>8}")
+        for path in paths:
+            size_kb = os.path.getsize(path) / 1024
+            results = {engine: run_child(engine, path) for engine in ('soup', 'lxml')}
+            for engine, r in results.items():
+                name = 'synthetic' if path == cleanup else os.path.basename(path)
+                print(f"{name:<28} {engine:<6} {size_kb:>8.0f} {r['median_ms']:>10.2f} "
+                      f"{r['peak_py_kb']:>11.0f} {r['rss_growth_kb']:>8}")
+            if results['soup']['result'] != results['lxml']['result']:
+                print(f"  ! results differ: {results['soup']['result']} vs {results['lxml']['result']}")
+    finally:
+        if cleanup:
+            os.remove(cleanup)
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--child']:
+        print(json.dumps(measure(sys.argv[2], sys.argv[3])))
+    else:
+        main(sys.argv[1:])
@@ -0,0 +1,59 @@
+"""SQL statements issued per request for the ownership-checked routes.
+
+Seeds an in-memory database with one user, one list and one item, logs in
+through the real login form and counts every statement the engine sends
+while serving each request.
+
+    python benchmarks/bench_queries.py
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
+
+from app import create_app, db
+from app.models import User, Category, Item
+from config import TestingConfig
+
+
+def main():
+    app = create_app(TestingConfig)
+    with app.app_context():
+        user = User(username='bench', email='bench@example.com', password_hash=generate_password_hash('pw'))
+        films = Category(name='Films', type='watch', owner=user)
+        item = Item(name='Heat', status='Plan to Watch', category=films)
+        db.session.add_all([user, films, item])
+        db.session.commit()
+        category_id, item_id = films.id, item.id
+        engine = db.engine
+
+    client = app.test_client()
+    client.post('/login', data={'email': 'bench@example.com', 'password': 'pw'})
+    statements = []
+    event.listen(engine, 'before_cursor_execute', lambda conn, cursor, statement, *args: statements.append(statement))
+
+    xhr = {'X-Requested-With': 'XMLHttpRequest'}
+    requests = [
+        ('GET', f'/list/{category_id}', {}),
+        ('GET', f'/item/{item_id}', {}),
+        ('POST', f'/item/update_status/{item_id}', {'data': {'status': 'Watching'}, 'headers': xhr}),
+        ('POST', f'/item/toggle/{item_id}', {'headers': xhr}),
+        ('GET', f'/api/v1/lists/{category_id}/items', {}),
+        ('PATCH', f'/api/v1/items/{item_id}', {'json': {'status': 'Completed'}}),
+    ]
+    print(f"{'request':<40} {'status':>6} {'queries':>8}")
+    for method, url, kwargs in requests:
+        statements.clear()
+        response = client.open(url, method=method, **kwargs)
+        print(f"{method + ' ' + url:<40} {response.status_code:>6} {len(statements):>8}")
+        if '-v' in sys.argv:
+            for statement in statements:
+                print('    ' + ' '.join(statement.split())[:100])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""Latency, SQL statements and peak memory per route on a seeded dataset.
+
+Seeds users x lists x items (benchmarks/seed.py), logs in as the first
+user through the real login form, then drives each scenario through
+Flask's test client: a few warm-up calls (caches filled), RUNS timed
+calls, and one more under tracemalloc for the peak Python allocation.
+
+    python benchmarks/bench_routes.py [--users 3 --lists 3 --items 5000 --runs 50]
+    python benchmarks/bench_routes.py --db bench.db   # file database (WAL) instead of :memory:
+"""
+import argparse
+import itertools
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sqlalchemy import event
+
+from app import create_app, db
+from app.models import Category, Item
+from benchmarks.seed import seed
+from config import TestingConfig
+
+WARMUP = 3
+XHR = {'X-Requested-With': 'XMLHttpRequest'}
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def scenarios(category_id, item_ids, statuses):
+    """(name, callable(client, n) -> response); n counts calls, for varying mutations."""
+    item_cycle = itertools.cycle(item_ids)
+    return [
+        ('index', lambda c, n: c.get('/')),
+        ('view_list', lambda c, n: c.get(f'/list/{category_id}')),
+        ('view_list sort=name', lambda c, n: c.get(f'/list/{category_id}?sort=name&order=desc')),
+        ('view_list status filter', lambda c, n: c.get(f'/list/{category_id}?status={statuses[1]}')),
+        ('view_item', lambda c, n: c.get(f'/item/{item_ids[0]}')),
+        ('search', lambda c, n: c.get('/search?q=heat')),
+        ('update_status (XHR)', lambda c, n: c.post(f'/item/update_status/{next(item_cycle)}',
+                                                    data={'status': statuses[n % len(statuses)]}, headers=XHR)),
+        ('batch status x10', lambda c, n: c.post('/item/update_status', json={'updates': [
+            {'id': next(item_cycle), 'status': statuses[n % len(statuses)]} for _ in range(10)]})),
+        ('bulk status x50', lambda c, n: c.post('/item/bulk/status', json={
+            'ids': item_ids[:50], 'status': statuses[n % len(statuses)]})),
+        ('toggle (XHR)', lambda c, n: c.post(f'/item/toggle/{next(item_cycle)}', headers=XHR)),
+        ('add_item', lambda c, n: c.post(f'/item/add/{category_id}', data={'name': f'Bench {n}'})),
+        ('api list items', lambda c, n: c.get(f'/api/v1/lists/{category_id}/items')),
+        ('api patch item', lambda c, n: c.patch(f'/api/v1/items/{next(item_cycle)}',
+                                                json={'status': statuses[n % len(statuses)]})),
+    ]
+
+
+def run(name, call, client, statements, runs):
+    counter = itertools.count()
+    for _ in range(WARMUP):
+        call(client, next(counter))
+    timings, queries, status = [], [], None
+    for _ in range(runs):
+        statements.clear()
+        n = next(counter)
+        start = time.perf_counter()
+        response = call(client, n)
+        timings.append(time.perf_counter() - start)
+        queries.append(len(statements))
+        status = response.status_code
+    tracemalloc.start()
+    call(client, next(counter))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'name': name, 'status': status,
+        'p50_ms': percentile(timings, 0.5) * 1000, 'p95_ms': percentile(timings, 0.95) * 1000,
+        'queries': statistics.mean(queries), 'peak_kb': peak / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=3)
+    parser.add_argument('--lists', type=int, default=3)
+    parser.add_argument('--items', type=int, default=5000, help='items per list')
+    parser.add_argument('--runs', type=int, default=50)
+    parser.add_argument('--db', help='SQLite file to create (default: in-memory)')
+    args = parser.parse_args()
+
+    class BenchConfig(TestingConfig):
+        if args.db:
+            SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.abspath(args.db)
+            SQLITE_PRAGMAS = dict(TestingConfig.SQLITE_PRAGMAS, synchronous='NORMAL')
+
+    app = create_app(BenchConfig)
+    start = time.perf_counter()
+    created = seed(app, args.users, args.lists, args.items)
+    print(f"seeded {args.users} users x {args.lists} lists x {args.items} items "
+          f"in {time.perf_counter() - start:.1f}s")
+
+    category_id = created['lists'][0]
+    with app.app_context():
+        statuses = db.session.get(Category, category_id).status_options
+        item_ids = [row[0] for row in db.session.query(Item.id).filter_by(category_id=category_id)
+                    .order_by(Item.id.desc()).limit(200)]
+        engine = db.engine
+
+    client = app.test_client()
+    client.post('/login', data={'email': 'bench0@example.com', 'password': 'pw'})
+    statements = []
+    event.listen(engine, 'before_cursor_execute', lambda conn, cursor, statement, *a: statements.append(statement))
+
+    print(f"{'scenario':<26} {'status':>6} {'p50 ms':>8} {'p95 ms':>8} {'queries':>8} {'py peak KB':>11}")
+    for name, call in scenarios(category_id, item_ids, statuses):
+        r = run(name, call, client, statements, args.runs)
+        print(f"{r['name']:<26} {r['status']:>6} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} "
+              f"{r['queries']:>8.1f} {r['peak_kb']:>11.0f}")
+
+    import resource
+    print(f"process peak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""Offline scraper benchmark on saved pages (benchmarks/fixtures/).
+
+For each fixture:
+
+  extract   - extract_page (lxml fast path) and extract_with_soup on the raw bytes
+  pipeline  - fetch_meta_data(url) end to end, with fetch_page answering from
+              the fixture instead of the network and the metadata cache off;
+              the per-stage split comes from app.metrics (fetch, parse, infobox)
+
+Results are checked against the expected fields below, so a parser change
+that breaks extraction shows up here as well as in the timings.
+
+    python benchmarks/bench_scraper.py [runs]
+"""
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app import metrics
+from app.futurescope import cache as metadata_cache
+from app.futurescope import extract, limits, metadata
+from app.futurescope.http import Page
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+# file: (page URL, category type, expected subset of the result)
+FIXTURES = {
+    'wikipedia_heat_1995_film.html': ('https://en.wikipedia.org/wiki/Heat_(1995_film)', 'watch', {
+        'name': 'Heat (1995 film)', 'director': 'Michael Mann', 'year': '1995', 'sequel_prequel': 'Heat 2',
+        'image_url': 'https://upload.wikimedia.org/wikipedia/en/6/6c/Heatposter.jpg'}),
+    'imdb_tt0113277.html': ('https://www.imdb.com/title/tt0113277/', 'watch', {
+        'name': 'Heat (1995)', 'director': None}),
+}
+RUNS = 50
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def timed(fn, runs):
+    fn()  # warm up
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return percentile(timings, 0.5) * 1000, percentile(timings, 0.95) * 1000, peak / 1024
+
+
+def check(name, result, expected):
+    wrong = {key: (result.get(key), value) for key, value in expected.items() if result.get(key) != value}
+    if wrong:
+        print(f"  ! {name}: unexpected fields (got, expected): {wrong}")
+
+
+def main(runs):
+    metadata_cache.configure_cache('none')
+    # No throttling offline
+    unlimited = (1e9, 1e9)
+    limits.configure(rate_limits={name: unlimited for name in limits.DEFAULT_RATE_LIMITS}, host_rate=unlimited)
+    print(f"{'fixture':<32} {'path':<10} {'KB':>5} {'p50 ms':>8} {'p95 ms':>8} {'py peak KB':>11}")
+    stage_rows = []
+    for filename, (url, category_type, expected) in FIXTURES.items():
+        with open(os.path.join(FIXTURES_DIR, filename), 'rb') as f:
+            body = f.read()
+        page = Page(url, 200, body)
+        metadata.fetch_page = lambda *args, **kwargs: page
+
+        paths = [
+            ('lxml', lambda: extract.extract_page(body, url, category_type)),
+            ('soup', lambda: extract.extract_with_soup(body, url, category_type)),
+            ('pipeline', lambda: metadata.fetch_meta_data(url, category_type)),
+        ]
+        for path, fn in paths:
+            metrics.reset()
+            check(f'{filename} {path}', fn(), expected)
+            p50, p95, peak = timed(fn, runs)
+            print(f"{filename:<32} {path:<10} {len(body) / 1024:>5.0f} {p50:>8.3f} {p95:>8.3f} {peak:>11.0f}")
+        # Stage split of the pipeline runs, the last path measured
+        for (stage, _), series in sorted(metrics.SCRAPER_STAGE.snapshot().items()):
+            stage_rows.append((filename, stage, series[-2] / series[-1] * 1000, series[-1]))
+
+    print(f"\n{'fixture':<32} {'stage':<10} {'mean ms':>8} {'calls':>6}")
+    for filename, stage, mean_ms, count in stage_rows:
+        print(f"{filename:<32} {stage:<10} {mean_ms:>8.3f} {count:>6}")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else RUNS)
@@ -0,0 +1,85 @@
+"""Cold-start cost of a worker process: imports, create_app() and the first request.
+
+Each run is a fresh interpreter (what a gunicorn worker or CLI call pays).
+The database file is created once up front with create_schema(), the way
+`flask --app run upgrade-db` would on deploy; runs then boot with
+AUTO_CREATE_SCHEMA off, and once more with it on for comparison.
+
+    python benchmarks/bench_startup.py [runs]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+HEAVY_MODULES = ('duckduckgo_search', 'googlesearch', 'requests', 'bs4', 'lxml', 'requests_oauthlib')
+
+CHILD = r'''
+import json, sys, time
+start = time.perf_counter()
+from app import create_app
+from config import ProductionConfig
+imported = time.perf_counter()
+
+class BenchConfig(ProductionConfig):
+    SQLALCHEMY_DATABASE_URI = sys.argv[1]
+    AUTO_CREATE_SCHEMA = sys.argv[2] == '1'
+    ENRICHMENT_WORKERS = 0
+
+app = create_app(BenchConfig)
+created = time.perf_counter()
+status = app.test_client().get('/login').status_code
+served = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_request_ms': (served - created) * 1000,
+    'total_ms': (served - start) * 1000,
+    'status': status,
+    'heavy_modules': [m for m in %r if m in sys.modules],
+}))
+''' % (HEAVY_MODULES,)
+
+
+def prepare_database(uri):
+    from app import create_app
+    from app.migrations import create_schema
+    from config import ProductionConfig
+
+    class SetupConfig(ProductionConfig):
+        SQLALCHEMY_DATABASE_URI = uri
+        ENRICHMENT_WORKERS = 0
+
+    with create_app(SetupConfig).app_context():
+        create_schema()
+
+
+def run(uri, auto_create, runs):
+    results = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, '-c', CHILD, uri, '1' if auto_create else '0'],
+                             capture_output=True, text=True, check=True, cwd=ROOT)
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return results
+
+
+def main(runs=5):
+    with tempfile.TemporaryDirectory() as tmp:
+        uri = f"sqlite:///{os.path.join(tmp, 'startup.db')}"
+        prepare_database(uri)
+        print(f"{'profile':<22} {'import':>8} {'create_app':>11} {'1st request':>12} {'total':>8}   (median ms, {runs} runs)")
+        for label, auto_create in (('schema via CLI', False), ('AUTO_CREATE_SCHEMA', True)):
+            results = run(uri, auto_create, runs)
+            median = lambda key: statistics.median(r[key] for r in results)
+            print(f"{label:<22} {median('import_ms'):>8.1f} {median('create_app_ms'):>11.1f} "
+                  f"{median('first_request_ms'):>12.1f} {median('total_ms'):>8.1f}")
+        print(f"heavy modules loaded at boot: {', '.join(results[0]['heavy_modules']) or 'none'}")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -0,0 +1,93 @@
+"""Deterministic data generator for the benchmarks: N users x M lists x K items.
+
+Rows go in through Core executemany in batches (the FTS triggers still
+index every item). User n is bench<n>@example.com with password 'pw'.
+
+    python benchmarks/seed.py bench.db --users 10 --lists 5 --items 2000
+
+or, from another script, seed(app, users, lists, items) inside create_app().
+"""
+import argparse
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from werkzeug.security import generate_password_hash
+
+from app import db
+from app.models import STATUS_OPTIONS, DEFAULT_STATUS_OPTIONS, User, Category, Item
+
+LIST_TYPES = ('watch', 'read', 'general')
+WORDS = ('heat', 'dune', 'alien', 'river', 'night', 'city', 'ghost', 'empire', 'summer', 'silent',
+         'red', 'last', 'storm', 'garden', 'mirror', 'north', 'glass', 'iron', 'paper', 'moon')
+DIRECTORS = ('Michael Mann', 'Denis Villeneuve', 'Ridley Scott', 'Agnes Varda', 'Akira Kurosawa',
+             'Ursula K. Le Guin', 'Frank Herbert', 'Octavia Butler', None)
+BATCH_SIZE = 1000
+
+
+def item_rows(rng, category_id, list_type, count, start):
+    statuses = STATUS_OPTIONS.get(list_type, DEFAULT_STATUS_OPTIONS)
+    for n in range(count):
+        title = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 3))).title()
+        yield {
+            'name': f'{title} {n}',
+            'status': rng.choice(statuses),
+            'date_added': start + timedelta(minutes=n),
+            'info': f'{title}: ' + ' '.join(rng.choice(WORDS) for _ in range(20)),
+            'director': rng.choice(DIRECTORS),
+            'year': str(rng.randint(1950, 2025)),
+            'type': list_type,
+            'category_id': category_id,
+            'version': 1,
+        }
+
+
+def seed(app, users=1, lists=3, items=1000, random_seed=0):
+    """Seeds the app's database; returns {'users': [user ids], 'lists': [category ids]}."""
+    rng = random.Random(random_seed)
+    password_hash = generate_password_hash('pw')
+    start = datetime(2020, 1, 1)
+    created = {'users': [], 'lists': []}
+    with app.app_context():
+        for u in range(users):
+            user = User(username=f'bench{u}', email=f'bench{u}@example.com', password_hash=password_hash)
+            categories = [Category(name=f'List {m}', type=LIST_TYPES[m % len(LIST_TYPES)], owner=user)
+                          for m in range(lists)]
+            db.session.add_all([user, *categories])
+            db.session.commit()
+            created['users'].append(user.id)
+            for category in categories:
+                created['lists'].append(category.id)
+                rows = item_rows(rng, category.id, category.type, items, start)
+                while batch := [row for _, row in zip(range(BATCH_SIZE), rows)]:
+                    db.session.execute(db.insert(Item), batch)
+                db.session.commit()
+    return created
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('database', help='SQLite file to create (schema included)')
+    parser.add_argument('--users', type=int, default=1)
+    parser.add_argument('--lists', type=int, default=3)
+    parser.add_argument('--items', type=int, default=1000, help='items per list')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    from app import create_app
+    from config import TestingConfig
+
+    class SeedConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.abspath(args.database)
+
+    created = seed(create_app(SeedConfig), args.users, args.lists, args.items, args.seed)
+    print(f"{len(created['users'])} users, {len(created['lists'])} lists, "
+          f"{len(created['lists']) * args.items} items -> {args.database}")
+
+
+if __name__ == '__main__':
+    main()
@@ -8,6 +8,89 @@ class Config:
     # Use SQLite for local development, PostgreSQL (or others) for production
     SQLALCHEMY_DATABASE_URI = os.environ.get('SQLALCHEMY_DATABASE_URI') or 'sqlite:///wishlist.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Create tables and run migrations inside create_app(). Off by default:
+    # production runs `flask --app run upgrade-db` once per deploy instead.
+    AUTO_CREATE_SCHEMA = os.environ.get('AUTO_CREATE_SCHEMA', '0') == '1'
+    # Explicit engine options; merged over the pool / SQLite settings below (app/database.py)
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+    
+    # Connection pool for server databases (Postgres, MySQL); not used for SQLite
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = 30 # seconds to wait for a free connection
+    DB_POOL_RECYCLE = 1800 # reconnect before server-side idle timeouts
+    DB_POOL_PRE_PING = True
+    
+    # Applied to every new SQLite connection. WAL lets readers run alongside the
+    # writer and busy_timeout makes a second writer wait instead of failing
+    # with "database is locked".
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000)), # ms
+        'mmap_size': 256 * 1024 * 1024,
+    }
+
+    # Logging (app/logs.py): off below WARNING unless asked; LOG_FORMAT 'text' or 'json'
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'WARNING')
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text')
+    
+    # Prometheus-text metrics at /metrics (app/metrics.py), loopback clients only unless allowed
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+    METRICS_ALLOW_REMOTE = os.environ.get('METRICS_ALLOW_REMOTE') == '1'
+    
+    # Pagination
+    ITEMS_PER_PAGE = int(os.environ.get('ITEMS_PER_PAGE', 50))
+    
+    # Full-text search (app/search.py) ranks every match by bm25 (~2us per row). A positive
+    # value ranks only the newest N matches, so a one-letter query over a huge list stays
+    # fast but can miss better-ranked older items; 0 ranks them all
+    SEARCH_RANK_CANDIDATES = int(os.environ.get('SEARCH_RANK_CANDIDATES', 0))
+    
+    # Rendered list rows / dashboard cards kept per process (app/fragments.py); 0 disables
+    FRAGMENT_CACHE_MAX_ENTRIES = int(os.environ.get('FRAGMENT_CACHE_MAX_ENTRIES', 5000))
+    
+    # Item image thumbnails (app/thumbnails.py): disk LRU, default <instance>/thumbnails; 0 bytes disables
+    THUMBNAIL_CACHE_DIR = os.environ.get('THUMBNAIL_CACHE_DIR')
+    THUMBNAIL_CACHE_MAX_BYTES = int(os.environ.get('THUMBNAIL_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+    THUMBNAIL_MAX_SOURCE_BYTES = 10 * 1024 * 1024 # larger source images are not thumbnailed
+    
+    # Change feed for delta sync (app/changes.py): /api/v1/changes page size, and
+    # history kept by `flask compact-changes` (older clients reload in full)
+    CHANGES_PAGE_SIZE = 500
+    CHANGE_LOG_RETENTION_DAYS = int(os.environ.get('CHANGE_LOG_RETENTION_DAYS', 30))
+    
+    # Add-box title suggestions (app/suggest.py), journal default <instance>/suggest_index.jsonl; '' keeps them in memory only
+    SUGGEST_INDEX_PATH = os.environ.get('SUGGEST_INDEX_PATH')
+    
+    # Metadata cache for fetch_meta_data: 'memory', 'sqlite', 'redis' or 'none'
+    # METADATA_CACHE_URL is the SQLite file path or the redis:// URL
+    METADATA_CACHE_BACKEND = os.environ.get('METADATA_CACHE_BACKEND', 'memory')
+    METADATA_CACHE_URL = os.environ.get('METADATA_CACHE_URL')
+    METADATA_CACHE_TTL = int(os.environ.get('METADATA_CACHE_TTL', 7 * 24 * 3600))
+    METADATA_CACHE_NEGATIVE_TTL = int(os.environ.get('METADATA_CACHE_NEGATIVE_TTL', 3600))
+    METADATA_CACHE_MAX_ENTRIES = int(os.environ.get('METADATA_CACHE_MAX_ENTRIES', 10000))
+    # Stale pages are kept this much longer and revalidated with conditional GETs
+    METADATA_CACHE_REVALIDATE_TTL = int(os.environ.get('METADATA_CACHE_REVALIDATE_TTL', 30 * 24 * 3600))
+    
+    # Outbound limits per metadata source (app/futurescope/limits.py):
+    # {name: (calls per second, burst)} for 'ddgs', 'google', 'wikipedia'
+    METADATA_SOURCE_RATE_LIMITS = {}
+    METADATA_SOURCE_FAILURE_THRESHOLD = 3 # consecutive failures that open the circuit
+    METADATA_SOURCE_COOLDOWN = int(os.environ.get('METADATA_SOURCE_COOLDOWN', 300)) # seconds
+    METADATA_SOURCE_MAX_WAIT = 1.0 # seconds to wait for a rate-limit token before skipping
+    
+    # Background enrichment of new items (app/enrichment.py); 0 workers disables the pool
+    ENRICHMENT_WORKERS = int(os.environ.get('ENRICHMENT_WORKERS', 2))
+    ENRICHMENT_BATCH_SIZE = 20 # jobs claimed per round; same titles in a batch share one lookup
+    ENRICHMENT_MAX_ATTEMPTS = 4
+    ENRICHMENT_BACKOFF = 30 # seconds; doubles on every retry
+    ENRICHMENT_POLL_INTERVAL = 5
+    ENRICHMENT_STALE_AFTER = 600 # requeue jobs stuck in 'running' this long (worker died)
+    
+    # Bulk import
+    IMPORT_MAX_ROWS = int(os.environ.get('IMPORT_MAX_ROWS', 10000))
+    IMPORT_BATCH_SIZE = 1000 # rows per INSERT executemany / transaction
     
     # OAuth
     GOOGLE_CLIENT_ID = os.environ.get('GOOGLE_CLIENT_ID')
@@ -16,3 +99,42 @@ class Config:
     # For HTTPS in production (OAuth requires HTTPS)
     # OAUTHLIB_INSECURE_TRANSPORT should be '1' only for local testing
     OAUTHLIB_INSECURE_TRANSPORT = os.environ.get('OAUTHLIB_INSECURE_TRANSPORT', '0')
+
+
+class DevelopmentConfig(Config):
+    DEBUG = True
+    AUTO_CREATE_SCHEMA = True
+
+
+class ProductionConfig(Config):
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+
+
+class TestingConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = os.environ.get('TEST_DATABASE_URI') or 'sqlite://'
+    ENRICHMENT_WORKERS = 0
+    AUTO_CREATE_SCHEMA = True
+    SUGGEST_INDEX_PATH = ''
+    # No durability needed for throwaway databases
+    SQLITE_PRAGMAS = dict(Config.SQLITE_PRAGMAS, synchronous='OFF')
+
+
+CONFIGS = {
+    'development': DevelopmentConfig,
+    'production': ProductionConfig,
+    'testing': TestingConfig,
+}
+
+
+def config_for(name=None):
+    """Config class for APP_ENV (or `name`): development, production or testing.
+    Unset means production, so a deploy that forgets APP_ENV never runs with
+    DEBUG or creates the schema on startup."""
+    name = name or os.environ.get('APP_ENV') or 'production'
+
+    try:
+        return CONFIGS[name]
+    except KeyError:
+        raise ValueError(f"Unknown APP_ENV {name!r}; expected one of {', '.join(CONFIGS)}")
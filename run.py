@@ -1,6 +1,10 @@
+import os
 from app import create_app
+from config import config_for
 
-app = create_app()
+# APP_ENV selects the profile: production (default), development or testing.
+# Running this file directly starts the local dev server, which defaults to development.
+app = create_app(config_for(os.environ.get('APP_ENV') or ('development' if __name__ == '__main__' else None)))
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    app.run()
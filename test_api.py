@@ -0,0 +1,178 @@
+from sqlalchemy import event
+from app import db
+from app.models import User, Category, Item, Work
+from test_routes import make_client
+
+
+def test_api_requires_login():
+    from app import create_app
+    from config import TestingConfig
+
+    client = create_app(TestingConfig).test_client()
+    response = client.get('/api/v1/lists')
+    assert response.status_code == 401
+    assert response.get_json() == {'error': 'Unauthorized'}
+
+
+def test_list_items_etag_304_and_field_selection():
+    app, client = make_client()
+    with app.app_context():
+        user = User.query.first()
+        films = Category(name='Films', type='watch', owner=user)
+        db.session.add_all([films, Item(name='Heat', status='Plan to Watch', year='1995', category=films)])
+        db.session.commit()
+        films_id = films.id
+
+    url = f'/api/v1/lists/{films_id}/items?fields=id,name'
+    first = client.get(url)
+    assert first.status_code == 200
+    assert [set(item) for item in first.get_json()['items']] == [{'id', 'name'}]
+    etag = first.headers['ETag']
+    assert not etag.startswith('W/')
+
+    cached = client.get(url, headers={'If-None-Match': etag})
+    assert cached.status_code == 304 and cached.data == b''
+    # A different representation gets a different tag
+    assert client.get(f'/api/v1/lists/{films_id}/items').headers['ETag'] != etag
+
+    created = client.post(f'/api/v1/lists/{films_id}/items', json={'name': 'Alien'})
+    assert created.status_code == 201
+    assert created.get_json()['status'] == 'Plan to Watch'
+    after_add = client.get(url, headers={'If-None-Match': etag})
+    assert after_add.status_code == 200
+    assert [item['name'] for item in after_add.get_json()['items']] == ['Heat', 'Alien']
+
+    etag = after_add.headers['ETag']
+    item_id = created.get_json()['id']
+    assert client.patch(f'/api/v1/items/{item_id}', json={'status': 'Nope'}).status_code == 400
+    patched = client.patch(f'/api/v1/items/{item_id}', json={'status': 'Completed'})
+    assert patched.get_json()['status'] == 'Completed'
+    assert client.get(url, headers={'If-None-Match': etag}).status_code == 200
+
+    item_url = f'/api/v1/items/{item_id}?fields=status'
+    item_etag = client.get(item_url).headers['ETag']
+    assert client.get(item_url, headers={'If-None-Match': item_etag}).status_code == 304
+    assert client.delete(f'/api/v1/items/{item_id}').status_code == 204
+    assert client.get(item_url, headers={'If-None-Match': item_etag}).status_code == 404
+
+    assert client.get(url + ',bogus').status_code == 400
+    assert client.get(f'/api/v1/lists/{films_id}/items?cursor=nope').status_code == 400
+
+
+def test_list_items_reads_works_without_a_query_per_row():
+    app, client = make_client()
+    with app.app_context():
+        user = User.query.first()
+        films = Category(name='Films', type='watch', owner=user)
+        works = [Work(url=f'https://en.wikipedia.org/wiki/Film_{i}', name=f'Film {i}', director='Michael Mann',
+                      year='1995', image_url=f'https://upload.wikimedia.org/{i}.jpg') for i in range(5)]
+        db.session.add_all([films, *works, *(Item(name=work.name, category=films, work=work) for work in works)])
+        db.session.commit()
+        films_id, engine = films.id, db.engine
+
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, 'before_cursor_execute', listener)
+    try:
+        for fields in ('id,name', 'id,director,year', 'image_url,link,info'):
+            statements.clear()
+            items = client.get(f'/api/v1/lists/{films_id}/items?fields={fields}').get_json()['items']
+            # user, category, one page of items with their works
+            assert len(statements) == 3, fields
+        assert items[0]['link'] == 'https://en.wikipedia.org/wiki/Film_0'
+        assert items[0]['image_url'] == 'https://upload.wikimedia.org/0.jpg'
+    finally:
+        event.remove(engine, 'before_cursor_execute', listener)
+
+
+def test_list_versions_track_changes_and_ownership():
+    app, client = make_client()
+    with app.app_context():
+        other = User(username='other', email='other@example.com')
+        theirs = Category(name='Private', type='watch', owner=other)
+        db.session.add_all([other, theirs, Item(name='Secret', category=theirs)])
+        db.session.commit()
+        theirs_id, secret_id = theirs.id, theirs.items[0].id
+
+    created = client.post('/api/v1/lists', json={'name': 'Books', 'type': 'read'})
+    assert created.status_code == 201
+    books_id = created.get_json()['id']
+    listing = client.get('/api/v1/lists')
+    assert [c['name'] for c in listing.get_json()['lists']] == ['Books']
+    etag = listing.headers['ETag']
+    assert client.get('/api/v1/lists', headers={'If-None-Match': etag}).status_code == 304
+
+    with app.app_context():
+        books = db.session.get(Category, books_id)
+        version = books.version
+        books.name = 'Novels'
+        db.session.commit()
+        assert books.version == version + 1
+        db.session.add(Item(name='Dune', category=books))
+        db.session.commit()
+        assert books.version == version + 2
+
+    assert client.get('/api/v1/lists', headers={'If-None-Match': etag}).status_code == 200
+    assert client.get(f'/api/v1/lists/{theirs_id}/items').status_code == 403
+    assert client.get(f'/api/v1/items/{secret_id}').status_code == 403
+    assert client.patch(f'/api/v1/items/{secret_id}', json={'status': 'Done'}).status_code == 403
+    assert client.delete(f'/api/v1/lists/{books_id}').status_code == 204
+    assert client.get('/api/v1/lists').get_json() == {'lists': []}
+
+
+def test_change_feed_deltas_and_compaction():
+    from datetime import datetime, timedelta
+    from app import changes
+    from app.models import ChangeLog
+
+    app, client = make_client()
+    with app.app_context():
+        other = User(username='other', email='other@example.com')
+        theirs = Category(name='Private', type='watch', owner=other)
+        db.session.add_all([other, theirs, Item(name='Secret', category=theirs)])
+        db.session.commit()
+
+    start = client.get('/api/v1/changes').get_json()
+    assert start['changes'] == [] and start['more'] is False
+    since = start['next']
+
+    films_id = client.post('/api/v1/lists', json={'name': 'Films', 'type': 'watch'}).get_json()['id']
+    heat_id = client.post(f'/api/v1/lists/{films_id}/items', json={'name': 'Heat', 'enrich': False}).get_json()['id']
+    alien_id = client.post(f'/api/v1/lists/{films_id}/items', json={'name': 'Alien', 'enrich': False}).get_json()['id']
+    client.patch(f'/api/v1/items/{heat_id}', json={'status': 'Watching'})
+    client.post('/item/bulk/delete', json={'ids': [alien_id]})
+
+    feed = client.get(f'/api/v1/changes?since={since}').get_json()
+    # Heat's create and update collapse into its newest entry; other users' changes are not in the feed
+    assert [(c['kind'], c['id'], c['op']) for c in feed['changes']] == [
+        ('category', films_id, 'created'), ('item', heat_id, 'updated'), ('item', alien_id, 'deleted')]
+    assert feed['changes'][1]['data']['status'] == 'Watching'
+    assert 'data' not in feed['changes'][2] and feed['more'] is False
+
+    page = client.get(f'/api/v1/changes?since={since}&limit=2').get_json()
+    assert page['more'] is True and len(page['changes']) == 2
+    assert client.get(f"/api/v1/changes?since={feed['next']}").get_json()['changes'] == []
+    assert client.get('/api/v1/changes?since=abc').status_code == 400
+
+    # A list delete is one entry, however many items went with it
+    client.delete(f'/api/v1/lists/{films_id}')
+    tail = client.get(f"/api/v1/changes?since={feed['next']}").get_json()['changes']
+    assert [(c['kind'], c['id'], c['op']) for c in tail] == [('category', films_id, 'deleted')]
+
+    with app.app_context():
+        total = ChangeLog.query.count()
+        # Superseded entries go; the rest stays until it ages past the retention period
+        removed = changes.compact(retention_days=30)
+        assert 0 < removed < total
+        # Heat's last entry remains, reported as deleted now that its list is gone
+        compacted = client.get(f'/api/v1/changes?since={since}').get_json()['changes']
+        assert [(c['kind'], c['id'], c['op']) for c in compacted] == [
+            ('item', heat_id, 'deleted'), ('item', alien_id, 'deleted'), ('category', films_id, 'deleted')]
+        ChangeLog.query.update({'created_at': datetime.utcnow() - timedelta(days=31)})
+        db.session.commit()
+        changes.compact(retention_days=30)
+        assert ChangeLog.query.count() == 0
+
+    gone = client.get(f'/api/v1/changes?since={since}')
+    assert gone.status_code == 410 and gone.get_json()['watermark'] > since
+    assert client.get(f"/api/v1/changes?since={gone.get_json()['watermark']}").get_json()['changes'] == []
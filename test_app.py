@@ -1,12 +1,13 @@
 from app import create_app, db
 from app.models import User, Category, Item
+from app.migrations import create_schema
 
 app = create_app()
 
 def test_app():
     with app.app_context():
         # Setup
-        db.create_all()
+        create_schema()
         
         # Test User Creation
         if not User.query.filter_by(email='test@example.com').first():
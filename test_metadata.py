@@ -0,0 +1,374 @@
+import time
+import pytest
+import requests
+
+from app.futurescope import cache as metadata_cache
+from app.futurescope import metadata
+from app.futurescope.cache import MemoryBackend, SQLiteBackend
+
+
+def test_memory_backend_lru_and_ttl():
+    backend = MemoryBackend(max_entries=2)
+    backend.set('a', {'v': 1}, ttl=60)
+    backend.set('b', {'v': 2}, ttl=60)
+    assert backend.get('a') == {'v': 1}  # 'a' is now most recently used
+    backend.set('c', {'v': 3}, ttl=60)
+    assert backend.get('b') is None
+    assert backend.get('a') and backend.get('c')
+
+    backend.set('old', {'v': 0}, ttl=-1)
+    assert backend.get('old') is None
+
+
+def test_sqlite_backend_persists_and_evicts(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    backend = SQLiteBackend(path, max_entries=2)
+    backend.set('a', {'v': 1}, ttl=60)
+    time.sleep(0.01)
+    backend.set('b', {'v': 2}, ttl=60)
+    time.sleep(0.01)
+    backend.get('a')
+    time.sleep(0.01)
+    backend.set('c', {'v': 3}, ttl=60)
+
+    reopened = SQLiteBackend(path, max_entries=2)
+    assert reopened.get('a') == {'v': 1}
+    assert reopened.get('b') is None
+    assert len(reopened) == 2
+
+
+def test_fetch_meta_data_uses_query_and_page_cache(monkeypatch):
+    metadata_cache.configure_cache('memory')
+    calls = {'resolve': 0, 'scrape': 0}
+
+    def fake_resolve(query, original_query):
+        calls['resolve'] += 1
+        return None if 'nothing' in query else 'https://en.wikipedia.org/wiki/Dune_(novel)'
+
+    def fake_scrape(url, category_type='general', original_query='', cached=None):
+        calls['scrape'] += 1
+        return {'name': 'Dune', 'info': 'A novel', 'link': url, 'image_url': None,
+                'director': 'Frank Herbert', 'year': '1965', 'sequel_prequel': None}, {}
+
+    monkeypatch.setattr(metadata, 'resolve_url', fake_resolve)
+    monkeypatch.setattr(metadata, 'scrape_page', fake_scrape)
+    try:
+        first = metadata.fetch_meta_data('Dune', 'read', 'Books')
+        second = metadata.fetch_meta_data('  dune ', 'read', 'My Books')
+        assert first == second
+        assert calls == {'resolve': 1, 'scrape': 1}
+
+        # Different context keywords resolve separately but share the page cache
+        metadata.fetch_meta_data('Dune', 'read', 'Manga')
+        assert calls == {'resolve': 2, 'scrape': 1}
+
+        # Misses are cached as well
+        assert metadata.fetch_meta_data('nothing at all', 'read')['link'] == ''
+        metadata.fetch_meta_data('Nothing at all', 'read')
+        assert calls['resolve'] == 3
+    finally:
+        metadata_cache.configure_cache('memory')
+
+
+def test_resolve_url_races_sources_by_priority(monkeypatch):
+    from app.futurescope import limits
+
+    def slow(result, delay):
+        def source(arg, cancelled):
+            cancelled.wait(delay)
+            return result
+        return source
+
+    # More lookups than the default search bursts allow
+    limits.configure(rate_limits={name: (1000.0, 1000) for name in limits.DEFAULT_RATE_LIMITS})
+    try:
+        # DDGS answers Wikipedia quickly: no need to wait for the slow sources
+        monkeypatch.setattr(metadata, 'search_ddgs', slow('https://en.wikipedia.org/wiki/Heat_(1995_film)', 0))
+        monkeypatch.setattr(metadata, 'search_google', slow('https://www.imdb.com/title/tt0113277/', 5))
+        monkeypatch.setattr(metadata, 'guess_wikipedia', slow('https://en.wikipedia.org/wiki/Heat', 5))
+        start = time.monotonic()
+        assert metadata.resolve_url('Heat film movie', 'Heat') == 'https://en.wikipedia.org/wiki/Heat_(1995_film)'
+        assert time.monotonic() - start < 1
+
+        # Any search hit beats the blind guess (the physics article), and is
+        # returned without waiting for it
+        monkeypatch.setattr(metadata, 'search_ddgs', slow('https://www.imdb.com/title/tt0113277/', 0))
+        monkeypatch.setattr(metadata, 'search_google', slow(None, 0))
+        monkeypatch.setattr(metadata, 'guess_wikipedia', slow('https://en.wikipedia.org/wiki/Heat', 5))
+        start = time.monotonic()
+        assert metadata.resolve_url('Heat film movie', 'Heat') == 'https://www.imdb.com/title/tt0113277/'
+        assert time.monotonic() - start < 1
+        monkeypatch.setattr(metadata, 'guess_wikipedia', slow('https://en.wikipedia.org/wiki/Heat', 0))
+        assert metadata.resolve_url('Heat film movie', 'Heat') == 'https://www.imdb.com/title/tt0113277/'
+
+        # The guess is used when the searches find nothing
+        monkeypatch.setattr(metadata, 'search_ddgs', slow(None, 0))
+        assert metadata.resolve_url('Heat film movie', 'Heat') == 'https://en.wikipedia.org/wiki/Heat'
+
+        # The deadline caps the wait and the best answer so far wins
+        monkeypatch.setattr(metadata, 'search_ddgs', slow('https://www.imdb.com/title/tt0113277/', 0))
+        monkeypatch.setattr(metadata, 'search_google', slow('https://en.wikipedia.org/wiki/Heat_(1995_film)', 5))
+        start = time.monotonic()
+        assert metadata.resolve_url('Heat film movie', 'Heat', deadline=0.3) == 'https://www.imdb.com/title/tt0113277/'
+        assert time.monotonic() - start < 1
+    finally:
+        limits.configure(rate_limits=limits.DEFAULT_RATE_LIMITS)
+
+
+def serve(pages):
+    """Serves {path: (body, etag)} on localhost, 404 for other paths; returns
+    (base_url, request log, server)."""
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    log = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            log.append((self.path, self.headers.get('If-None-Match')))
+            if self.path not in pages:
+                self.send_response(404)
+                self.send_header('Content-Length', '9')
+                self.end_headers()
+                self.wfile.write(b'Not found')
+                return
+            body, etag = pages[self.path]
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            try:
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}', log, server
+
+
+WIKI_PAGE = (
+    b'<html><head><title>Heat (1995 film) - Wikipedia</title>'
+    b'<meta property="og:image" content="https://upload.wikimedia.org/heat.jpg"></head><body>'
+    b'<table class="infobox vevent"><tr><th>Directed by</th><td>Michael Mann</td></tr>'
+    b'<tr><th>Starring</th><td><table><tr><td>Al Pacino</td></tr></table></td></tr>'
+    b'<tr><th>Release date</th><td>December 15, 1995</td></tr></table>'
+    b'<h2>Plot</h2>' + b'<p>' + b'x' * 500000 + b'</p></body></html>'
+)
+
+
+def test_fetch_page_stops_after_infobox_and_revalidates():
+    from app.futurescope import http
+
+    base, log, server = serve({'/wiki/Heat': (WIKI_PAGE, '"v1"')})
+    try:
+        page = http.fetch_page(base + '/wiki/Heat', want_infobox=True)
+        assert not page.truncated and len(page.body) < 100000
+        assert b'December 15, 1995' in page.body
+        assert page.etag == '"v1"'
+
+        again = http.fetch_page(base + '/wiki/Heat', etag=page.etag)
+        assert again.not_modified and again.body == b''
+        assert log[-1] == ('/wiki/Heat', '"v1"')
+
+        capped = http.fetch_page(base + '/wiki/Heat', max_bytes=1000)
+        assert capped.truncated and len(capped.body) == 1000
+
+        # Error pages are not parsed (or cached) as content
+        with pytest.raises(requests.HTTPError):
+            http.fetch_page(base + '/wiki/Missing')
+    finally:
+        server.shutdown()
+
+
+def test_head_scanner_stops_at_the_same_place_whatever_the_chunking():
+    from app.futurescope.http import HeadScanner
+
+    infobox_end = WIKI_PAGE.index(b'</table><h2>') + len(b'</table>')
+    no_infobox = WIKI_PAGE.replace(b'class="infobox vevent"', b'class="wikitable"')
+    for size in (1, 3, 7, 64, len(WIKI_PAGE)):
+        for page, want_infobox, expected in ((WIKI_PAGE, True, infobox_end),
+                                             (no_infobox, True, no_infobox.index(b'<h2') + 3),
+                                             (WIKI_PAGE, False, WIKI_PAGE.index(b'</head>') + 7)):
+            scanner, lower = HeadScanner(want_infobox), bytearray()
+            for offset in range(0, len(page), size):
+                lower += page[offset:offset + size].lower()
+                if scanner.complete(lower):
+                    break
+            assert len(lower) >= expected and len(lower) - size < expected, (size, want_infobox)
+
+
+def test_stale_page_entry_is_revalidated_with_conditional_get():
+    base, log, server = serve({'/wiki/Heat': (WIKI_PAGE, '"v1"')})
+    url = base + '/wiki/Heat'
+    cache = metadata_cache.configure_cache('memory', ttl=60)
+    try:
+        cache.set_query('Heat', 'watch', ' film movie', url)
+        first = metadata.fetch_meta_data('Heat', 'watch', 'Films')
+        assert log == [('/wiki/Heat', None)]
+        # Age the page entry past its TTL; the next lookup revalidates it
+        cache.get_page(url, 'watch')['fetched_at'] -= 3600
+        second = metadata.fetch_meta_data('Heat', 'watch', 'Films')
+        assert log[-1] == ('/wiki/Heat', '"v1"')
+        assert first == second
+        assert first['image_url'] == 'https://upload.wikimedia.org/heat.jpg'
+    finally:
+        server.shutdown()
+        metadata_cache.configure_cache('memory')
+
+
+def test_lxml_extraction_matches_soup_path(monkeypatch):
+    from app.futurescope import extract
+
+    url = 'https://en.wikipedia.org/wiki/Heat_(1995_film)'
+    fast = extract.extract_with_lxml(WIKI_PAGE, url, 'watch', 'Heat')
+    assert fast == extract.extract_with_soup(WIKI_PAGE, url, 'watch', 'Heat')
+    assert (fast['name'], fast['director'], fast['year']) == ('Heat (1995 film)', 'Michael Mann', '1995')
+
+    # Infobox not first in the class list: found by the whole-document fallback
+    odd = WIKI_PAGE.replace(b'class="infobox vevent"', b'class="vevent infobox"')
+    assert extract.extract_with_lxml(odd, url, 'watch')['director'] == 'Michael Mann'
+
+    # Inline TemplateStyles and scripts are not cell text on either path
+    styled = WIKI_PAGE.replace(
+        b'<td>Michael Mann</td>',
+        b'<td><style>.mw-parser-output .plainlist ol{margin:0}</style>Michael Mann<script>x=1</script></td>')
+    assert extract.extract_with_lxml(styled, url, 'watch', 'Heat') == extract.extract_with_soup(styled, url, 'watch', 'Heat') == fast
+
+    # Without lxml the BeautifulSoup path is used
+    monkeypatch.setattr(extract, 'lxml_html', None)
+    assert extract.extract_page(WIKI_PAGE, url, 'watch', 'Heat') == fast
+
+
+def test_token_bucket_and_circuit_breaker():
+    from app.futurescope.limits import CircuitBreaker, TokenBucket
+
+    bucket = TokenBucket(rate=20, capacity=2)
+    assert bucket.acquire() and bucket.acquire()
+    assert not bucket.acquire()  # burst used up, no waiting allowed
+    start = time.monotonic()
+    assert bucket.acquire(max_wait=0.5)  # next token after ~50 ms
+    assert time.monotonic() - start < 0.3
+
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=0.1)
+    breaker.record_failure()
+    assert breaker.allow()
+    assert breaker.record_failure()  # threshold reached: opens
+    assert breaker.state == 'open' and not breaker.allow()
+    time.sleep(0.12)
+    assert breaker.allow()  # one half-open trial...
+    assert not breaker.allow()  # ...at a time
+    assert breaker.record_failure() and breaker.state == 'open'  # failed trial reopens
+    time.sleep(0.12)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == 'closed' and breaker.allow()
+
+
+def test_resolve_url_skips_open_circuits_and_does_not_cache_the_miss(monkeypatch):
+    from app.futurescope import limits
+
+    limits.configure(failure_threshold=2, cooldown=60)
+    metadata_cache.configure_cache('memory')
+    calls = {'google': 0}
+
+    def blocked_google(query, cancelled):
+        calls['google'] += 1
+        raise RuntimeError('429 Too Many Requests')
+
+    monkeypatch.setattr(metadata, 'search_ddgs', lambda query, cancelled: None)
+    monkeypatch.setattr(metadata, 'search_google', blocked_google)
+    monkeypatch.setattr(metadata, 'guess_wikipedia', lambda query, cancelled: None)
+    try:
+        for _ in range(3):
+            start = time.monotonic()
+            try:
+                metadata.resolve_url('Heat film movie', 'Heat')
+            except metadata.SourcesUnavailable:
+                pass
+            else:
+                raise AssertionError('a failed source must make the miss inconclusive')
+            assert time.monotonic() - start < 0.5
+        # Third call never reached Google: its circuit opened after two failures
+        assert calls['google'] == 2
+        google = limits.stats()['google']
+        assert google['state'] == 'open' and google['short_circuited'] == 1 and google['failures'] == 2
+        assert limits.stats()['ddgs']['state'] == 'closed'
+
+        # Inconclusive lookups return the bare title, raise when strict, and are not cached
+        assert metadata.fetch_meta_data('Heat', 'watch')['link'] == ''
+        try:
+            metadata.fetch_meta_data('Heat', 'watch', strict=True)
+        except metadata.MetadataFetchError:
+            pass
+        else:
+            raise AssertionError('strict lookups must raise so the job is retried')
+        assert metadata_cache.get_cache().get_query('Heat', 'watch', ' film movie') is None
+
+        # With every source healthy, a real miss is still a plain None
+        limits.configure()
+        monkeypatch.setattr(metadata, 'search_google', lambda query, cancelled: None)
+        assert metadata.resolve_url('Heat film movie', 'Heat') is None
+    finally:
+        limits.configure(failure_threshold=limits.DEFAULT_FAILURE_THRESHOLD, cooldown=limits.DEFAULT_COOLDOWN)
+        metadata_cache.configure_cache('memory')
+
+
+def test_source_status_endpoint():
+    from app.futurescope import limits
+    from test_routes import make_client
+
+    app, client = make_client()
+    limits.get_provider('ddgs').call(lambda: 'ok')
+    body = client.get('/api/v1/sources').get_json()
+    assert body['sources']['ddgs']['state'] == 'closed'
+    assert body['sources']['ddgs']['successes'] == 1
+
+
+def test_scraper_stage_timings_and_structured_logs(monkeypatch):
+    import json
+    import logging
+    from types import SimpleNamespace
+    from app import logs, metrics
+    from app.futurescope import limits
+    from test_routes import make_client
+
+    app, client = make_client()
+    scraper_log = logging.getLogger('app.futurescope.metadata')
+    assert not scraper_log.isEnabledFor(logging.DEBUG)  # off by default
+
+    metrics.reset()
+    limits.configure()
+    page = SimpleNamespace(body=WIKI_PAGE, etag=None, last_modified=None, not_modified=False)
+    monkeypatch.setattr(metadata, 'fetch_page', lambda url, **kwargs: page)
+    monkeypatch.setattr(metadata, 'search_ddgs', lambda query, cancelled: 'https://en.wikipedia.org/wiki/Heat')
+    monkeypatch.setattr(metadata, 'search_google', lambda query, cancelled: None)
+    monkeypatch.setattr(metadata, 'guess_wikipedia', lambda query, cancelled: None)
+    metadata_cache.configure_cache('none')
+    try:
+        assert metadata.fetch_meta_data('Heat', 'watch', 'Films')['director'] == 'Michael Mann'
+    finally:
+        metadata_cache.configure_cache('memory')
+    stages = {labels for labels in metrics.SCRAPER_STAGE.snapshot()}
+    assert {('search', 'ddgs'), ('fetch', ''), ('parse', ''), ('infobox', '')} <= stages
+
+    text = client.get('/metrics').get_data(as_text=True)
+    assert 'wishlist_scraper_stage_duration_seconds_count{stage="infobox",source=""} 1' in text
+    assert 'wishlist_metadata_source_state{source="ddgs"} 0' in text
+
+    record = scraper_log.makeRecord(scraper_log.name, logging.DEBUG, __file__, 0, 'source found', (), None,
+                                    extra={'source': 'ddgs', 'url': 'https://x'})
+    entry = json.loads(logs.StructuredFormatter(as_json=True).format(record))
+    assert (entry['event'], entry['source'], entry['level']) == ('source found', 'ddgs', 'DEBUG')
+    assert logs.StructuredFormatter().format(record).endswith("source found source='ddgs' url='https://x'")
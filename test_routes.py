@@ -0,0 +1,766 @@
+import base64
+import json
+import re
+import time
+from datetime import datetime, timedelta
+
+from werkzeug.security import generate_password_hash
+
+from app import create_app, db
+from app.models import User, Category, Item
+from app.pagination import keyset_page, InvalidCursor
+from config import TestingConfig
+
+
+def make_client(config_class=TestingConfig):
+    app = create_app(config_class)
+    with app.app_context():
+        user = User(username='tester', email='tester@example.com', password_hash=generate_password_hash('pw'))
+        db.session.add(user)
+        db.session.commit()
+    client = app.test_client()
+    client.post('/login', data={'email': 'tester@example.com', 'password': 'pw'})
+    return app, client
+
+
+def test_dashboard_item_counts():
+    app, client = make_client()
+    with app.app_context():
+        user = User.query.first()
+        books = Category(name='Books', type='read', owner=user)
+        films = Category(name='Films', type='watch', owner=user)
+        db.session.add_all([books, films])
+        db.session.add_all([Item(name=f'Book {n}', category=books) for n in range(3)])
+        db.session.add(Item(name='Dune', category=films))
+        db.session.commit()
+
+    html = client.get('/').get_data(as_text=True)
+    assert '3 Items' in html
+    assert '1 Item' in html
+
+
+def seed_films(app):
+    names = [('Dune', '2021'), ('Alien', '1979'), ('Heat', None), ('Brazil', '1985'), ('Clue', None)]
+    start = datetime(2024, 1, 1)
+    with app.app_context():
+        user = User.query.first()
+        films = Category(name='Films', type='watch', owner=user)
+        db.session.add(films)
+        db.session.add_all([
+            Item(name=name, year=year, category=films, date_added=start + timedelta(days=n),
+                 status='Completed' if name == 'Alien' else 'Plan to Watch')
+            for n, (name, year) in enumerate(names)
+        ])
+        db.session.commit()
+        return films.id
+
+
+def walk_pages(category_id, sort, order):
+    """Pages forward to the end, then back to the start, returning both name sequences."""
+    query = Item.query.filter_by(category_id=category_id)
+    forward, backward = [], []
+    items, next_cursor, prev_cursor, position = keyset_page(query, sort=sort, order=order, per_page=2)
+    forward.append([i.name for i in items])
+    while next_cursor:
+        items, next_cursor, prev_cursor, position = keyset_page(query, sort=sort, order=order, cursor=next_cursor, per_page=2)
+        forward.append([i.name for i in items])
+    backward.append([i.name for i in items])
+    while prev_cursor:
+        items, next_cursor, prev_cursor, position = keyset_page(query, sort=sort, order=order, cursor=prev_cursor, per_page=2)
+        backward.append([i.name for i in items])
+    assert position == 0
+    return forward, backward[::-1]
+
+
+def test_keyset_page_sorts_and_directions():
+    app, client = make_client()
+    category_id = seed_films(app)
+    expected = {
+        ('name', 'asc'): ['Alien', 'Brazil', 'Clue', 'Dune', 'Heat'],
+        ('name', 'desc'): ['Heat', 'Dune', 'Clue', 'Brazil', 'Alien'],
+        ('date_added', 'asc'): ['Dune', 'Alien', 'Heat', 'Brazil', 'Clue'],
+        ('date_added', 'desc'): ['Clue', 'Brazil', 'Heat', 'Alien', 'Dune'],
+        # NULL years sort as '' and fall back to id order among themselves
+        ('year', 'asc'): ['Heat', 'Clue', 'Alien', 'Brazil', 'Dune'],
+        ('year', 'desc'): ['Dune', 'Brazil', 'Alien', 'Clue', 'Heat'],
+    }
+    with app.app_context():
+        for (sort, order), names in expected.items():
+            forward, backward = walk_pages(category_id, sort, order)
+            assert sum(forward, []) == names, (sort, order)
+            assert backward == forward, (sort, order)
+
+
+def encode_raw(payload):
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+
+def test_keyset_page_rejects_bad_cursors():
+    app, client = make_client()
+    category_id = seed_films(app)
+    with app.app_context():
+        query = Item.query.filter_by(category_id=category_id)
+        _, date_cursor, _, _ = keyset_page(query, sort='date_added', per_page=2)
+        bad = ['garbage', date_cursor, encode_raw(['name', 'next', [1], 1, 0]),
+               encode_raw(['name', 'next', 'Dune', '1', 0]), encode_raw(['name', 'sideways', 'Dune', 1, 0])]
+        for cursor in bad:
+            try:
+                keyset_page(query, sort='name', cursor=cursor, per_page=2)
+            except InvalidCursor:
+                continue
+            raise AssertionError(f'accepted {cursor}')
+
+    assert client.get(f'/list/{category_id}?sort=name&cursor={date_cursor}').status_code == 400
+    assert client.get(f'/list/{category_id}?sort=name&cursor=' + encode_raw(['name', 'next', [1], 1, 0])).status_code == 400
+
+
+def test_list_view_filters_by_status():
+    app, client = make_client()
+    category_id = seed_films(app)
+    with app.app_context():
+        alien = Item.query.filter_by(name='Alien').one().id
+        dune = Item.query.filter_by(name='Dune').one().id
+    html = client.get(f'/list/{category_id}?status=Completed').get_data(as_text=True)
+    assert f'href="/item/{alien}"' in html
+    assert f'href="/item/{dune}"' not in html
+
+
+def test_upgrade_adds_indexes_to_existing_database(tmp_path):
+    import sqlite3
+    from sqlalchemy import inspect
+
+    # A database created before the indexes existed
+    path = tmp_path / 'old.db'
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        CREATE TABLE user (id INTEGER PRIMARY KEY, username VARCHAR(20) NOT NULL, email VARCHAR(120) NOT NULL UNIQUE,
+            password_hash VARCHAR(128), oauth_provider VARCHAR(20), oauth_id VARCHAR(100),
+            reset_token VARCHAR(100) UNIQUE, reset_token_expiry DATETIME);
+        CREATE TABLE category (id INTEGER PRIMARY KEY, name VARCHAR(100) NOT NULL, type VARCHAR(20),
+            user_id INTEGER NOT NULL REFERENCES user(id));
+        CREATE TABLE item (id INTEGER PRIMARY KEY, name VARCHAR(100) NOT NULL, status VARCHAR(50),
+            date_added DATETIME NOT NULL, info TEXT, link VARCHAR(500), image_url VARCHAR(500),
+            director VARCHAR(100), year VARCHAR(20), sequel_prequel VARCHAR(200), type VARCHAR(50),
+            category_id INTEGER NOT NULL REFERENCES category(id));
+    ''')
+    conn.close()
+
+    class OldDbConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+
+    app = create_app(OldDbConfig)
+    with app.app_context():
+        indexes = {ix['name'] for ix in inspect(db.engine).get_indexes('item')}
+        assert {'ix_item_category_status_date', 'ix_item_category_date', 'ix_item_category_name'} <= indexes
+        assert 'ix_category_user_type' in {ix['name'] for ix in inspect(db.engine).get_indexes('category')}
+
+
+def test_upgrade_folds_duplicate_items_into_shared_works(tmp_path):
+    import sqlite3
+    from app import works
+    from app.models import Work
+    from app.search import search_items
+
+    path = tmp_path / 'old.db'
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        CREATE TABLE user (id INTEGER PRIMARY KEY, username VARCHAR(20) NOT NULL, email VARCHAR(120) NOT NULL UNIQUE,
+            password_hash VARCHAR(128), oauth_provider VARCHAR(20), oauth_id VARCHAR(100),
+            reset_token VARCHAR(100) UNIQUE, reset_token_expiry DATETIME);
+        CREATE TABLE category (id INTEGER PRIMARY KEY, name VARCHAR(100) NOT NULL, type VARCHAR(20),
+            user_id INTEGER NOT NULL REFERENCES user(id));
+        CREATE TABLE item (id INTEGER PRIMARY KEY, name VARCHAR(100) NOT NULL, status VARCHAR(50),
+            date_added DATETIME NOT NULL, info TEXT, link VARCHAR(500), image_url VARCHAR(500),
+            director VARCHAR(100), year VARCHAR(20), sequel_prequel VARCHAR(200), type VARCHAR(50),
+            category_id INTEGER NOT NULL REFERENCES category(id));
+        INSERT INTO user VALUES (1, 'a', 'a@example.com', NULL, NULL, NULL, NULL, NULL),
+                                (2, 'b', 'b@example.com', NULL, NULL, NULL, NULL, NULL);
+        INSERT INTO category VALUES (1, 'Films', 'watch', 1), (2, 'Movies', 'watch', 2);
+        INSERT INTO item VALUES
+            (1, 'Heat', 'Plan to Watch', '2024-01-01', 'Crime film', 'https://en.wikipedia.org/wiki/Heat_(1995_film)',
+             'https://img/heat.jpg', 'Michael Mann', '1995', NULL, NULL, 1),
+            (2, 'Heat 1995', 'Completed', '2024-01-02', 'Watched twice!', 'http://en.m.wikipedia.org/wiki/Heat_(1995_film)#Plot',
+             'https://img/heat.jpg', 'Michael Mann', '1995', NULL, NULL, 2),
+            (3, 'Alien', 'Plan to Watch', '2024-01-03', NULL, 'https://en.wikipedia.org/wiki/Alien_(film)',
+             NULL, 'Ridley Scott', '1979', NULL, NULL, 1),
+            (4, 'Notes', 'Plan to Watch', '2024-01-04', 'no link', NULL, NULL, NULL, NULL, NULL, NULL, 1);
+    ''')
+    conn.close()
+
+    class OldDbConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+
+    app = create_app(OldDbConfig)
+    with app.app_context():
+        assert Work.query.count() == 2
+        first, second = db.session.get(Item, 1), db.session.get(Item, 2)
+        assert first.work is second.work and first.work.url == 'https://en.wikipedia.org/wiki/Heat_(1995_film)'
+        # Item columns may hold private notes: nothing is copied to the shared row or cleared from the items
+        assert (first.work.name, first.work.info, first.work.director, first.work.image_url) == (None,) * 4
+        assert (first.director, first.info, first.image_url, second.info) == (
+            'Michael Mann', 'Crime film', 'https://img/heat.jpg', 'Watched twice!')
+        assert second.display_info == 'Watched twice!'
+        assert db.session.get(Item, 4).work is None
+        assert [item.id for item in search_items(2, 'mann')] == [2]
+        assert search_items(2, 'crime') == []
+
+        # The next lookup fills the shared row from the scraped page (and re-indexes both users' items)
+        versions = [db.session.get(Category, 1).version, db.session.get(Category, 2).version]
+        work = works.upsert_work({'link': 'https://en.wikipedia.org/wiki/Heat_(1995_film)/', 'name': 'Heat',
+                                  'director': 'M. Mann', 'year': '1995', 'sequel_prequel': 'Heat 2'})
+        db.session.commit()
+        assert work is first.work and Work.query.count() == 2
+        assert (first.display_director, second.display_director) == ('Michael Mann', 'Michael Mann')
+        assert (first.display_sequel_prequel, second.display_sequel_prequel) == ('Heat 2', 'Heat 2')
+        assert [item.id for item in search_items(1, 'm mann')] == [1]
+        db.session.expire_all()
+        assert [db.session.get(Category, 1).version, db.session.get(Category, 2).version] == [v + 1 for v in versions]
+
+    client = app.test_client()
+    with app.app_context():
+        user = db.session.get(User, 1)
+        user.password_hash = generate_password_hash('pw')
+        db.session.commit()
+    client.post('/login', data={'email': 'a@example.com', 'password': 'pw'})
+    rows = client.get('/export.json').get_json()
+    assert [(row['name'], row['sequel_prequel'], row['link']) for row in rows][:1] == [
+        ('Heat', 'Heat 2', 'https://en.wikipedia.org/wiki/Heat_(1995_film)')]
+    assert client.get('/api/v1/items/1?fields=director,info').get_json() == {'director': 'Michael Mann', 'info': 'Crime film'}
+    html = client.get('/list/1?sort=year').get_data(as_text=True)
+    assert html.index('1979') < html.index('1995')
+
+
+def test_add_item_queues_enrichment_and_worker_fills_fields(monkeypatch):
+    from app import enrichment
+    from app.futurescope import metadata
+    from app.models import EnrichmentJob
+
+    app, client = make_client()
+    with app.app_context():
+        user = User.query.first()
+        films = Category(name='Films', type='watch', owner=user)
+        todo = Category(name='Chores', type='todo', owner=user)
+        db.session.add_all([films, todo])
+        db.session.commit()
+        films_id, todo_id = films.id, todo.id
+
+    client.post(f'/item/add/{films_id}', data={'name': 'Heat'})
+    client.post(f'/item/add/{todo_id}', data={'name': 'Laundry'})
+
+    attempts = []
+
+    def flaky_fetch(query, category_type='general', category_name='', strict=False):
+        attempts.append(query)
+        if len(attempts) == 1:
+            raise metadata.MetadataFetchError('timeout')
+        return {'name': 'Heat (1995 film)', 'info': 'Crime film', 'link': 'https://en.wikipedia.org/wiki/Heat_(1995_film)',
+                'image_url': None, 'director': 'Michael Mann', 'year': '1995', 'sequel_prequel': None}
+
+    monkeypatch.setattr(metadata, 'fetch_meta_data', flaky_fetch)
+    with app.app_context():
+        jobs = EnrichmentJob.query.all()
+        assert len(jobs) == 1  # nothing to look up for to-do items
+
+        job_ids = enrichment.claim_jobs(5)
+        assert enrichment.run_jobs(job_ids, backoff=0) == {job_ids[0]: 'queued'}
+        assert db.session.get(EnrichmentJob, job_ids[0]).attempts == 1
+
+        job_ids = enrichment.claim_jobs(5)
+        assert enrichment.run_jobs(job_ids) == {job_ids[0]: 'done'}
+        item = Item.query.filter_by(name='Heat').one()
+        assert (item.display_director, item.display_year, item.enrichment_status) == ('Michael Mann', '1995', 'done')
+        assert item.director is None and item.work.url == 'https://en.wikipedia.org/wiki/Heat_(1995_film)'
+
+        # Re-running is idempotent and never overwrites manual edits
+        item.info = 'My notes'
+        db.session.commit()
+        db.session.get(EnrichmentJob, job_ids[0]).status = 'queued'
+        db.session.commit()
+        enrichment.run_jobs(enrichment.claim_jobs(5))
+        assert Item.query.filter_by(name='Heat').one().display_info == 'My notes'
+        assert enrichment.claim_jobs(5) == []
+
+
+def test_bulk_import_batches_rows_and_dedupes_lookups(monkeypatch):
+    import io
+    from app import enrichment
+    from app.futurescope import metadata
+    from app.models import EnrichmentJob
+
+    app, client = make_client()
+    app.config['IMPORT_BATCH_SIZE'] = 2
+    with app.app_context():
+        user = User.query.first()
+        books = Category(name='Books', type='read', owner=user)
+        db.session.add(books)
+        db.session.commit()
+        books_id = books.id
+
+    csv_data = 'Title,Author,Status\nDune,Frank Herbert,Reading\ndune,,Bogus\n,No name,\nEmma,Jane Austen,\n'
+    resp = client.post(f'/item/import/{books_id}', data={
+        'file': (io.BytesIO(csv_data.encode()), 'goodreads.csv'), 'enrich': '1',
+    }, content_type='multipart/form-data', follow_redirects=True)
+    assert 'Imported 3 items. Skipped 1 row without a name.' in resp.get_data(as_text=True)
+
+    client.post(f'/item/import/{books_id}', data={'names': 'Heat\n\n  Brazil  \n'})
+
+    lookups = []
+
+    def fake_fetch(query, category_type='general', category_name='', strict=False):
+        lookups.append(query)
+        return {'info': f'About {query}', 'link': '', 'image_url': None, 'director': None, 'year': None, 'sequel_prequel': None}
+
+    monkeypatch.setattr(metadata, 'fetch_meta_data', fake_fetch)
+    with app.app_context():
+        items = {i.name: i for i in Item.query.filter_by(category_id=books_id)}
+        assert set(items) == {'Dune', 'dune', 'Emma', 'Heat', 'Brazil'}
+        assert items['Dune'].status == 'Reading' and items['dune'].status == 'Plan to Read'
+        assert items['Dune'].director == 'Frank Herbert'
+        assert EnrichmentJob.query.count() == 3  # the pasted lines were not enriched
+
+        enrichment.run_jobs(enrichment.claim_jobs(10))
+        assert sorted(lookups) == ['Dune', 'Emma']  # "Dune" and "dune" share one lookup
+        assert Item.query.filter_by(name='dune').one().info == 'About Dune'
+
+
+def test_streaming_export_formats():
+    import csv
+    import io
+
+    app, client = make_client()
+    category_id = seed_films(app)
+    with app.app_context():
+        user = User.query.first()
+        other = Category(name='Books', type='read', owner=user)
+        stranger = User(username='stranger', email='stranger@example.com')
+        theirs = Category(name='Secret', type='watch', owner=stranger)
+        db.session.add_all([other, stranger, theirs])
+        db.session.add(Item(name='Emma', category=other))
+        db.session.commit()
+        theirs_id = theirs.id
+
+    assert client.get(f'/list/{theirs_id}/export.csv').status_code == 403
+    assert client.get('/list/999/export.csv').status_code == 404
+    resp = client.get(f'/list/{category_id}/export.csv')
+    assert resp.is_streamed
+    assert resp.headers['Content-Disposition'] == 'attachment; filename="Films.csv"'
+    rows = list(csv.DictReader(io.StringIO(resp.get_data(as_text=True))))
+    assert [r['name'] for r in rows] == ['Dune', 'Alien', 'Heat', 'Brazil', 'Clue']
+    assert rows[0]['year'] == '2021' and rows[0]['list'] == 'Films'
+
+    everything = json.loads(client.get('/export.json').get_data(as_text=True))
+    assert len(everything) == 6 and everything[-1]['name'] == 'Emma'
+    lines = client.get('/export.ndjson').get_data(as_text=True).splitlines()
+    assert [json.loads(line)['name'] for line in lines] == [r['name'] for r in everything]
+    assert client.get('/export.xml').status_code == 404
+
+
+def test_full_text_search_prefix_ranking_and_scoping():
+    from app.search import search_items
+
+    app, client = make_client()
+    with app.app_context():
+        user = User.query.first()
+        other = User(username='other', email='other@example.com')
+        films = Category(name='Films', type='watch', owner=user)
+        theirs = Category(name='Films', type='watch', owner=other)
+        db.session.add_all([other, films, theirs])
+        db.session.add_all([
+            Item(name='Dune', director='Denis Villeneuve', info='Arrakis', category=films),
+            Item(name='Arrival', director='Denis Villeneuve', info='Linguist meets dune-like aliens', category=films),
+            Item(name='Heat', director='Michael Mann', category=films),
+            Item(name='Dune', director='David Lynch', category=theirs),
+        ])
+        db.session.commit()
+        user_id = user.id
+
+        assert [i.name for i in search_items(user_id, 'dun')] == ['Dune', 'Arrival']  # title hit ranks first
+        # A rank cap scores only the newest matches and can miss older title hits
+        app.config['SEARCH_RANK_CANDIDATES'] = 1
+        assert [i.name for i in search_items(user_id, 'dun')] == ['Arrival']
+        app.config['SEARCH_RANK_CANDIDATES'] = 0
+        assert [i.name for i in search_items(user_id, 'villen arr')] == ['Arrival', 'Dune']
+        assert search_items(user_id, 'lynch') == []  # another user's item
+
+        # Updates and deletes are picked up by the triggers
+        heat = Item.query.filter_by(name='Heat').one()
+        heat.info = 'Los Angeles heist'
+        db.session.commit()
+        assert [i.name for i in search_items(user_id, 'heist')] == ['Heat']
+        db.session.delete(heat)
+        db.session.commit()
+        assert search_items(user_id, 'heist') == []
+
+    html = client.get('/search?q=villeneuve').get_data(as_text=True)
+    assert 'Arrival' in html and 'Heat' not in html
+
+
+def test_status_updates_answer_xhr_with_json_and_batch():
+    app, client = make_client()
+    with app.app_context():
+        user = User.query.first()
+        other = User(username='other', email='other@example.com')
+        films = Category(name='Films', type='watch', owner=user)
+        theirs = Category(name='Films', type='watch', owner=other)
+        heat = Item(name='Heat', status='Plan to Watch', category=films)
+        alien = Item(name='Alien', status='Plan to Watch', category=films)
+        secret = Item(name='Secret', status='Plan to Watch', category=theirs)
+        db.session.add_all([other, films, theirs, heat, alien, secret])
+        db.session.commit()
+        heat_id, alien_id, secret_id = heat.id, alien.id, secret.id
+
+    xhr = {'X-Requested-With': 'XMLHttpRequest'}
+    response = client.post(f'/item/update_status/{heat_id}', data={'status': 'Watching'}, headers=xhr)
+    assert response.get_json() == {'id': heat_id, 'status': 'Watching'}
+    # Plain form posts keep the redirect
+    assert client.post(f'/item/update_status/{heat_id}', data={'status': 'Watching'}).status_code == 302
+    assert client.post(f'/item/toggle/{alien_id}', headers=xhr).get_json() == {'id': alien_id, 'status': 'Completed'}
+
+    response = client.post('/item/update_status', json={'updates': [
+        {'id': heat_id, 'status': 'On Hold'},
+        {'id': heat_id, 'status': 'Dropped'},
+        {'id': alien_id, 'status': 'Not a status'},
+        {'id': secret_id, 'status': 'Dropped'},
+    ]})
+    assert response.get_json() == {'updated': [{'id': heat_id, 'status': 'Dropped'}],
+                                   'rejected': [alien_id, secret_id]}
+    assert client.post('/item/update_status', json={}).status_code == 400
+    with app.app_context():
+        assert db.session.get(Item, heat_id).status == 'Dropped'
+        assert db.session.get(Item, alien_id).status == 'Completed'
+        assert db.session.get(Item, secret_id).status == 'Plan to Watch'
+
+
+def test_item_routes_check_ownership_in_one_joined_query():
+    from sqlalchemy import event
+
+    app, client = make_client()
+    with app.app_context():
+        user = User.query.first()
+        other = User(username='other', email='other@example.com')
+        films = Category(name='Films', type='watch', owner=user)
+        theirs = Category(name='Private', type='watch', owner=other)
+        heat = Item(name='Heat', status='Plan to Watch', category=films)
+        secret = Item(name='Secret', category=theirs)
+        db.session.add_all([other, films, theirs, heat, secret])
+        db.session.commit()
+        heat_id, secret_id, theirs_id = heat.id, secret.id, theirs.id
+        engine = db.engine
+
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, 'before_cursor_execute', listener)
+    try:
+        assert client.get(f'/item/{heat_id}').status_code == 200
+        # user, item JOIN category, enrichment jobs
+        assert len(statements) == 3
+        assert 'JOIN category' in statements[1]
+        statements.clear()
+        client.post(f'/item/update_status/{heat_id}', data={'status': 'Watching'},
+                    headers={'X-Requested-With': 'XMLHttpRequest'})
+        # user, item JOIN category, UPDATE item, UPDATE category version, INSERT change_log
+        assert len(statements) == 5
+    finally:
+        event.remove(engine, 'before_cursor_execute', listener)
+
+    assert client.get(f'/item/{secret_id}').data == b'Unauthorized'
+    assert client.get('/item/999999').status_code == 404
+    assert client.get(f'/list/{theirs_id}').status_code == 403
+    assert client.get('/list/999999').data == b'Category not found'
+
+
+def test_list_rows_and_cards_are_cached_per_version():
+    app, client = make_client()
+    with app.app_context():
+        user = User.query.first()
+        films = Category(name='Films', type='watch', owner=user)
+        heat = Item(name='Heat', status='Plan to Watch', category=films)
+        alien = Item(name='Alien', status='Plan to Watch', category=films)
+        db.session.add_all([films, heat, alien])
+        db.session.commit()
+        films_id, heat_id, alien_id = films.id, heat.id, alien.id
+    cache = app.extensions['fragment_cache']
+
+    client.get('/')
+    client.get(f'/list/{films_id}')
+    assert sorted(key[0] for key in cache._data) == ['_category_card.html', '_item_row.html', '_item_row.html']
+    alien_row = cache.get(('_item_row.html', 'row', alien_id, 1, 0))
+
+    client.post(f'/item/update_status/{heat_id}', data={'status': 'Watching'})
+    with app.app_context():
+        assert db.session.get(Item, heat_id).version == 2
+        assert db.session.get(Item, alien_id).version == 1
+    html = client.get(f'/list/{films_id}').get_data(as_text=True)
+    assert re.search(r'<option value="Watching"\s+selected', html)
+    # Only the changed row was rendered again; the other is the very same cached string
+    assert ('_item_row.html', 'row', heat_id, 2, 0) in cache._data
+    assert cache.get(('_item_row.html', 'row', alien_id, 1, 0)) is alien_row
+
+    with app.app_context():
+        db.session.add(Item(name='Dune', category_id=films_id))
+        db.session.commit()
+    assert '3 Items' in client.get('/').get_data(as_text=True)
+
+
+def test_engine_profiles(tmp_path, monkeypatch):
+    from app.database import engine_options
+    from config import ProductionConfig, config_for
+
+    class FileDbConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'wal.db'}"
+
+    app = create_app(FileDbConfig)
+    with app.app_context():
+        pragma = lambda name: db.session.execute(db.text(f'PRAGMA {name}')).scalar()
+        assert pragma('journal_mode') == 'wal'
+        assert pragma('synchronous') == 0  # OFF in the testing profile
+        assert pragma('busy_timeout') == 5000
+        # No pool sizing for SQLite
+        assert 'pool_size' not in app.config['SQLALCHEMY_ENGINE_OPTIONS']
+
+    config = {key: getattr(ProductionConfig, key) for key in dir(ProductionConfig) if key.isupper()}
+    config['SQLALCHEMY_DATABASE_URI'] = 'postgresql://db/wishlist'
+    options = engine_options(config)
+    assert options['pool_size'] == 10 and options['max_overflow'] == 20
+    assert options['pool_pre_ping'] is True and options['pool_recycle'] == 1800
+    config['SQLALCHEMY_ENGINE_OPTIONS'] = {'pool_size': 3}
+    assert engine_options(config)['pool_size'] == 3
+
+    assert config_for('production') is ProductionConfig
+    # A missing APP_ENV must not mean DEBUG and schema creation on startup
+    monkeypatch.delenv('APP_ENV', raising=False)
+    assert config_for() is ProductionConfig
+    try:
+        config_for('staging')
+    except ValueError:
+        pass
+    else:
+        raise AssertionError('unknown profile accepted')
+
+
+def test_boot_runs_no_ddl_and_defers_scraper_imports(tmp_path):
+    import subprocess
+    import sys
+    from sqlalchemy import inspect
+    from app.migrations import create_schema
+
+    class NoSchemaConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'boot.db'}"
+        AUTO_CREATE_SCHEMA = False
+
+    app = create_app(NoSchemaConfig)
+    with app.app_context():
+        assert inspect(db.engine).get_table_names() == []
+        create_schema()  # what `flask upgrade-db` does
+        assert {'user', 'category', 'item', 'item_fts', 'schema_version'} <= set(inspect(db.engine).get_table_names())
+
+    script = ("import sys; from app import create_app; from config import TestingConfig; "
+              "create_app(TestingConfig).test_client().get('/login'); "
+              "print(','.join(m for m in ('duckduckgo_search', 'googlesearch', 'requests', 'bs4', 'lxml') if m in sys.modules))")
+    out = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == ''
+
+
+def test_metrics_endpoint_reports_latency_and_queries_per_route():
+    from app import metrics
+
+    app, client = make_client()
+    metrics.reset()
+    client.get('/')
+    client.get('/')
+
+    text = client.get('/metrics').get_data(as_text=True)
+    assert '# TYPE wishlist_request_duration_seconds histogram' in text
+    assert 'wishlist_request_duration_seconds_count{endpoint="main.index",method="GET",status="200"} 2' in text
+    assert 'wishlist_request_duration_seconds_bucket{endpoint="main.index",method="GET",status="200",le="+Inf"} 2' in text
+    queries = metrics.REQUEST_SQL_QUERIES.snapshot()[('main.index',)]
+    assert queries[-1] == 2 and queries[-2] >= 4  # two requests, a few statements each
+    assert 'endpoint="metrics"' not in text
+
+    assert client.get('/metrics', environ_base={'REMOTE_ADDR': '10.0.0.5'}).status_code == 404
+
+    # Observations above the top bucket count only towards +Inf, never the sum slot
+    histogram = metrics.Histogram('test_seconds', 'Test.', (), (0.1, 1))
+    histogram.observe(0.05)
+    histogram.observe(5)
+    assert histogram.snapshot()[()] == [1, 0, 1, 5.05, 2]
+    assert histogram.render()[2:] == ['test_seconds_bucket{le="0.1"} 1', 'test_seconds_bucket{le="1"} 1',
+                                      'test_seconds_bucket{le="+Inf"} 2', 'test_seconds_sum 5.05',
+                                      'test_seconds_count 2']
+
+
+def test_thumbnails_are_proxied_resized_and_cached_on_disk(tmp_path, monkeypatch):
+    import io
+    from PIL import Image
+    from app import thumbnails
+    from app.futurescope import http
+
+    class ThumbConfig(TestingConfig):
+        THUMBNAIL_CACHE_DIR = str(tmp_path / 'thumbs')
+
+    app, client = make_client(ThumbConfig)
+    with app.app_context():
+        user = User.query.first()
+        films = Category(name='Films', type='watch', owner=user)
+        heat = Item(name='Heat', category=films, image_url='https://upload.example.org/heat.png')
+        db.session.add_all([films, heat])
+        db.session.commit()
+        category_id, heat_id = films.id, heat.id
+
+    source = io.BytesIO()
+    Image.new('RGB', (1000, 1500), 'red').save(source, 'PNG')
+    fetched = []
+    monkeypatch.setattr(http, 'fetch_image', lambda url, **kwargs: fetched.append(url) or source.getvalue())
+
+    html = client.get(f'/list/{category_id}').get_data(as_text=True)
+    jpeg_url = re.search(r'src="(/thumb/\d+/list/[0-9a-f]{32}\.jpeg)"', html).group(1)
+    assert jpeg_url.replace('.jpeg', '.webp') in html
+    assert 'upload.example.org' not in html
+
+    response = client.get(jpeg_url)
+    assert response.status_code == 200 and response.mimetype == 'image/jpeg'
+    assert 'immutable' in response.headers['Cache-Control']
+    assert Image.open(io.BytesIO(response.data)).size == (96, 144)
+
+    # Every variant was written on the first miss; the source is fetched once
+    detail_url = jpeg_url.replace('/list/', '/detail/').replace('.jpeg', '.webp')
+    response = client.get(detail_url)
+    assert response.mimetype == 'image/webp'
+    assert Image.open(io.BytesIO(response.data)).size == (600, 900)
+    assert fetched == ['https://upload.example.org/heat.png']
+    assert len(list((tmp_path / 'thumbs').iterdir())) == 4
+
+    assert client.get(jpeg_url.replace(jpeg_url.split('/')[-1][:8], '0' * 8)).status_code == 404
+    with app.app_context():
+        db.session.get(Item, heat_id).image_url = 'https://upload.example.org/new.png'
+        db.session.commit()
+    assert client.get(jpeg_url).status_code == 200  # still on disk under the old digest
+    html = client.get(f'/item/{heat_id}').get_data(as_text=True)
+    new_url = re.search(r'src="(/thumb/\d+/detail/[0-9a-f]{32}\.jpeg)"', html).group(1)
+    monkeypatch.setattr(http, 'fetch_image', lambda url, **kwargs: b'not an image')
+    response = client.get(new_url)
+    assert response.status_code == 302 and response.location == 'https://upload.example.org/new.png'
+
+    cache = thumbnails.DiskLRU(str(tmp_path / 'lru'), max_bytes=250)
+    for name in 'abc':
+        cache.put(name, b'x' * 100)
+        time.sleep(0.01)
+    assert cache.get('a') is None and cache.get('c')
+
+
+def test_title_suggestions_from_resolved_works(tmp_path, monkeypatch):
+    from app import enrichment, suggest
+    from app.futurescope import metadata
+    from app.models import Work
+
+    class SuggestConfig(TestingConfig):
+        SUGGEST_INDEX_PATH = str(tmp_path / 'suggest.jsonl')
+
+    app, client = make_client(SuggestConfig)
+    with app.app_context():
+        user = User.query.first()
+        films = Category(name='Films', type='watch', owner=user)
+        db.session.add(films)
+        # Resolved before the index existed: picked up by the first build
+        db.session.add(Item(name='dark knight', category=films,
+                            work=Work(url='https://en.wikipedia.org/wiki/The_Dark_Knight', name='The Dark Knight')))
+        db.session.commit()
+        films_id = films.id
+
+    assert client.get('/suggest?type=watch&q=dark').get_json() == {'suggestions': ['The Dark Knight']}
+    assert client.get('/suggest?type=read&q=dark').get_json() == {'suggestions': []}
+    assert client.get('/suggest?type=watch&q=d').get_json() == {'suggestions': []}
+
+    def fake_fetch(query, category_type='general', category_name='', strict=False):
+        return {'name': f'{query.title()} (1995 film)', 'link': f'https://en.wikipedia.org/wiki/{query}',
+                'info': None, 'image_url': None, 'director': None, 'year': None, 'sequel_prequel': None}
+
+    monkeypatch.setattr(metadata, 'fetch_meta_data', fake_fetch)
+    for name in ('Heat', 'Heathers', 'Heathers'):
+        client.post(f'/item/add/{films_id}', data={'name': name})
+    with app.app_context():
+        enrichment.run_jobs(enrichment.claim_jobs(10))
+
+    # Two items resolved to Heathers, so it ranks first
+    assert client.get('/suggest?type=watch&q=HEAT').get_json() == {
+        'suggestions': ['Heathers (1995 film)', 'Heat (1995 film)']}
+    assert 'data-suggest-url="/suggest?type=watch"' in client.get(f'/list/{films_id}').get_data(as_text=True)
+
+    # A new process loads the journal without touching the database
+    index = suggest.PrefixIndex(str(tmp_path / 'suggest.jsonl'))
+    index.ensure_loaded()
+    assert len(index) == 3
+    assert index.lookup('watch', 'the dark') == ['The Dark Knight']
+    index.record([('watch', 'Heat (1995 film)')] * 3)
+    with app.app_context():
+        # ...and other processes see its additions on their next lookup
+        assert suggest.suggest('watch', 'hea')[0] == 'Heat (1995 film)'
+
+
+def test_bulk_status_move_and_delete_are_set_based():
+    from sqlalchemy import event
+    from app.models import EnrichmentJob
+
+    app, client = make_client()
+    with app.app_context():
+        user = User.query.first()
+        other = User(username='other', email='other@example.com')
+        films = Category(name='Films', type='watch', owner=user)
+        books = Category(name='Books', type='read', owner=user)
+        theirs = Category(name='Private', type='watch', owner=other)
+        db.session.add_all([other, films, books, theirs])
+        db.session.commit()
+        db.session.execute(db.insert(Item), [{'name': f'Film {n}', 'status': 'Plan to Watch', 'category_id': films.id}
+                                             for n in range(2000)])
+        secret = Item(name='Secret', category=theirs)
+        db.session.add(secret)
+        db.session.commit()
+        film_ids = db.session.scalars(db.select(Item.id).filter_by(category_id=films.id).order_by(Item.id)).all()
+        db.session.execute(db.insert(EnrichmentJob), [{'item_id': item_id} for item_id in film_ids])
+        db.session.commit()
+        films_id, books_id, theirs_id, secret_id = films.id, books.id, theirs.id, secret.id
+        engine = db.engine
+
+    picked = film_ids[:3]
+    resp = client.post('/item/bulk/status', json={'ids': picked + [secret_id], 'status': 'Watching'})
+    assert resp.get_json() == {'updated': picked, 'rejected': [secret_id]}
+    assert client.post('/item/bulk/status', json={'ids': picked, 'status': 'Reading'}).get_json()['rejected'] == picked
+    assert client.post('/item/bulk/status', json={'ids': [], 'status': 'Watching'}).status_code == 400
+
+    # Moving into a read list maps statuses it does not offer to its default
+    refused = client.post('/item/bulk/move', json={'ids': picked[:2], 'category_id': theirs_id})
+    assert refused.status_code == 403 and refused.get_json() == {'error': 'Unauthorized'}
+    missing = client.post('/item/bulk/move', json={'ids': picked[:2], 'category_id': 999999})
+    assert missing.status_code == 404 and missing.get_json() == {'error': 'Category not found'}
+    resp = client.post('/item/bulk/move', data={'ids': [str(i) for i in picked[:2]], 'category_id': str(books_id)},
+                       headers={'Referer': f'/list/{films_id}'})
+    assert resp.status_code == 302
+    with app.app_context():
+        moved = db.session.get(Item, picked[0])
+        assert (moved.category_id, moved.status, moved.version) == (books_id, 'Plan to Read', 3)
+        assert db.session.get(Item, picked[2]).version == 2
+        assert db.session.get(Category, books_id).version > 1
+
+    assert client.post('/item/bulk/delete', json={'ids': [picked[0], secret_id]}).get_json() == {
+        'deleted': [picked[0]], 'rejected': [secret_id]}
+
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, 'before_cursor_execute', listener)
+    try:
+        resp = client.post('/category/bulk/delete', json={'ids': [films_id, theirs_id]})
+    finally:
+        event.remove(engine, 'before_cursor_execute', listener)
+    assert resp.get_json() == {'deleted': [films_id], 'rejected': [theirs_id]}
+    # user, ownership, one DELETE each for jobs, items and the list however many
+    # items, and one change feed entry
+    assert len(statements) == 6
+    with app.app_context():
+        assert Item.query.filter_by(category_id=films_id).count() == 0
+        assert EnrichmentJob.query.count() == 1  # the item moved to Books keeps its job
+        assert db.session.get(Item, secret_id) is not None
+
+    assert client.get(f'/category/delete/{books_id}').status_code == 302
+    with app.app_context():
+        assert db.session.get(Category, books_id) is None and Item.query.count() == 1
+        assert EnrichmentJob.query.count() == 0